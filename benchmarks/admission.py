@@ -0,0 +1,225 @@
+"""
+Load test: under a spike, admission control must keep admitted requests' latency bounded.
+
+The stand-in agents share a simulated provider that serves --capacity calls at full speed and
+slows every call down proportionally beyond that, as provider rate limits do. A spike of bulk
+requests followed by interactive ones is sent twice through the real service: once without and
+once with admission control. With it, rejected requests must get a 429 with Retry-After in a
+fraction of an admitted request's latency (the spike shares one event loop with the service),
+interactive requests must wait less than bulk ones and admitted requests must finish sooner.
+
+    python -m benchmarks.admission --bulk 48 --interactive 16 --capacity 8 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+work_dir = tempfile.mkdtemp(prefix="admission_")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+os.environ.setdefault("RETRIEVAL_EXTRACTION", "false")
+os.environ.setdefault("RUN_TRACES_ENABLED", "false")
+os.environ.setdefault(
+    "CONVERSATION_DB_FILE", os.path.join(work_dir, "conversations.db")
+)
+os.environ.setdefault("SESSION_STORE_DB_FILE", os.path.join(work_dir, "sessions.db"))
+os.environ.setdefault("BLOB_STORE_PATH", os.path.join(work_dir, "blobs"))
+os.environ.setdefault(
+    "EXTRACTION_CACHE_DB_FILE", os.path.join(work_dir, "extraction_cache.db")
+)
+os.environ.setdefault(
+    "PREPARED_FILES_DB_FILE", os.path.join(work_dir, "prepared_files.db")
+)
+os.environ.setdefault(
+    "EMBEDDING_CACHE_DB_FILE", os.path.join(work_dir, "embedding_cache.db")
+)
+os.environ.setdefault("ANSWER_CACHE_DB_FILE", os.path.join(work_dir, "answer_cache.db"))
+
+import httpx  # noqa: E402
+from agno.run.response import RunResponseContentEvent  # noqa: E402
+
+from benchmarks.concurrent_chat import (  # noqa: E402
+    DATA_ANALYST,
+    DATA_ENGINEER,
+    DATA_SCIENTIST,
+    install_stand_in_agents,
+    stand_in,
+    stand_ins,
+)
+from src.api.admission import admission_controller  # noqa: E402
+from src.config import app_settings  # noqa: E402
+from src.memory.conversation_memory import conversation_memory  # noqa: E402
+from src.server import app  # noqa: E402
+
+TICK_SECONDS = 0.01
+
+
+class SharedProvider:
+    """A model provider whose throughput is shared by all calls beyond `capacity`"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.active = 0
+
+    async def call(self, seconds: float) -> None:
+        self.active += 1
+        try:
+            remaining = seconds
+            while remaining > 0:
+                await asyncio.sleep(TICK_SECONDS)
+                remaining -= TICK_SECONDS * min(1, self.capacity / self.active)
+        finally:
+            self.active -= 1
+
+
+def install_provider_agents(provider: SharedProvider, latency: float) -> None:
+    """Stand-in agents whose every model call goes through the shared provider"""
+    install_stand_in_agents(0)
+
+    def through_provider(arun):
+        async def arun_through_provider(message, **kwargs):
+            await provider.call(latency)
+            return await arun(message, **kwargs)
+
+        return arun_through_provider
+
+    async def scientist_arun(message, stream=False, **kwargs):
+        async def tokens():
+            await provider.call(latency)
+            yield RunResponseContentEvent(content="Pricing is the top complaint.")
+
+        return tokens()
+
+    stand_in(DATA_ANALYST, through_provider(stand_ins[DATA_ANALYST]))
+    stand_in(DATA_ENGINEER, through_provider(stand_ins[DATA_ENGINEER]))
+    stand_in(DATA_SCIENTIST, scientist_arun)
+
+
+async def chat(
+    client: httpx.AsyncClient, index: int, priority: str, comments: bytes
+) -> SimpleNamespace:
+    started = time.perf_counter()
+    async with client.stream(
+        "POST",
+        "/chat",
+        data={
+            "message": f"What are the main complaints? ({index})",
+            "priority": priority,
+        },
+        files={
+            "files": ("comments.txt", comments + f"\n{index}".encode(), "text/plain")
+        },
+    ) as response:
+        async for _ in response.aiter_lines():
+            pass
+    return SimpleNamespace(
+        priority=priority,
+        status=response.status_code,
+        retry_after=response.headers.get("retry-after"),
+        latency=time.perf_counter() - started,
+    )
+
+
+async def spike(bulk: int, interactive: int, comments: bytes, offset: int) -> list:
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=300
+    ) as client:
+        bulk_requests = [
+            asyncio.create_task(chat(client, offset + index, "bulk", comments))
+            for index in range(bulk)
+        ]
+        await asyncio.sleep(0.05)
+        interactive_requests = [
+            asyncio.create_task(
+                chat(client, offset + bulk + index, "interactive", comments)
+            )
+            for index in range(interactive)
+        ]
+        results = await asyncio.gather(*bulk_requests, *interactive_requests)
+    await conversation_memory.wait_for_updates()
+    return results
+
+
+def p95(values: list) -> float:
+    return statistics.quantiles(values, n=20)[-1] if len(values) > 1 else values[0]
+
+
+def summarize(label: str, results: list) -> dict:
+    admitted = [result for result in results if result.status == 200]
+    rejected = [result for result in results if result.status == 429]
+    summary = {
+        "admitted_p50": statistics.median(result.latency for result in admitted),
+        "admitted_p95": p95([result.latency for result in admitted]),
+        "rejected_max": max((result.latency for result in rejected), default=0),
+        "retry_after": all(result.retry_after for result in rejected),
+    }
+    for priority in ("interactive", "bulk"):
+        latencies = [
+            result.latency for result in admitted if result.priority == priority
+        ]
+        summary[f"{priority}_p95"] = p95(latencies) if latencies else 0
+    print(f"{label}:")
+    print(f"  admitted / rejected:     {len(admitted)} / {len(rejected)}")
+    print(
+        f"  admitted p50 / p95:      {summary['admitted_p50']:.2f}s / {summary['admitted_p95']:.2f}s"
+    )
+    print(
+        f"  interactive / bulk p95:  {summary['interactive_p95']:.2f}s / {summary['bulk_p95']:.2f}s"
+    )
+    if rejected:
+        print(f"  429 max latency:         {summary['rejected_max'] * 1000:.1f}ms")
+        print(f"  Retry-After on all 429s: {summary['retry_after']}")
+    return summary
+
+
+async def main(bulk: int, interactive: int, capacity: int, latency: float) -> bool:
+    install_provider_agents(SharedProvider(capacity), latency)
+    admission_controller.max_concurrent = capacity
+    comments = await asyncio.to_thread(Path("data/comments.txt").read_bytes)
+
+    app_settings.ADMISSION_CONTROL_ENABLED = False
+    uncontrolled = summarize(
+        "without admission control", await spike(bulk, interactive, comments, 0)
+    )
+    app_settings.ADMISSION_CONTROL_ENABLED = True
+    controlled = summarize(
+        "with admission control",
+        await spike(bulk, interactive, comments, bulk + interactive),
+    )
+
+    fast_rejections = (
+        controlled["rejected_max"] < controlled["admitted_p50"] / 4
+        and controlled["retry_after"]
+    )
+    interactive_first = controlled["interactive_p95"] < controlled["bulk_p95"]
+    bounded = controlled["admitted_p95"] < uncontrolled["admitted_p95"]
+    print("fast 429s with Retry-After" if fast_rejections else "slow or bare 429s")
+    print(
+        "interactive ahead of bulk"
+        if interactive_first
+        else "interactive not prioritized"
+    )
+    print("admitted latency bounded" if bounded else "admitted latency collapsed")
+    return fast_rejections and interactive_first and bounded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bulk", type=int, default=48)
+    parser.add_argument("--interactive", type=int, default=16)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    sys.exit(
+        0
+        if asyncio.run(main(args.bulk, args.interactive, args.capacity, args.latency))
+        else 1
+    )
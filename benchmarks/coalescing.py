@@ -0,0 +1,150 @@
+"""
+Load test: identical concurrent /chat requests must share one workflow run.
+
+--requests copies of the same question over the same file are sent at once through the real
+service with stand-in agents that count their calls. Every request must receive the full streamed
+answer while the agents are called only as often as for a single request.
+
+    python -m benchmarks.coalescing --requests 16 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+work_dir = tempfile.mkdtemp(prefix="coalescing_")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+os.environ.setdefault("RETRIEVAL_EXTRACTION", "false")
+os.environ.setdefault("RUN_TRACES_ENABLED", "false")
+os.environ.setdefault(
+    "CONVERSATION_DB_FILE", os.path.join(work_dir, "conversations.db")
+)
+os.environ.setdefault("SESSION_STORE_DB_FILE", os.path.join(work_dir, "sessions.db"))
+os.environ.setdefault("BLOB_STORE_PATH", os.path.join(work_dir, "blobs"))
+os.environ.setdefault(
+    "EXTRACTION_CACHE_DB_FILE", os.path.join(work_dir, "extraction_cache.db")
+)
+os.environ.setdefault(
+    "PREPARED_FILES_DB_FILE", os.path.join(work_dir, "prepared_files.db")
+)
+os.environ.setdefault(
+    "EMBEDDING_CACHE_DB_FILE", os.path.join(work_dir, "embedding_cache.db")
+)
+os.environ.setdefault("ANSWER_CACHE_DB_FILE", os.path.join(work_dir, "answer_cache.db"))
+
+import httpx  # noqa: E402
+
+from benchmarks.concurrent_chat import (  # noqa: E402
+    DATA_ANALYST,
+    DATA_ENGINEER,
+    DATA_SCIENTIST,
+    install_stand_in_agents,
+    stand_in,
+    stand_ins,
+)
+from src.memory.conversation_memory import conversation_memory  # noqa: E402
+from src.memory.extraction_cache import extraction_cache  # noqa: E402
+from src.server import app  # noqa: E402
+
+
+def count_agent_calls() -> Counter:
+    """Wrap the stand-in agents so each call is counted by agent name"""
+    calls = Counter()
+    for name in (DATA_ANALYST, DATA_ENGINEER, DATA_SCIENTIST):
+
+        def counted(arun, name):
+            async def arun_counted(*args, **kwargs):
+                calls[name] += 1
+                return await arun(*args, **kwargs)
+
+            return arun_counted
+
+        stand_in(name, counted(stand_ins[name], name))
+    return calls
+
+
+async def chat(client: httpx.AsyncClient, message: str, comments: bytes) -> dict:
+    started = time.perf_counter()
+    answer, completed = "", {}
+    async with client.stream(
+        "POST",
+        "/chat",
+        data={"message": message},
+        files={"files": ("comments.txt", comments, "text/plain")},
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: ") :])
+            if event["event"] == "RunResponseContent":
+                answer += event["content"]
+            elif event["event"] == "RunCompleted":
+                completed = event
+    return {
+        "answer": answer,
+        "completed": completed,
+        "latency": time.perf_counter() - started,
+    }
+
+
+async def main(requests: int, latency: float) -> bool:
+    install_stand_in_agents(latency)
+    calls = count_agent_calls()
+    comments = await asyncio.to_thread(Path("data/comments.txt").read_bytes)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=120
+    ) as client:
+        extraction_cache.clear()
+        single = await chat(client, "What are the main complaints? (single)", comments)
+        single_calls = sum(calls.values())
+
+        calls.clear()
+        extraction_cache.clear()
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *[
+                chat(client, "What are the main complaints?", comments)
+                for _ in range(requests)
+            ]
+        )
+        wall_time = time.perf_counter() - started
+        await conversation_memory.wait_for_updates()
+
+    coalesced = sum(
+        bool(result["completed"]["metadata"]["coalesced"]) for result in results
+    )
+    complete = all(
+        result["answer"] == single["answer"] and result["completed"]
+        for result in results
+    )
+    sessions = {result["completed"]["session_id"] for result in results}
+    print(
+        f"single request:           {single['latency']:.3f}s, {single_calls} agent calls"
+    )
+    print(f"{requests} identical requests:  {wall_time:.3f}s wall")
+    print(f"  agent calls:            {sum(calls.values())} {dict(calls)}")
+    print(f"  coalesced requests:     {coalesced}")
+    print(f"  distinct sessions:      {len(sessions)}")
+    print(f"  full answer everywhere: {complete}")
+
+    one_run = sum(calls.values()) == single_calls and coalesced == requests - 1
+    print("requests coalesced" if one_run else "requests ran separately")
+    return one_run and complete and len(sessions) == requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.requests, args.latency)) else 1)
@@ -0,0 +1,203 @@
+"""
+Benchmark: throughput and quality of near-duplicate comment collapsing, 10k to 10M comments.
+
+Synthetic corpora are generated directly as token ids, the way CommentCorpus holds a parsed file,
+so only the dedup stage is timed. A --repost-share of the comments are reposts of templates (the
+sample comments of data/comments.txt and random ones): exact copies, copies with a handle appended
+or copies with one word dropped. The others are unique. Negations and sentiment terms of the
+sample comments are protected, as in the app. Reported per size: throughput, clusters,
+the share of tokens still sent, recall (reposts clustered with the other copies of their template)
+and precision (comments clustered only with copies of their own template). The run fails if the
+throughput at the largest size drops below half the best one, or if recall is under 0.9 or
+precision under 0.95.
+
+    python -m benchmarks.comment_dedup --sizes 10000 100000 1000000 10000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+
+from src.processing.comment_analytics import (
+    NEGATORS,
+    SENTIMENT_LEXICON,
+    tokenize,
+)
+from src.processing.comment_dedup import near_duplicate_clusters
+from src.processing.comment_parser import iter_comments
+
+VOCABULARY_SIZE = 50_000
+EXACT, APPENDED, DROPPED = 0, 1, 2
+
+
+def template_pool(count: int, rng: np.random.Generator) -> tuple:
+    """
+    Token ids and offsets of the sample comments followed by random comments, `count` in all, and
+    the vocabulary of the sample comments
+    """
+    with open("data/comments.txt", "rb") as stream:
+        samples = [tokenize(comment) for comment in iter_comments(stream)]
+    vocabulary = {}
+    templates = [
+        [vocabulary.setdefault(token, len(vocabulary)) for token in tokens]
+        for tokens in samples
+        if tokens
+    ]
+    lengths = np.concatenate(
+        [
+            [len(tokens) for tokens in templates],
+            rng.integers(5, 21, size=max(count - len(templates), 0)),
+        ]
+    )
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = rng.integers(
+        len(vocabulary), VOCABULARY_SIZE, size=offsets[-1], dtype=np.int32
+    )
+    tokens[: offsets[len(templates)]] = np.concatenate(templates)
+    return tokens, offsets, vocabulary
+
+
+def synthetic_corpus(count: int, repost_share: float, seed: int = 0) -> tuple:
+    """
+    Token ids, offsets and the template of each comment, unique comments being their own, and
+    the protected token ids
+    """
+    rng = np.random.default_rng(seed)
+    template_count = max(count // 100, 300)
+    pool_tokens, pool_offsets, vocabulary = template_pool(template_count, rng)
+    batches, sources, unique_ids = [], [], template_count
+    for start in range(0, count, 1 << 20):
+        size = min(1 << 20, count - start)
+        repost = rng.random(size) < repost_share
+        unique_lengths = rng.integers(5, 21, size=int((~repost).sum()))
+        unique_offsets = pool_offsets[-1] + np.concatenate(
+            [[0], np.cumsum(unique_lengths)]
+        )
+        tokens = np.concatenate(
+            [
+                pool_tokens,
+                rng.integers(
+                    0, VOCABULARY_SIZE, size=int(unique_lengths.sum()), dtype=np.int32
+                ),
+            ]
+        )
+        offsets = np.concatenate([pool_offsets, unique_offsets[1:]])
+
+        source = np.empty(size, dtype=np.int64)
+        source[repost] = rng.integers(template_count, size=int(repost.sum()))
+        source[~repost] = template_count + np.arange(int((~repost).sum()))
+        kind = np.where(repost, rng.choice(3, size=size, p=[0.5, 0.3, 0.2]), EXACT)
+        base_start, base_length = offsets[source], np.diff(offsets)[source]
+        dropped = (kind == DROPPED) & (base_length >= 4)
+        appended = kind == APPENDED
+        drop_position = rng.integers(0, base_length)
+        lengths = base_length - dropped + appended
+
+        comment_starts = np.zeros(size, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=comment_starts[1:])
+        position = np.arange(int(lengths.sum())) - np.repeat(comment_starts, lengths)
+        shifted = np.repeat(dropped, lengths) & (
+            position >= np.repeat(drop_position, lengths)
+        )
+        handle = np.repeat(appended, lengths) & (
+            position == np.repeat(lengths - 1, lengths)
+        )
+        source_position = np.minimum(
+            position + shifted, np.repeat(base_length - 1, lengths)
+        )
+        batch_tokens = tokens[np.repeat(base_start, lengths) + source_position]
+        batch_tokens[handle] = VOCABULARY_SIZE + rng.integers(
+            0, count + 1, size=int(handle.sum())
+        )
+        batches.append((batch_tokens, lengths))
+        sources.append(np.where(repost, source, unique_ids + source - template_count))
+        unique_ids += int((~repost).sum())
+
+    token_ids = np.concatenate([batch_tokens for batch_tokens, _ in batches])
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.concatenate([lengths for _, lengths in batches]), out=offsets[1:])
+    protected = np.zeros(VOCABULARY_SIZE + count + 1, dtype=bool)
+    protected[
+        [
+            vocabulary[term]
+            for term in [*NEGATORS, *SENTIMENT_LEXICON]
+            if term in vocabulary
+        ]
+    ] = True
+    return token_ids, offsets, np.concatenate(sources), protected
+
+
+def majority_share(groups: np.ndarray, members: np.ndarray) -> np.ndarray:
+    """For each comment, whether its member label is the most common one of its group"""
+    keys = groups * (members.max() + 1) + members
+    unique_keys, inverse, counts = np.unique(
+        keys, return_inverse=True, return_counts=True
+    )
+    key_groups = unique_keys // (members.max() + 1)
+    best = np.zeros(key_groups.max() + 1, dtype=np.int64)
+    np.maximum.at(best, key_groups, counts)
+    return counts[inverse] == best[groups]
+
+
+def main(sizes: list, repost_share: float) -> bool:
+    print(f"repost share: {repost_share}\n")
+    print(
+        f"{'comments':>9} {'time':>8} {'comments/s':>11} {'clusters':>9} "
+        f"{'tokens sent':>12} {'recall':>7} {'precision':>10}"
+    )
+    results = []
+    for size in sizes:
+        token_ids, offsets, sources, protected = synthetic_corpus(size, repost_share)
+        started = time.perf_counter()
+        representatives = near_duplicate_clusters(token_ids, offsets, protected)
+        elapsed = time.perf_counter() - started
+
+        lengths = np.diff(offsets)
+        kept = np.unique(representatives)
+        tokens_sent = lengths[kept].sum() / lengths.sum()
+        # Recall: reposts in the most common cluster of their template
+        _, inverse, counts = np.unique(sources, return_inverse=True, return_counts=True)
+        reposts = counts[inverse] > 1
+        recall = majority_share(sources, representatives)[reposts].mean()
+        # Precision: comments of the most common template of their cluster
+        precision = majority_share(representatives, sources).mean()
+        results.append((size / elapsed, recall, precision))
+        print(
+            f"{size:>9} {elapsed:>7.2f}s {size / elapsed:>11.0f} {len(kept):>9} "
+            f"{tokens_sent:>11.1%} {recall:>7.3f} {precision:>10.3f}"
+        )
+        del token_ids, offsets, sources, representatives
+
+    scalable = results[-1][0] >= 0.5 * max(throughput for throughput, _, _ in results)
+    accurate = all(
+        recall >= 0.9 and precision >= 0.95 for _, recall, precision in results
+    )
+    print()
+    print(
+        "throughput holds as the corpus grows"
+        if scalable
+        else "throughput degrades with the corpus size"
+    )
+    print(
+        "near-duplicates collapsed accurately"
+        if accurate
+        else "near-duplicates missed or merged wrongly"
+    )
+    return scalable and accurate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000, 10000000]
+    )
+    parser.add_argument("--repost-share", type=float, default=0.7)
+    args = parser.parse_args()
+    sys.exit(0 if main(args.sizes, args.repost_share) else 1)
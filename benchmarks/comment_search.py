@@ -0,0 +1,123 @@
+"""
+Benchmark: build and query time of the BM25 comment index, and the size of the extraction prompt
+it selects, as the comment file grows.
+
+Synthetic comment files are sampled from data/comments.txt, each comment tagged with a random
+handle so the vocabulary grows with the corpus. For each size the corpus is parsed, the index is
+built, and themed queries (pricing, app UX, a premiere) are run. The run fails if the p95 query
+time at the largest size exceeds --max-query-ms, or if the selected prompt grows by more than 1.5
+times from the smallest to the largest size: its size must follow the relevant data, not the
+corpus.
+
+    python -m benchmarks.comment_search --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+
+from src.config import app_settings
+from src.processing.comment_analytics import CommentCorpus
+from src.processing.comment_index import CommentIndex
+from src.processing.comment_parser import iter_comments, render_comments
+from src.processing.tokens import count_tokens
+
+QUERIES = [
+    (
+        "Extract the complaints about pricing and the cost of the subscription.",
+        "Are people complaining about the price?",
+    ),
+    (
+        "Extract the feedback on the app: crashes, glitches, loading and navigation.",
+        "How is the app experience?",
+    ),
+    (
+        "Extract the reactions to the premiere, the trailer and the upcoming release.",
+        "What do fans expect from the premiere?",
+    ),
+]
+
+
+def synthetic_comments(count: int, seed: int = 0) -> list:
+    with open("data/comments.txt", "rb") as stream:
+        samples = list(iter_comments(stream))
+    rng = random.Random(seed)
+    return [f"{rng.choice(samples)} @user{rng.randint(0, count)}" for _ in range(count)]
+
+
+def main(sizes: list, repeats: int, max_query_ms: float) -> bool:
+    limit = app_settings.COMMENT_SEARCH_TOP_K
+    ratio = app_settings.COMMENT_SEARCH_MIN_SCORE_RATIO
+    print(f"top k: {limit}, min score ratio: {ratio}\n")
+    print(
+        f"{'comments':>9} {'corpus tokens':>14} {'parse':>8} {'build':>8} {'index MB':>9} "
+        f"{'query p50':>10} {'query p95':>10} {'selected':>9} {'prompt tokens':>14}"
+    )
+
+    results = []
+    for size in sizes:
+        comments = synthetic_comments(size)
+        corpus_tokens = sum(count_tokens(comment) + 1 for comment in comments)
+
+        started = time.perf_counter()
+        corpus = CommentCorpus(comments)
+        parse_time = time.perf_counter() - started
+        started = time.perf_counter()
+        index = CommentIndex(corpus)
+        build_time = time.perf_counter() - started
+
+        query_times, selected, prompt_tokens = [], 0, 0
+        for guidelines, query in QUERIES:
+            for _ in range(repeats):
+                started = time.perf_counter()
+                comment_ids, scores = index.search(f"{guidelines}\n{query}", limit)
+                query_times.append(time.perf_counter() - started)
+            kept = (
+                comment_ids[scores >= scores[0] * ratio] if len(scores) else comment_ids
+            )
+            selected += len(kept)
+            prompt_tokens += count_tokens(
+                render_comments([index.comments[i] for i in kept])
+            )
+        p50, p95 = np.percentile(query_times, [50, 95]) * 1000
+        selected //= len(QUERIES)
+        prompt_tokens //= len(QUERIES)
+        results.append((size, p95, prompt_tokens))
+        print(
+            f"{size:>9} {corpus_tokens:>14} {parse_time:>7.2f}s {build_time:>7.2f}s "
+            f"{index.nbytes / 2**20:>9.1f} {p50:>8.1f}ms {p95:>8.1f}ms {selected:>9} "
+            f"{prompt_tokens:>14}"
+        )
+
+    fast = results[-1][1] <= max_query_ms
+    bounded = results[-1][2] <= 1.5 * max(results[0][2], 1)
+    print()
+    print(
+        f"queries within {max_query_ms:g}ms"
+        if fast
+        else f"queries slower than {max_query_ms:g}ms"
+    )
+    print(
+        "prompt size follows the relevant comments"
+        if bounded
+        else "prompt size grows with the corpus"
+    )
+    return fast and bounded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--max-query-ms", type=float, default=100)
+    args = parser.parse_args()
+    sys.exit(0 if main(args.sizes, args.repeats, args.max_query_ms) else 1)
@@ -0,0 +1,202 @@
+"""
+Load test: N concurrent /chat requests must overlap instead of being serialized.
+
+The agents' model calls are replaced by stand-ins that await a fixed latency, so the test
+measures the service itself and costs nothing. While the chat requests run, /health is polled
+to check the event loop stays responsive.
+
+    python -m benchmarks.concurrent_chat --requests 8 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict
+
+work_dir = tempfile.mkdtemp(prefix="concurrent_chat_")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+os.environ.setdefault("RETRIEVAL_EXTRACTION", "false")
+os.environ.setdefault("RUN_TRACES_ENABLED", "false")
+os.environ.setdefault(
+    "CONVERSATION_DB_FILE", os.path.join(work_dir, "conversations.db")
+)
+os.environ.setdefault("SESSION_STORE_DB_FILE", os.path.join(work_dir, "sessions.db"))
+os.environ.setdefault("BLOB_STORE_PATH", os.path.join(work_dir, "blobs"))
+os.environ.setdefault(
+    "EXTRACTION_CACHE_DB_FILE", os.path.join(work_dir, "extraction_cache.db")
+)
+os.environ.setdefault(
+    "PREPARED_FILES_DB_FILE", os.path.join(work_dir, "prepared_files.db")
+)
+os.environ.setdefault(
+    "EMBEDDING_CACHE_DB_FILE", os.path.join(work_dir, "embedding_cache.db")
+)
+os.environ.setdefault("ANSWER_CACHE_DB_FILE", os.path.join(work_dir, "answer_cache.db"))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from agno.agent import Agent  # noqa: E402
+from agno.run.response import RunResponseContentEvent  # noqa: E402
+
+from src.agents import conversation_summarizer_agent  # noqa: E402
+from src.agents.data_analyst_agent import DataAnalystAgentResponse  # noqa: E402
+from src.agents.data_engineer_agent import DataEngineerAgentResponse  # noqa: E402
+from src.memory.extraction_cache import extraction_cache  # noqa: E402
+from src.server import app  # noqa: E402
+
+# The analyst, engineer and scientist are built per run, so their stand-ins are found by name
+DATA_ANALYST = "Data Analyst Agent"
+DATA_ENGINEER = "Data Engineer Agent"
+DATA_SCIENTIST = "Social Media Data Scientist Agent"
+
+stand_ins: Dict[str, Callable] = {}
+model_arun = Agent.arun
+
+
+def run_stand_in(agent: Agent, *args, **kwargs):
+    """Agent.arun replacement calling the stand-in of the agent's name, if there is one"""
+    arun = stand_ins.get(agent.name)
+    if arun is None:
+        return model_arun(agent, *args, **kwargs)
+    return arun(*args, **kwargs)
+
+
+def stand_in(agent_name: str, arun: Callable) -> None:
+    """
+    Replace the async run path of every agent with this name, including the copies the model
+    router makes to call other models
+    """
+    stand_ins[agent_name] = arun
+    Agent.arun = run_stand_in
+
+
+def install_stand_in_agents(latency: float) -> None:
+    """Replace the agents' async run path with calls that only await `latency` seconds"""
+
+    async def analyst_arun(message, **kwargs):
+        await asyncio.sleep(latency)
+        return SimpleNamespace(
+            content=DataAnalystAgentResponse(
+                query_type="analytical",
+                query_content=message,
+                helpful_message="",
+                information_extract_guidelines="Extract the main complaints.",
+            )
+        )
+
+    async def engineer_arun(message, **kwargs):
+        await asyncio.sleep(latency)
+        return SimpleNamespace(
+            content=DataEngineerAgentResponse(
+                filename="comments.txt",
+                extracted_content="Pricing is the most frequent complaint.",
+                error="",
+            )
+        )
+
+    async def scientist_arun(message, stream=False, **kwargs):
+        async def tokens():
+            for token in ["Pricing ", "is ", "the ", "top ", "complaint."]:
+                await asyncio.sleep(latency / 5)
+                yield RunResponseContentEvent(content=token)
+
+        return tokens()
+
+    async def summarizer_arun(message, **kwargs):
+        await asyncio.sleep(latency)
+        return SimpleNamespace(content="The user asked about the main complaints.")
+
+    stand_in(DATA_ANALYST, analyst_arun)
+    stand_in(DATA_ENGINEER, engineer_arun)
+    stand_in(DATA_SCIENTIST, scientist_arun)
+    stand_in(conversation_summarizer_agent.name, summarizer_arun)
+
+
+async def chat(client: httpx.AsyncClient, index: int, comments: bytes) -> float:
+    started = time.perf_counter()
+    async with client.stream(
+        "POST",
+        "/chat",
+        data={"message": f"What are the main complaints? ({index})"},
+        files=[("files", (f"comments-{index}.txt", comments, "text/plain"))],
+    ) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_lines():
+            pass
+    return time.perf_counter() - started
+
+
+async def poll_health(client: httpx.AsyncClient, stop: asyncio.Event) -> list:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+async def main(requests: int, latency: float, port: int) -> bool:
+    install_stand_in_agents(latency)
+    extraction_cache.clear()
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    comments = await asyncio.to_thread(Path("data/comments.txt").read_bytes)
+
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", timeout=120
+    ) as client:
+        await chat(client, -2, comments)
+        single = await chat(client, -1, comments)
+
+        stop = asyncio.Event()
+        health_task = asyncio.create_task(poll_health(client, stop))
+        started = time.perf_counter()
+        latencies = await asyncio.gather(
+            *[chat(client, index, comments) for index in range(requests)]
+        )
+        wall_time = time.perf_counter() - started
+        stop.set()
+        health_latencies = await health_task
+
+    server.should_exit = True
+    await server_task
+
+    serialized = single * requests
+    overlap = serialized / wall_time
+    print(f"single request:        {single:.3f}s")
+    print(f"{requests} concurrent requests: {wall_time:.3f}s wall")
+    print(
+        f"  latency p50/max:     {statistics.median(latencies):.3f}s / {max(latencies):.3f}s"
+    )
+    print(f"  if serialized:       {serialized:.3f}s")
+    print(f"  overlap factor:      {overlap:.1f}x")
+    print(f"/health max latency:   {max(health_latencies) * 1000:.1f}ms")
+
+    return wall_time < serialized / 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=7788)
+    args = parser.parse_args()
+
+    overlapped = asyncio.run(main(args.requests, args.latency, args.port))
+    print("requests overlap" if overlapped else "requests were serialized")
+    sys.exit(0 if overlapped else 1)
@@ -0,0 +1,121 @@
+"""
+Benchmark: the report context must fit the token budget in bounded time whatever the data size.
+
+Synthetic extractions of growing size, with a share of repeated findings, are packed with a
+stand-in summarizer that awaits --latency seconds per call. The run fails if any packed context
+exceeds CONTEXT_PACK_TOKEN_BUDGET or if packing the largest input takes more than 1.5 times as
+long as packing the smallest one over CONTEXT_PACK_MAX_INPUT_TOKENS.
+
+    python -m benchmarks.context_packer --sizes 5000 20000 100000 1000000 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+
+from src.agents import context_summarizer_agent
+from src.config import app_settings
+from src.processing.tokens import count_tokens
+from src.workflow.context_packer import pack_context
+
+TOPICS = [
+    "pricing",
+    "cancellation",
+    "app crashes",
+    "customer support",
+    "season finale",
+    "trailer",
+]
+PLATFORMS = ["Instagram", "TikTok", "YouTube", "Facebook", "X"]
+VERBS = ["grew", "dropped", "stayed flat", "spiked", "recovered"]
+
+
+def install_stand_in_summarizer(latency: float) -> list:
+    """Replace the summarizer's model call, returning the list its input sizes go to"""
+    calls = []
+
+    async def summarizer_arun(message, **kwargs):
+        calls.append(count_tokens(message))
+        await asyncio.sleep(latency)
+        return SimpleNamespace(
+            content=message[: app_settings.CONTEXT_PACK_SUMMARY_TOKENS * 2]
+        )
+
+    context_summarizer_agent.arun = summarizer_arun
+    return calls
+
+
+def synthetic_extractions(tokens: int, duplicate_share: float, seed: int = 0) -> list:
+    """Extractions of about `tokens` tokens, one per simulated file or chunk"""
+    rng = random.Random(seed)
+    extractions, findings, size = [], [], 0
+    while size < tokens:
+        paragraphs = []
+        for _ in range(rng.randint(3, 8)):
+            if findings and rng.random() < duplicate_share:
+                paragraph = rng.choice(findings)
+            else:
+                paragraph = "\n".join(
+                    f"- {rng.choice(TOPICS)} mentions on {rng.choice(PLATFORMS)} "
+                    f"{rng.choice(VERBS)} by {rng.randint(1, 99)}% in week {rng.randint(1, 52)}, "
+                    f"{rng.randint(10, 5000)} comments, example #{rng.randint(0, 10**9)}"
+                    for _ in range(rng.randint(2, 6))
+                )
+                findings.append(paragraph)
+            paragraphs.append(paragraph)
+        extraction = "\n\n".join(paragraphs)
+        extractions.append(extraction)
+        size += count_tokens(extraction)
+    return extractions
+
+
+async def main(sizes: list, latency: float, duplicate_share: float) -> bool:
+    calls = install_stand_in_summarizer(latency)
+    query = "How did pricing complaints on TikTok change over the weeks?"
+    budget = app_settings.CONTEXT_PACK_TOKEN_BUDGET
+    print(f"token budget: {budget}, summarizer latency: {latency}s\n")
+    print(
+        f"{'input':>9} {'packed':>7} {'dupes':>6} {'levels':>6} {'calls':>6} {'dropped':>8} {'time':>8}"
+    )
+
+    within_budget, capped_times = True, []
+    for size in sizes:
+        extractions = synthetic_extractions(size, duplicate_share)
+        calls.clear()
+        started = time.perf_counter()
+        packed = await pack_context(extractions, query)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{packed.input_tokens:>9} {packed.tokens:>7} {packed.duplicates:>6} "
+            f"{packed.summary_levels:>6} {len(calls):>6} {packed.dropped_passages:>8} "
+            f"{elapsed:>7.2f}s"
+        )
+        within_budget &= packed.tokens <= budget
+        if packed.input_tokens > app_settings.CONTEXT_PACK_MAX_INPUT_TOKENS:
+            capped_times.append(elapsed)
+
+    bounded = not capped_times or capped_times[-1] <= 1.5 * capped_times[0]
+    print()
+    print("packed within budget" if within_budget else "packed over budget")
+    print("packing time bounded" if bounded else "packing time grows with the data")
+    return within_budget and bounded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[5000, 20000, 100000, 1000000]
+    )
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--duplicate-share", type=float, default=0.3)
+    args = parser.parse_args()
+    sys.exit(
+        0 if asyncio.run(main(args.sizes, args.latency, args.duplicate_share)) else 1
+    )
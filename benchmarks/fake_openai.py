@@ -0,0 +1,251 @@
+"""
+Local OpenAI-compatible stand-in for load tests: /v1/chat/completions with configurable latency,
+token rate and failure injection, so the real service can be measured without spending money.
+
+Configured through environment variables, read once when the app is created:
+
+    FAKE_OPENAI_LATENCY_MEDIAN   median seconds before the first token (lognormal), default 0.5
+    FAKE_OPENAI_LATENCY_SIGMA    sigma of the lognormal latency, 0 for a fixed latency, default 0.4
+    FAKE_OPENAI_TOKENS_PER_SECOND  completion token rate, default 80
+    FAKE_OPENAI_COMPLETION_TOKENS  completion tokens of free-text answers, default 200
+    FAKE_OPENAI_FAILURE_RATE     share of requests answered with a 500, default 0
+    FAKE_OPENAI_RATE_LIMIT_RATE  share of requests answered with a 429, default 0
+    FAKE_OPENAI_SEED             random seed, default 0
+
+    uvicorn benchmarks.fake_openai:create_app --factory --port 7800
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FILLER_WORDS = (
+    "engagement grew on the brand page while pricing complaints and delivery delays led the "
+    "negative comments and video posts drove most of the shares"
+).split()
+
+# Schema fields whose value steers the workflow, answered so every step runs
+FIELD_VALUES = {
+    "query_type": "analytical",
+    "error": "",
+    "helpful_message": "",
+}
+
+
+@dataclass
+class FakeOpenAIConfig:
+    latency_median: float = 0.5
+    latency_sigma: float = 0.4
+    tokens_per_second: float = 80
+    completion_tokens: int = 200
+    failure_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeOpenAIConfig":
+        return cls(
+            latency_median=float(os.environ.get("FAKE_OPENAI_LATENCY_MEDIAN", "0.5")),
+            latency_sigma=float(os.environ.get("FAKE_OPENAI_LATENCY_SIGMA", "0.4")),
+            tokens_per_second=float(
+                os.environ.get("FAKE_OPENAI_TOKENS_PER_SECOND", "80")
+            ),
+            completion_tokens=int(
+                os.environ.get("FAKE_OPENAI_COMPLETION_TOKENS", "200")
+            ),
+            failure_rate=float(os.environ.get("FAKE_OPENAI_FAILURE_RATE", "0")),
+            rate_limit_rate=float(os.environ.get("FAKE_OPENAI_RATE_LIMIT_RATE", "0")),
+            seed=int(os.environ.get("FAKE_OPENAI_SEED", "0")),
+        )
+
+    def to_env(self) -> Dict[str, str]:
+        return {
+            f"FAKE_OPENAI_{name.upper()}": str(value)
+            for name, value in self.__dict__.items()
+        }
+
+
+def filler_text(tokens: int) -> str:
+    return " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(tokens))
+
+
+def value_for_schema(
+    schema: Dict[str, Any], definitions: Dict[str, Any], name: str = ""
+) -> Any:
+    """A value matching a JSON schema, with FIELD_VALUES for the fields that steer the workflow"""
+    if "$ref" in schema:
+        schema = definitions[schema["$ref"].rsplit("/", 1)[-1]]
+    if "anyOf" in schema:
+        schema = next(
+            (option for option in schema["anyOf"] if option.get("type") != "null"),
+            schema["anyOf"][0],
+        )
+    if name in FIELD_VALUES:
+        return FIELD_VALUES[name]
+    if "enum" in schema:
+        return schema["enum"][0]
+    schema_type = schema.get("type", "string")
+    if schema_type == "object":
+        return {
+            key: value_for_schema(value, definitions, key)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        return [value_for_schema(schema.get("items", {}), definitions, name)]
+    if schema_type in ("integer", "number"):
+        return 1
+    if schema_type == "boolean":
+        return False
+    return filler_text(12)
+
+
+def completion_content(body: Dict[str, Any], completion_tokens: int) -> str:
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        return json.dumps(value_for_schema(schema, schema.get("$defs", {})))
+    if response_format.get("type") == "json_object":
+        return "{}"
+    return filler_text(completion_tokens)
+
+
+def prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return max(1, len(json.dumps(messages)) // 4)
+
+
+def completion_response(
+    base: Dict[str, Any], message: Dict[str, Any], usage: Dict[str, int]
+) -> Dict[str, Any]:
+    """A non-streamed chat completion with one choice"""
+    return {
+        **base,
+        "object": "chat.completion",
+        "choices": [
+            {
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }
+        ],
+        "usage": usage,
+    }
+
+
+async def completion_chunks(
+    base: Dict[str, Any],
+    message: Dict[str, Any],
+    usage: Dict[str, int],
+    first_token_latency: float,
+    token_interval: float,
+) -> AsyncIterator[str]:
+    """A streamed chat completion as SSE lines: the content word by word, then the usage"""
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+        choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+        payload = {**base, "object": "chat.completion.chunk", "choices": [choice]}
+        return f"data: {json.dumps(payload)}\n\n"
+
+    await asyncio.sleep(first_token_latency)
+    words = (message.get("content") or "").split(" ")
+    for index, word in enumerate(words if message.get("content") else []):
+        delta = {"content": word if index == 0 else f" {word}"}
+        if index == 0:
+            delta["role"] = "assistant"
+        yield chunk(delta)
+        await asyncio.sleep(token_interval)
+    if message.get("tool_calls"):
+        tool_calls = [
+            {**tool_call, "index": index}
+            for index, tool_call in enumerate(message["tool_calls"])
+        ]
+        yield chunk({"role": "assistant", "tool_calls": tool_calls})
+    yield chunk({}, "tool_calls" if message.get("tool_calls") else "stop")
+    usage_chunk = {
+        **base,
+        "object": "chat.completion.chunk",
+        "choices": [],
+        "usage": usage,
+    }
+    yield f"data: {json.dumps(usage_chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def completion_base(model: str) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "created": int(time.time()),
+        "model": model,
+    }
+
+
+def create_app(config: Optional[FakeOpenAIConfig] = None) -> FastAPI:
+    config = config or FakeOpenAIConfig.from_env()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Fake OpenAI")
+    app.state.requests = 0
+
+    def latency() -> float:
+        if config.latency_sigma <= 0:
+            return config.latency_median
+        return rng.lognormvariate(0, config.latency_sigma) * config.latency_median
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        draw = rng.random()
+        if draw < config.rate_limit_rate:
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "1"},
+                content={
+                    "error": {"message": "Rate limit reached", "type": "requests"}
+                },
+            )
+        if draw < config.rate_limit_rate + config.failure_rate:
+            await asyncio.sleep(latency())
+            return JSONResponse(
+                status_code=500,
+                content={
+                    "error": {"message": "Injected failure", "type": "server_error"}
+                },
+            )
+
+        content = completion_content(body, config.completion_tokens)
+        completion_tokens = len(content.split(" "))
+        usage = {
+            "prompt_tokens": prompt_tokens(body.get("messages", [])),
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens(body.get("messages", [])) + completion_tokens,
+        }
+        base = completion_base(body.get("model", "gpt-4o"))
+        message = {"role": "assistant", "content": content}
+        first_token_latency = latency()
+        token_interval = 1 / config.tokens_per_second
+
+        if not body.get("stream"):
+            await asyncio.sleep(
+                first_token_latency + completion_tokens * token_interval
+            )
+            return completion_response(base, message, usage)
+
+        return StreamingResponse(
+            completion_chunks(
+                base, message, usage, first_token_latency, token_interval
+            ),
+            media_type="text/event-stream",
+        )
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests}
+
+    return app
@@ -0,0 +1,418 @@
+"""
+End-to-end load test of src.server:app against the local OpenAI stand-in in benchmarks/fake_openai.py.
+
+The service and the stand-in run as uvicorn subprocesses with fresh stores. Concurrent /chat
+requests upload data/comments.txt and charts from data/charts, and the run reports p50/p95/p99
+time to first byte, time to first answer token and total latency, requests/sec and errors. The
+results are saved as JSON, and compared with an earlier result file when --baseline is given; the
+run then fails if p95 latency or throughput regressed by more than --max-regression.
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --charts 2
+    python -m benchmarks.load_test --baseline benchmarks/results/load_test-<commit>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fake_openai import FakeOpenAIConfig
+
+CHARTS_DIR = Path("data/charts")
+COMMENTS_FILE = Path("data/comments.txt")
+RESULTS_DIR = Path("benchmarks/results")
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class ChatResult:
+    ok: bool
+    ttfb: float
+    first_token: Optional[float]
+    latency: float
+    error: str = ""
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, None without values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    summary = {f"p{q}": percentile(values, q) for q in PERCENTILES}
+    summary["mean"] = sum(values) / len(values) if values else None
+    return {
+        key: round(value, 4) if value is not None else None
+        for key, value in summary.items()
+    }
+
+
+def scrape_counters(url: str, names: Tuple[str, ...]) -> Dict[str, float]:
+    """Counter samples from a Prometheus text page, keyed by sample name and labels"""
+    counters = {}
+    for line in httpx.get(url).text.splitlines():
+        sample, _, value = line.rpartition(" ")
+        if sample.startswith(names):
+            counters[sample] = float(value)
+    return counters
+
+
+def git_commit() -> Tuple[str, bool]:
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True
+        ).strip()
+        dirty = bool(
+            subprocess.check_output(
+                ["git", "status", "--porcelain", "--untracked-files=no"], text=True
+            ).strip()
+        )
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def upload_files(
+    index: int, charts: int, unique: bool
+) -> List[Tuple[str, Tuple[str, bytes, str]]]:
+    """Multipart files of one request: the comments and `charts` charts, cycling through the folder"""
+    marker = f"\nload test request {index}\n".encode() if unique else b""
+    files = [
+        ("files", ("comments.txt", COMMENTS_FILE.read_bytes() + marker, "text/plain"))
+    ]
+    chart_paths = sorted(CHARTS_DIR.glob("*.pdf"))
+    for offset in range(charts):
+        chart = chart_paths[(index + offset) % len(chart_paths)]
+        # Bytes after %%EOF are ignored by PDF readers but change the file digest
+        files.append(
+            ("files", (chart.name, chart.read_bytes() + marker, "application/pdf"))
+        )
+    return files
+
+
+async def chat(
+    client: httpx.AsyncClient, index: int, charts: int, unique: bool
+) -> ChatResult:
+    started = time.perf_counter()
+    ttfb = first_token = None
+    completed = False
+    error = ""
+    try:
+        async with client.stream(
+            "POST",
+            "/chat",
+            data={
+                "message": f"What are the main complaints and how did engagement evolve? ({index})"
+            },
+            files=upload_files(index, charts, unique),
+        ) as response:
+            buffer = ""
+            async for text in response.aiter_text():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+                buffer += text
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    if not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[len("data: ") :])
+                    if (
+                        event.get("event") == "RunResponseContent"
+                        and first_token is None
+                    ):
+                        first_token = time.perf_counter() - started
+                    elif event.get("event") == "RunError":
+                        error = str(event.get("content"))
+                    elif event.get("event") == "RunCompleted":
+                        completed = True
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    latency = time.perf_counter() - started
+    return ChatResult(
+        ok=completed and not error,
+        ttfb=ttfb if ttfb is not None else latency,
+        first_token=first_token,
+        latency=latency,
+        error=error,
+    )
+
+
+async def drive(
+    port: int,
+    requests: int,
+    concurrency: int,
+    charts: int,
+    unique: bool,
+    first_index: int = 0,
+) -> Tuple[List[ChatResult], float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_chat(index: int) -> ChatResult:
+        async with semaphore:
+            return await chat(client, index, charts, unique)
+
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}",
+        timeout=300,
+        limits=httpx.Limits(max_connections=concurrency),
+    ) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *[bounded_chat(first_index + i) for i in range(requests)]
+        )
+        wall_time = time.perf_counter() - started
+    return results, wall_time
+
+
+def wait_until_healthy(
+    url: str, process: subprocess.Popen, timeout: float = 120
+) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy")
+
+
+def start_server(
+    app: str, port: int, env: Dict[str, str], workers: int = 1, factory: bool = False
+):
+    command = [sys.executable, "-m", "uvicorn", app, "--port", str(port)]
+    command += ["--workers", str(workers), "--log-level", "warning"]
+    if factory:
+        command.append("--factory")
+    return subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def fresh_service_env(openai_port: int, overrides: List[str]) -> Dict[str, str]:
+    """Service environment with empty stores in a temporary folder and the model API on `openai_port`"""
+    work_dir = Path(tempfile.mkdtemp(prefix="load_test_"))
+    service_env = {
+        **os.environ,
+        "OPENAI_API_KEY": "load-test",
+        "HUGGINGFACE_API_KEY": os.environ.get("HUGGINGFACE_API_KEY", "load-test"),
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "BLOB_STORE_PATH": str(work_dir / "blobs"),
+        "CHROMA_DB_PERSISTENT_PATH": str(work_dir / "chroma"),
+        "EXTRACTION_CACHE_DB_FILE": str(work_dir / "extraction_cache.db"),
+        "PREPARED_FILES_DB_FILE": str(work_dir / "prepared_files.db"),
+        "EMBEDDING_CACHE_DB_FILE": str(work_dir / "embedding_cache.db"),
+        "ANSWER_CACHE_DB_FILE": str(work_dir / "answer_cache.db"),
+        "SESSION_STORE_DB_FILE": str(work_dir / "sessions.db"),
+        "CONVERSATION_DB_FILE": str(work_dir / "conversations.db"),
+        "RUN_TRACES_ENABLED": "false",
+    }
+    for override in overrides:
+        key, _, value = override.partition("=")
+        service_env[key] = value
+    return service_env
+
+
+def run(args: argparse.Namespace) -> Dict:
+    fake_config = FakeOpenAIConfig(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    service_env = fresh_service_env(args.fake_port, args.env)
+
+    fake = start_server(
+        "benchmarks.fake_openai:create_app",
+        args.fake_port,
+        {**os.environ, **fake_config.to_env()},
+        factory=True,
+    )
+    service = None
+    try:
+        wait_until_healthy(f"http://127.0.0.1:{args.fake_port}/stats", fake)
+        service = start_server(
+            "src.server:app", args.port, service_env, workers=args.workers
+        )
+        wait_until_healthy(f"http://127.0.0.1:{args.port}/health", service)
+
+        if args.warmup:
+            asyncio.run(
+                drive(
+                    args.port,
+                    args.warmup,
+                    args.concurrency,
+                    args.charts,
+                    True,
+                    -args.warmup,
+                )
+            )
+        model_requests_before = httpx.get(
+            f"http://127.0.0.1:{args.fake_port}/stats"
+        ).json()["requests"]
+        results, wall_time = asyncio.run(
+            drive(
+                args.port,
+                args.requests,
+                args.concurrency,
+                args.charts,
+                not args.repeat_uploads,
+            )
+        )
+        model_requests = (
+            httpx.get(f"http://127.0.0.1:{args.fake_port}/stats").json()["requests"]
+            - model_requests_before
+        )
+        # Per worker process: complete only with a single worker
+        service_counters = scrape_counters(
+            f"http://127.0.0.1:{args.port}/metrics",
+            ("workflow_runs_total", "llm_request_errors_total"),
+        )
+    finally:
+        for process in (service, fake):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    ok = [result for result in results if result.ok]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if not result.ok:
+            errors[result.error or "incomplete"] = (
+                errors.get(result.error or "incomplete", 0) + 1
+            )
+    commit, dirty = git_commit()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "charts_per_request": args.charts,
+            "unique_uploads": not args.repeat_uploads,
+            "env": args.env,
+            "fake_openai": asdict(fake_config),
+        },
+        "results": {
+            "wall_time_seconds": round(wall_time, 4),
+            "requests_per_second": round(len(results) / wall_time, 4),
+            "successful": len(ok),
+            "errors": errors,
+            "model_requests_per_chat": round(model_requests / len(results), 3),
+            "service_counters": service_counters,
+            "ttfb_seconds": summarize([result.ttfb for result in ok]),
+            "first_token_seconds": summarize(
+                [result.first_token for result in ok if result.first_token is not None]
+            ),
+            "latency_seconds": summarize([result.latency for result in ok]),
+        },
+    }
+
+
+def compare(report: Dict, baseline: Dict, max_regression: float) -> bool:
+    """Print the changes from a baseline result, False if p95 latency or throughput regressed"""
+    passed = True
+    print(f"\ncompared with {baseline['commit'][:12]} ({baseline['timestamp']}):")
+    checks = [
+        ("requests_per_second", None, False),
+        *[("ttfb_seconds", f"p{q}", True) for q in PERCENTILES],
+        *[("latency_seconds", f"p{q}", True) for q in PERCENTILES],
+    ]
+    for metric, key, lower_is_better in checks:
+        before = baseline["results"][metric]
+        after = report["results"][metric]
+        if key:
+            before, after = before.get(key), after.get(key)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        regressed = (
+            change > max_regression if lower_is_better else change < -max_regression
+        )
+        gated = metric != "ttfb_seconds" and key in (None, "p95")
+        label = f"{metric}{'.' + key if key else ''}"
+        flag = "  REGRESSION" if regressed and gated else ""
+        print(f"  {label:28} {before:>10.4f} -> {after:>10.4f} ({change:+.1%}){flag}")
+        passed = passed and not (regressed and gated)
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--charts", type=int, default=2, help="charts uploaded with each request"
+    )
+    parser.add_argument(
+        "--repeat-uploads",
+        action="store_true",
+        help="upload identical files, so caches hit",
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=2, help="requests sent before measuring"
+    )
+    parser.add_argument("--latency-median", type=float, default=0.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="service setting override",
+    )
+    parser.add_argument("--port", type=int, default=7791)
+    parser.add_argument("--fake-port", type=int, default=7792)
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="defaults to benchmarks/results/load_test-<commit>.json",
+    )
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or RESULTS_DIR / f"load_test-{report['commit'][:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(report["results"], indent=2))
+    print(f"saved to {output}")
+
+    passed = True
+    if args.baseline:
+        passed = compare(
+            report, json.loads(args.baseline.read_text()), args.max_regression
+        )
+    sys.exit(0 if passed else 1)
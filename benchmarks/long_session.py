@@ -0,0 +1,156 @@
+"""
+Load test: prompt size and latency of the analyst agent must stay flat over a long session.
+
+One session sends --turns /chat requests in a row through the real service with stand-in agents.
+The stand-in data scientist writes long reports, the stand-in summarizer shortens the summary
+it is given, and the stand-in analyst measures the tokens of the conversation context it receives.
+The run fails if any turn's context exceeds CONVERSATION_MEMORY_TOKEN_BUDGET or if the last turns
+are noticeably slower than the first ones.
+
+    python -m benchmarks.long_session --turns 40 --report-tokens 3000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+work_dir = tempfile.mkdtemp(prefix="long_session_")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+os.environ.setdefault("RETRIEVAL_EXTRACTION", "false")
+os.environ.setdefault("CONVERSATION_MEMORY", "summary")
+os.environ.setdefault(
+    "CONVERSATION_DB_FILE", os.path.join(work_dir, "conversations.db")
+)
+os.environ.setdefault("SESSION_STORE_DB_FILE", os.path.join(work_dir, "sessions.db"))
+os.environ.setdefault("BLOB_STORE_PATH", os.path.join(work_dir, "blobs"))
+os.environ.setdefault(
+    "EXTRACTION_CACHE_DB_FILE", os.path.join(work_dir, "extraction_cache.db")
+)
+os.environ.setdefault(
+    "PREPARED_FILES_DB_FILE", os.path.join(work_dir, "prepared_files.db")
+)
+os.environ.setdefault(
+    "EMBEDDING_CACHE_DB_FILE", os.path.join(work_dir, "embedding_cache.db")
+)
+os.environ.setdefault("ANSWER_CACHE_DB_FILE", os.path.join(work_dir, "answer_cache.db"))
+
+import httpx  # noqa: E402
+from agno.run.response import RunResponseContentEvent  # noqa: E402
+
+from benchmarks.concurrent_chat import (  # noqa: E402
+    DATA_ANALYST,
+    DATA_SCIENTIST,
+    install_stand_in_agents,
+    stand_in,
+)
+from src.agents import conversation_summarizer_agent  # noqa: E402
+from src.agents.data_analyst_agent import DataAnalystAgentResponse  # noqa: E402
+from src.config import app_settings  # noqa: E402
+from src.memory.conversation_memory import conversation_memory  # noqa: E402
+from src.processing.tokens import count_tokens  # noqa: E402
+from src.server import app  # noqa: E402
+
+
+def install_long_session_agents(latency: float, report_tokens: int) -> list:
+    """Stand-ins for a long session, returning the list the analyst's context sizes go to"""
+    install_stand_in_agents(latency)
+    context_tokens = []
+
+    async def analyst_arun(message, messages=None, **kwargs):
+        context_tokens.append(sum(count_tokens(str(m.content)) for m in messages or []))
+        await asyncio.sleep(latency)
+        return SimpleNamespace(
+            content=DataAnalystAgentResponse(
+                query_type="analytical",
+                query_content=message,
+                helpful_message="",
+                information_extract_guidelines="Extract the main complaints.",
+            )
+        )
+
+    async def scientist_arun(message, stream=False, **kwargs):
+        async def tokens():
+            await asyncio.sleep(latency)
+            yield RunResponseContentEvent(
+                content="Pricing is the top complaint. " * (report_tokens // 7)
+            )
+
+        return tokens()
+
+    async def summarizer_arun(message, **kwargs):
+        await asyncio.sleep(latency)
+        return SimpleNamespace(
+            content=message[-app_settings.CONVERSATION_SUMMARY_TOKENS * 2 :]
+        )
+
+    stand_in(DATA_ANALYST, analyst_arun)
+    stand_in(DATA_SCIENTIST, scientist_arun)
+    stand_in(conversation_summarizer_agent.name, summarizer_arun)
+    return context_tokens
+
+
+async def main(turns: int, latency: float, report_tokens: int) -> bool:
+    context_tokens = install_long_session_agents(latency, report_tokens)
+    comments = await asyncio.to_thread(Path("data/comments.txt").read_bytes)
+
+    latencies = []
+    session_id = "long-session"
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=120
+    ) as client:
+        for turn in range(turns):
+            started = time.perf_counter()
+            response = await client.post(
+                "/chat",
+                data={
+                    "message": f"What changed in the complaints? ({turn})",
+                    "session_id": session_id,
+                },
+                files={"files": ("comments.txt", comments, "text/plain")},
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+            await conversation_memory.wait_for_updates()
+
+    window = max(1, turns // 4)
+    first, last = latencies[1 : window + 1], latencies[-window:]
+    history_tokens = 3 * (
+        report_tokens + count_tokens("What changed in the complaints?")
+    )
+    print(f"turns:                       {turns}")
+    print(f"context tokens per turn:     {context_tokens}")
+    print(
+        f"token budget:                {app_settings.CONVERSATION_MEMORY_TOKEN_BUDGET}"
+    )
+    print(f"last 3 raw runs would cost:  ~{history_tokens} tokens")
+    print(
+        f"latency first {window} turns:   {statistics.median(first) * 1000:.1f}ms median"
+    )
+    print(
+        f"latency last {window} turns:    {statistics.median(last) * 1000:.1f}ms median"
+    )
+
+    within_budget = max(context_tokens) <= app_settings.CONVERSATION_MEMORY_TOKEN_BUDGET
+    flat_latency = statistics.median(last) <= 1.5 * statistics.median(first)
+    print("context within budget" if within_budget else "context over budget")
+    print("latency flat" if flat_latency else "latency grows with the session")
+    return within_budget and flat_latency
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--report-tokens", type=int, default=3000)
+    args = parser.parse_args()
+    sys.exit(
+        0 if asyncio.run(main(args.turns, args.latency, args.report_tokens)) else 1
+    )
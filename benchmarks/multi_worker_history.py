@@ -0,0 +1,174 @@
+"""
+Load test: several uvicorn workers must write conversation history concurrently without lock errors.
+
+The service runs under `uvicorn --workers N` with stand-in agents, every /chat request uses its own
+session, and all workers share the same SQLite conversation store. The run fails if any request
+errors, if a session is missing from the store, or, when there are spare CPUs for the workers,
+if N workers are slower than one.
+
+    python -m benchmarks.multi_worker_history --workers 4 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+os.environ.setdefault("RETRIEVAL_EXTRACTION", "false")
+# New sessions asking the same question would share one run, and only its session is written
+os.environ.setdefault("COALESCE_IDENTICAL_REQUESTS", "false")
+
+import httpx
+
+
+def create_app():
+    """App factory for the uvicorn workers: the real service with stand-in agents"""
+    from benchmarks.concurrent_chat import install_stand_in_agents
+    from src.server import app
+
+    install_stand_in_agents(float(os.environ.get("BENCHMARK_LATENCY", "0.02")))
+    return app
+
+
+async def chat(client: httpx.AsyncClient, session_id: str, comments: bytes) -> bool:
+    """Send one chat request, True when it completed without a RunError"""
+    completed = False
+    async with client.stream(
+        "POST",
+        "/chat",
+        data={"message": "What are the main complaints?", "session_id": session_id},
+        files={"files": ("comments.txt", comments, "text/plain")},
+    ) as response:
+        if response.status_code != 200:
+            return False
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: ") :])
+            if event.get("event") == "RunError":
+                print(f"RunError: {event.get('content')}")
+                return False
+            completed = completed or event.get("event") == "RunCompleted"
+    return completed
+
+
+async def load(port: int, requests: int, concurrency: int, comments: bytes):
+    semaphore = asyncio.Semaphore(concurrency)
+    session_ids = [str(uuid.uuid4()) for _ in range(requests)]
+
+    async def bounded_chat(session_id: str) -> bool:
+        async with semaphore:
+            return await chat(client, session_id, comments)
+
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", timeout=120
+    ) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(*[bounded_chat(s) for s in session_ids])
+        wall_time = time.perf_counter() - started
+    return session_ids, results, wall_time
+
+
+def wait_until_healthy(port: int, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def run(workers: int, requests: int, concurrency: int, port: int, latency: float):
+    """Run the load against `workers` uvicorn workers sharing a fresh conversation store"""
+    work_dir = tempfile.mkdtemp(prefix="multi_worker_history_")
+    db_file = os.path.join(work_dir, "conversations.db")
+    env = {
+        **os.environ,
+        "CONVERSATION_DB_FILE": db_file,
+        "SESSION_STORE_DB_FILE": os.path.join(work_dir, "sessions.db"),
+        "EXTRACTION_CACHE_DB_FILE": os.path.join(work_dir, "extraction_cache.db"),
+        "BENCHMARK_LATENCY": str(latency),
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "benchmarks.multi_worker_history:create_app",
+            "--factory",
+            "--workers",
+            str(workers),
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    try:
+        wait_until_healthy(port)
+        with open("data/comments.txt", "rb") as comments_file:
+            comments = comments_file.read()
+        session_ids, results, wall_time = asyncio.run(
+            load(port, requests, concurrency, comments)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    with sqlite3.connect(db_file) as conn:
+        stored = {
+            row[0] for row in conn.execute("SELECT session_id FROM workflow_test")
+        }
+    missing = [session_id for session_id in session_ids if session_id not in stored]
+    return wall_time, results.count(False), len(missing)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=7790)
+    args = parser.parse_args()
+
+    throughputs = {}
+    passed = True
+    for workers in sorted({1, args.workers}):
+        wall_time, errors, missing = run(
+            workers, args.requests, args.concurrency, args.port, args.latency
+        )
+        throughputs[workers] = args.requests / wall_time
+        print(
+            f"{workers} worker(s): {args.requests} requests in {wall_time:.2f}s "
+            f"({throughputs[workers]:.1f} req/s), {errors} errors, "
+            f"{missing} sessions missing from the store"
+        )
+        passed = passed and errors == 0 and missing == 0
+
+    cpus = len(os.sched_getaffinity(0))
+    if cpus <= args.workers:
+        print(
+            f"only {cpus} CPU(s) for {args.workers} workers and the client: "
+            "throughput comparison skipped"
+        )
+    elif throughputs[args.workers] < throughputs[1]:
+        print("history writes were serialized across workers")
+        passed = False
+    print(
+        "history written by every worker" if passed else "multi-worker history failed"
+    )
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,95 @@
+"""
+Evaluation of the local query classifier on the labeled query set.
+
+The classifier is trained on the training file and scored on a held-out set: overall accuracy,
+how many queries it decides locally, the accuracy of those decisions, and per-query latency.
+An analytical query declined as off-topic is the costly mistake, so any of them fails the run.
+
+    python -m benchmarks.query_classifier --eval-file data/queries/eval.jsonl
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+
+from src.config import app_settings
+from src.processing.query_classifier import (
+    ANALYTICAL,
+    OTHER,
+    QueryClassifier,
+)
+
+
+def main(train_file: str, eval_file: str, threshold: float) -> bool:
+    started = time.perf_counter()
+    classifier = QueryClassifier.from_jsonl(train_file, threshold)
+    training_time = time.perf_counter() - started
+
+    with open(eval_file, encoding="utf-8") as stream:
+        rows = [json.loads(line) for line in stream if line.strip()]
+
+    latencies = []
+    correct = 0
+    decided = {ANALYTICAL: [], OTHER: []}
+    for row in rows:
+        started = time.perf_counter()
+        query_type = classifier.classify(row["query"])
+        latencies.append(time.perf_counter() - started)
+
+        probability = classifier.predict_proba(row["query"])
+        correct += (ANALYTICAL if probability >= 0.5 else OTHER) == row["label"]
+        if query_type is not None:
+            decided[query_type].append(row)
+
+    decided_rows = decided[ANALYTICAL] + decided[OTHER]
+    decided_correct = sum(
+        row["label"] == query_type
+        for query_type in decided
+        for row in decided[query_type]
+    )
+    false_rejections = [row["query"] for row in decided[OTHER] if row["label"] != OTHER]
+    other_count = sum(row["label"] == OTHER for row in rows)
+    latencies.sort()
+
+    print(f"training:              {training_time * 1000:.1f}ms")
+    print(f"eval queries:          {len(rows)} ({other_count} off-topic)")
+    print(f"accuracy:              {correct / len(rows):.1%}")
+    print(
+        f"decided locally:       {len(decided_rows)}/{len(rows)} (threshold {threshold})"
+    )
+    print(f"  accuracy:            {decided_correct / max(len(decided_rows), 1):.1%}")
+    print(
+        f"  off-topic declined:  {len(decided[OTHER])}/{other_count} without a model call"
+    )
+    print(
+        f"latency p50/p95/max:   {statistics.median(latencies) * 1000:.3f}ms / "
+        f"{latencies[int(len(latencies) * 0.95)] * 1000:.3f}ms / {latencies[-1] * 1000:.3f}ms"
+    )
+    for query in false_rejections:
+        print(f"analytical query declined: {query!r}")
+
+    return not false_rejections
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--train-file", default=app_settings.QUERY_CLASSIFIER_TRAINING_FILE
+    )
+    parser.add_argument("--eval-file", default="data/queries/eval.jsonl")
+    parser.add_argument(
+        "--threshold", type=float, default=app_settings.QUERY_CLASSIFIER_THRESHOLD
+    )
+    args = parser.parse_args()
+
+    passed = main(args.train_file, args.eval_file, args.threshold)
+    print(
+        "no analytical query declined" if passed else "analytical queries were declined"
+    )
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,192 @@
+"""
+Record/replay OpenAI-compatible server for evaluations: /v1/chat/completions answered from a
+cassette of real completions, so the same evaluation can be re-run without network or cost.
+
+In record mode, requests are forwarded to the upstream API and each completion is appended to the
+cassette with its usage and latency. In replay mode, completions are looked up by a digest of the
+model, messages, response format and tools, and sent back, streamed or not, after the recorded
+latency. Requests missing from the cassette are answered with a 404, or with a benchmarks.fake_openai
+completion when misses are set to "fake" to check an evaluation end to end without recordings.
+
+Configured through environment variables, read once when the app is created:
+
+    REPLAY_OPENAI_CASSETTE       JSONL file of recorded completions, default benchmarks/cassettes/routing.jsonl
+    REPLAY_OPENAI_MODE           record or replay, default replay
+    REPLAY_OPENAI_UPSTREAM       upstream API in record mode, default https://api.openai.com/v1
+    REPLAY_OPENAI_API_KEY        upstream API key in record mode
+    REPLAY_OPENAI_ON_MISS        error or fake, default error
+    REPLAY_OPENAI_LATENCY_SCALE  factor applied to recorded latencies, default 1
+
+    uvicorn benchmarks.replay_openai:create_app --factory --port 7801
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.fake_openai import (
+    completion_base,
+    completion_chunks,
+    completion_content,
+    completion_response,
+    prompt_tokens,
+)
+
+
+@dataclass
+class ReplayOpenAIConfig:
+    cassette: str = "benchmarks/cassettes/routing.jsonl"
+    mode: str = "replay"
+    upstream: str = "https://api.openai.com/v1"
+    api_key: str = ""
+    on_miss: str = "error"
+    latency_scale: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "ReplayOpenAIConfig":
+        return cls(
+            cassette=os.environ.get("REPLAY_OPENAI_CASSETTE", cls.cassette),
+            mode=os.environ.get("REPLAY_OPENAI_MODE", cls.mode),
+            upstream=os.environ.get("REPLAY_OPENAI_UPSTREAM", cls.upstream),
+            api_key=os.environ.get("REPLAY_OPENAI_API_KEY", ""),
+            on_miss=os.environ.get("REPLAY_OPENAI_ON_MISS", cls.on_miss),
+            latency_scale=float(os.environ.get("REPLAY_OPENAI_LATENCY_SCALE", "1")),
+        )
+
+    def to_env(self) -> Dict[str, str]:
+        return {
+            f"REPLAY_OPENAI_{name.upper()}": str(value)
+            for name, value in self.__dict__.items()
+        }
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Digest of the parts of a request that decide its completion"""
+    identity = {
+        name: body.get(name)
+        for name in ("model", "messages", "response_format", "tools")
+    }
+    return hashlib.sha256(
+        json.dumps(identity, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def append_to_cassette(path: Path, entry: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as cassette:
+        cassette.write(json.dumps(entry) + "\n")
+
+
+def load_cassette(path: Path) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    with path.open() as cassette:
+        entries = [json.loads(line) for line in cassette if line.strip()]
+    return {entry["key"]: entry for entry in entries}
+
+
+def create_app(config: Optional[ReplayOpenAIConfig] = None) -> FastAPI:
+    config = config or ReplayOpenAIConfig.from_env()
+    cassette_path = Path(config.cassette)
+    recordings = load_cassette(cassette_path)
+    app = FastAPI(title="Replay OpenAI")
+    app.state.stats = {"requests": 0, "hits": 0, "misses": 0, "recorded": 0}
+    record_lock = asyncio.Lock()
+
+    async def record(body: Dict[str, Any], key: str) -> Dict[str, Any]:
+        upstream_body = {
+            name: value
+            for name, value in body.items()
+            if name not in ("stream", "stream_options")
+        }
+        started = time.perf_counter()
+        async with httpx.AsyncClient(timeout=600) as client:
+            response = await client.post(
+                f"{config.upstream}/chat/completions",
+                json=upstream_body,
+                headers={"Authorization": f"Bearer {config.api_key}"},
+            )
+        response.raise_for_status()
+        completion = response.json()
+        entry = {
+            "key": key,
+            "model": body.get("model"),
+            "message": completion["choices"][0]["message"],
+            "usage": completion["usage"],
+            "latency": round(time.perf_counter() - started, 4),
+        }
+        async with record_lock:
+            await asyncio.to_thread(append_to_cassette, cassette_path, entry)
+            recordings[key] = entry
+            app.state.stats["recorded"] += 1
+        return entry
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        key = request_key(body)
+        app.state.stats["requests"] += 1
+        entry = recordings.get(key)
+        if entry is not None:
+            app.state.stats["hits"] += 1
+            await asyncio.sleep(entry["latency"] * config.latency_scale)
+        elif config.mode == "record":
+            try:
+                entry = await record(body, key)
+            except httpx.HTTPError as e:
+                return JSONResponse(
+                    status_code=502,
+                    content={
+                        "error": {
+                            "message": f"Upstream failed: {e}",
+                            "type": "upstream",
+                        }
+                    },
+                )
+        else:
+            app.state.stats["misses"] += 1
+            if config.on_miss != "fake":
+                return JSONResponse(
+                    status_code=404,
+                    content={
+                        "error": {
+                            "message": f"No recording for request {key}",
+                            "type": "cassette_miss",
+                        }
+                    },
+                )
+            content = completion_content(body, 200)
+            completion_tokens = len(content.split(" "))
+            entry = {
+                "message": {"role": "assistant", "content": content},
+                "usage": {
+                    "prompt_tokens": prompt_tokens(body.get("messages", [])),
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens(body.get("messages", []))
+                    + completion_tokens,
+                },
+            }
+
+        base = completion_base(body.get("model", "gpt-4o"))
+        if not body.get("stream"):
+            return completion_response(base, entry["message"], entry["usage"])
+        return StreamingResponse(
+            # The recorded latency covers the whole completion, already waited for
+            completion_chunks(base, entry["message"], entry["usage"], 0, 0),
+            media_type="text/event-stream",
+        )
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
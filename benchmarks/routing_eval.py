@@ -0,0 +1,250 @@
+"""
+Evaluation: quality, latency and cost of each model routing policy on the cases in data/evals.
+
+Each case is a query with files from data/ and the terms a good answer mentions. For every policy
+in --policies, a fresh src.server:app with MODEL_ROUTING_POLICY set runs the cases one by one
+against benchmarks/replay_openai.py, and the run reports the share of expected terms found in each
+answer, the latency, and the model cost, tokens, routes and escalations from /metrics. The results
+are saved as JSON.
+
+Recordings are made once with an API key, then replayed at no cost:
+
+    REPLAY_OPENAI_API_KEY=sk-... python -m benchmarks.routing_eval --mode record
+    python -m benchmarks.routing_eval
+    python -m benchmarks.routing_eval --on-miss fake   # without recordings, to check the harness
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_test import (
+    RESULTS_DIR,
+    fresh_service_env,
+    git_commit,
+    scrape_counters,
+    start_server,
+    summarize,
+    wait_until_healthy,
+)
+from benchmarks.replay_openai import ReplayOpenAIConfig
+
+POLICIES = ("large", "small", "cascade")
+COUNTERS = (
+    "llm_cost_usd_total",
+    "llm_tokens_total",
+    "llm_routes_total",
+    "llm_escalations_total",
+    "llm_request_errors_total",
+)
+MIME_TYPES = {".txt": "text/plain", ".csv": "text/csv", ".pdf": "application/pdf"}
+
+
+def load_cases(path: Path) -> List[Dict]:
+    with path.open() as cases:
+        return [json.loads(line) for line in cases if line.strip()]
+
+
+def term_recall(answer: str, expected_terms: List[str]) -> float:
+    """Share of the expected terms found in the answer, ignoring case"""
+    if not expected_terms:
+        return 1.0
+    answer = answer.lower()
+    return sum(term.lower() in answer for term in expected_terms) / len(expected_terms)
+
+
+async def run_case(client: httpx.AsyncClient, case: Dict) -> Dict:
+    files = [
+        (
+            "files",
+            (Path(path).name, Path(path).read_bytes(), MIME_TYPES[Path(path).suffix]),
+        )
+        for path in case["files"]
+    ]
+    started = time.perf_counter()
+    answer, error = "", ""
+    async with client.stream(
+        "POST", "/chat", data={"message": case["query"]}, files=files or None
+    ) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: ") :])
+            if event.get("event") == "RunCompleted":
+                answer = str(event.get("content") or "")
+            elif event.get("event") == "RunError":
+                error = str(event.get("content"))
+        if response.status_code != 200:
+            error = f"HTTP {response.status_code}"
+    return {
+        "id": case["id"],
+        "quality": round(term_recall(answer, case["expected_terms"]), 4),
+        "latency": round(time.perf_counter() - started, 4),
+        "error": error,
+        "answer": answer,
+    }
+
+
+async def run_cases(port: int, cases: List[Dict]) -> List[Dict]:
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", timeout=600
+    ) as client:
+        return [await run_case(client, case) for case in cases]
+
+
+def counter_total(counters: Dict[str, float], name: str, **labels: str) -> float:
+    return sum(
+        value
+        for sample, value in counters.items()
+        if sample.startswith(name)
+        and all(f'{key}="{label}"' in sample for key, label in labels.items())
+    )
+
+
+def evaluate_policy(policy: str, cases: List[Dict], args: argparse.Namespace) -> Dict:
+    service = start_server(
+        "src.server:app",
+        args.port,
+        fresh_service_env(
+            args.replay_port,
+            [
+                f"MODEL_ROUTING_POLICY={policy}",
+                "ANSWER_CACHE_ENABLED=false",
+                "COALESCE_IDENTICAL_REQUESTS=false",
+                *args.env,
+            ],
+        ),
+    )
+    try:
+        wait_until_healthy(f"http://127.0.0.1:{args.port}/health", service)
+        replay_url = f"http://127.0.0.1:{args.replay_port}/stats"
+        replay_before = httpx.get(replay_url).json()
+        results = asyncio.run(run_cases(args.port, cases))
+        replay_after = httpx.get(replay_url).json()
+        counters = scrape_counters(f"http://127.0.0.1:{args.port}/metrics", COUNTERS)
+    finally:
+        service.terminate()
+        service.wait()
+
+    return {
+        "policy": policy,
+        "quality": round(
+            sum(result["quality"] for result in results) / len(results), 4
+        ),
+        "errors": sum(bool(result["error"]) for result in results),
+        "latency_seconds": summarize([result["latency"] for result in results]),
+        "cost_usd": round(counter_total(counters, "llm_cost_usd_total"), 6),
+        "tokens": {
+            kind: int(counter_total(counters, "llm_tokens_total", kind=kind))
+            for kind in ("prompt", "completion")
+        },
+        "escalations": int(counter_total(counters, "llm_escalations_total")),
+        "model_errors": int(counter_total(counters, "llm_request_errors_total")),
+        "replay": {key: replay_after[key] - replay_before[key] for key in replay_after},
+        "counters": counters,
+        "cases": results,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict:
+    cases = load_cases(args.cases)
+    replay_config = ReplayOpenAIConfig(
+        cassette=str(args.cassette),
+        mode=args.mode,
+        api_key=os.environ.get("REPLAY_OPENAI_API_KEY", ""),
+        on_miss=args.on_miss,
+        latency_scale=args.latency_scale,
+    )
+    replay = start_server(
+        "benchmarks.replay_openai:create_app",
+        args.replay_port,
+        {**os.environ, **replay_config.to_env()},
+        factory=True,
+    )
+    try:
+        wait_until_healthy(f"http://127.0.0.1:{args.replay_port}/stats", replay)
+        policies = [evaluate_policy(policy, cases, args) for policy in args.policies]
+    finally:
+        replay.terminate()
+        replay.wait()
+
+    commit, dirty = git_commit()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {
+            "cases": str(args.cases),
+            "cassette": str(args.cassette),
+            "mode": args.mode,
+            "on_miss": args.on_miss,
+            "latency_scale": args.latency_scale,
+            "env": args.env,
+        },
+        "policies": policies,
+    }
+
+
+def print_table(report: Dict) -> None:
+    print(
+        f"{'policy':>8} {'quality':>8} {'errors':>7} {'p50':>8} {'p95':>8} "
+        f"{'cost $':>10} {'prompt tok':>11} {'escalations':>12} {'misses':>7}"
+    )
+    for result in report["policies"]:
+        latency = result["latency_seconds"]
+        print(
+            f"{result['policy']:>8} {result['quality']:>8.2f} {result['errors']:>7} "
+            f"{latency['p50']:>7.2f}s {latency['p95']:>7.2f}s {result['cost_usd']:>10.4f} "
+            f"{result['tokens']['prompt']:>11} {result['escalations']:>12} "
+            f"{result['replay'].get('misses', 0):>7}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=Path, default=Path("data/evals/routing.jsonl"))
+    parser.add_argument(
+        "--cassette", type=Path, default=Path(ReplayOpenAIConfig.cassette)
+    )
+    parser.add_argument("--mode", choices=("record", "replay"), default="replay")
+    parser.add_argument("--on-miss", choices=("error", "fake"), default="error")
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="factor applied to recorded latencies",
+    )
+    parser.add_argument("--policies", nargs="+", choices=POLICIES, default=POLICIES)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="service setting override",
+    )
+    parser.add_argument("--port", type=int, default=7793)
+    parser.add_argument("--replay-port", type=int, default=7794)
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="defaults to benchmarks/results/routing_eval-<commit>.json",
+    )
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or RESULTS_DIR / f"routing_eval-{report['commit'][:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print_table(report)
+    print(f"saved to {output}")
+    errors = sum(result["errors"] for result in report["policies"])
+    sys.exit(0 if not errors else 1)
@@ -0,0 +1,142 @@
+"""
+Benchmark: follow-up turns of a session analyze the session's documents without uploading them
+again, and the workspace quota evicts the least recently used documents.
+
+The agents' model calls are replaced by the stand-ins of benchmarks.concurrent_chat, each taking
+--latency seconds. A first turn uploads the sample comments and a chart, then a follow-up sends no
+files; its latency and the bytes it uploaded are compared to a follow-up re-uploading the files.
+Documents are then added through the workspace routes of the session over a quota of two, and the
+workspace must keep the two most recently used, and a /chat turn sending three files must be
+rejected with a 413. The run fails unless the follow-up is answered from the workspace, eviction
+keeps the right documents and the turn over the quota is rejected.
+
+    python -m benchmarks.session_workspace --latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.concurrent_chat import install_stand_in_agents
+from benchmarks.upload_preparation import upload_files
+from src.memory.session_workspace import session_workspace
+from src.server import app
+
+TEAM_ID = "social-media-team"
+
+
+async def ask(client: httpx.AsyncClient, data: dict, files: list = None) -> dict:
+    """The RunCompleted event of a /chat request, with its latency and uploaded bytes"""
+    started = time.perf_counter()
+    completed = {}
+    async with client.stream("POST", "/chat", data=data, files=files) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: ") :])
+            if event.get("event") in ("RunCompleted", "RunError"):
+                completed = event
+    completed["latency"] = time.perf_counter() - started
+    completed["uploaded_bytes"] = sum(len(file[1][1]) for file in files or [])
+    return completed
+
+
+async def main(latency: float, port: int) -> bool:
+    install_stand_in_agents(latency)
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    run_id = time.time_ns()
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", timeout=120
+    ) as client:
+        first_turn = await ask(
+            client,
+            {"message": "What are the main complaints?"},
+            upload_files(f"{run_id}-a"),
+        )
+        session_id = first_turn["session_id"]
+        follow_up = await ask(
+            client,
+            {"message": "How did engagement evolve?", "session_id": session_id},
+        )
+        re_uploaded = await ask(
+            client,
+            {"message": "Which topics come up most?", "session_id": session_id},
+            upload_files(f"{run_id}-a"),
+        )
+
+        documents_url = (
+            f"/v1/playground/teams/{TEAM_ID}/sessions/{session_id}/documents"
+        )
+        documents = (await client.get(documents_url)).json()
+
+        session_workspace.max_session_documents = 2
+        added = []
+        for index in range(3):
+            response = await client.post(
+                documents_url, files=upload_files(f"{run_id}-quota-{index}")[:1]
+            )
+            response.raise_for_status()
+            added.append(response.json()[-1]["file_id"])
+        kept = [
+            document["file_id"] for document in (await client.get(documents_url)).json()
+        ]
+        removed = (await client.delete(f"{documents_url}/{kept[0]}")).status_code
+        over_quota = (
+            await client.post(
+                "/chat",
+                data={"message": "Compare these files", "session_id": session_id},
+                files=upload_files(f"{run_id}-over-a")
+                + upload_files(f"{run_id}-over-b")[:1],
+            )
+        ).status_code
+
+    server.should_exit = True
+    await server_task
+
+    print(f"model call latency: {latency}s\n")
+    print(f"{'':<28} {'latency':>8} {'uploaded':>12}")
+    for label, turn in [
+        ("first turn", first_turn),
+        ("follow-up, no files", follow_up),
+        ("follow-up, files re-sent", re_uploaded),
+    ]:
+        print(f"{label:<28} {turn['latency']:>7.3f}s {turn['uploaded_bytes']:>10} B")
+    print(f"\ndocuments in the session: {[document['name'] for document in documents]}")
+    print(f"kept over a quota of 2: {len(kept)} (newest {kept == added[1:]})")
+    print(f"/chat with 3 files over a quota of 2: HTTP {over_quota}")
+
+    reused = (
+        follow_up.get("event") == "RunCompleted"
+        and "provide the files" not in follow_up.get("content", "")
+        and len(documents) == 2
+    )
+    evicted = kept == added[1:] and removed == 200 and over_quota == 413
+    print()
+    print(
+        "follow-ups reuse the session's documents"
+        if reused
+        else "follow-ups do not see the session's documents"
+    )
+    print("least recently used documents evicted" if evicted else "eviction is wrong")
+    return reused and evicted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=7790)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.latency, args.port)) else 1)
@@ -0,0 +1,136 @@
+"""
+Benchmark: files uploaded before the question must be prepared by then, so the answer starts
+after about one model call.
+
+The agents' model calls are replaced by the stand-ins of benchmarks.concurrent_chat, each taking
+--latency seconds. The time to the first answer token and the total latency are measured for a
+question sent with its files without upload preparation, with upload preparation, and after the
+files were uploaded to /v1/playground/files and prepared. The run fails unless the last one starts
+answering within 1.5 model calls and sooner than without preparation.
+
+    python -m benchmarks.upload_preparation --latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+from benchmarks.concurrent_chat import install_stand_in_agents
+from src.config import app_settings
+from src.memory.extraction_cache import extraction_cache
+from src.server import app
+
+QUESTION = "What are the main complaints and how did engagement evolve?"
+
+
+def upload_files(marker: str) -> list:
+    """The sample comments and a chart, made unique so nothing is served from an earlier run"""
+    return [
+        (
+            "files",
+            (
+                "comments.txt",
+                Path("data/comments.txt").read_bytes() + f"\n{marker}\n".encode(),
+                "text/plain",
+            ),
+        ),
+        (
+            "files",
+            (
+                "chart1.pdf",
+                Path("data/charts/chart1.pdf").read_bytes() + marker.encode(),
+                "application/pdf",
+            ),
+        ),
+    ]
+
+
+async def ask(client: httpx.AsyncClient, data: dict, files: list = None) -> tuple:
+    """Time to the first answer token and total latency of a /chat request"""
+    started = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", "/chat", data=data, files=files) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: ") :])
+            if event.get("event") == "RunResponseContent" and first_token is None:
+                first_token = time.perf_counter() - started
+    return first_token, time.perf_counter() - started
+
+
+async def upload_then_ask(client: httpx.AsyncClient, marker: str) -> tuple:
+    response = await client.post("/v1/playground/files", files=upload_files(marker))
+    response.raise_for_status()
+    file_ids = [uploaded_file["file_id"] for uploaded_file in response.json()]
+    for file_id in file_ids:
+        while (await client.get(f"/v1/playground/files/{file_id}")).json()[
+            "status"
+        ] == "processing":
+            await asyncio.sleep(0.05)
+    return await ask(client, {"message": QUESTION, "file_ids": file_ids})
+
+
+async def main(latency: float, port: int) -> bool:
+    install_stand_in_agents(latency)
+    extraction_cache.clear()
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    run_id = time.time_ns()
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", timeout=120
+    ) as client:
+        app_settings.UPLOAD_PREPARATION_ENABLED = False
+        without_preparation = await ask(
+            client, {"message": QUESTION}, upload_files(f"{run_id}-a")
+        )
+        app_settings.UPLOAD_PREPARATION_ENABLED = True
+        with_preparation = await ask(
+            client, {"message": QUESTION}, upload_files(f"{run_id}-b")
+        )
+        prepared_before = await upload_then_ask(client, f"{run_id}-c")
+
+    server.should_exit = True
+    await server_task
+
+    print(f"model call latency: {latency}s\n")
+    print(f"{'':<32} {'first token':>12} {'total':>8}")
+    for label, (first_token, total) in [
+        ("files sent with the question", without_preparation),
+        ("  prepared on upload", with_preparation),
+        ("files uploaded, then question", prepared_before),
+    ]:
+        print(f"{label:<32} {first_token:>11.3f}s {total:>7.3f}s")
+
+    fast = (
+        prepared_before[0] <= 1.5 * latency
+        and prepared_before[0] < without_preparation[0]
+    )
+    print()
+    print(
+        "answer starts after about one model call"
+        if fast
+        else "answer waits for the file preparation"
+    )
+    return fast
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=7789)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.latency, args.port)) else 1)
@@ -1,9 +1,13 @@
-from src.agents.data_analyst_agent import data_analyst_agent
-from src.agents.data_engineer_agent import data_engineer_agent
-from src.agents.data_scientist_agent import data_scientist_agent
+from src.agents.context_summarizer_agent import context_summarizer_agent
+from src.agents.conversation_summarizer_agent import conversation_summarizer_agent
+from src.agents.data_analyst_agent import create_data_analyst_agent
+from src.agents.data_engineer_agent import create_data_engineer_agent
+from src.agents.data_scientist_agent import create_data_scientist_agent
 
 __all__ = [
-    "data_analyst_agent",
-    "data_engineer_agent",
-    "data_scientist_agent",
+    "context_summarizer_agent",
+    "conversation_summarizer_agent",
+    "create_data_analyst_agent",
+    "create_data_engineer_agent",
+    "create_data_scientist_agent",
 ]
@@ -0,0 +1,24 @@
+from agno.agent import Agent
+
+from src.config import app_settings
+from src.observability.models import InstrumentedOpenAIChat
+
+context_summarizer_agent = Agent(
+    name="Context Summarizer Agent",
+    role="Context Summarizer",
+    model=InstrumentedOpenAIChat(
+        id=app_settings.CONTEXT_PACK_SUMMARY_MODEL,
+        api_key=app_settings.OPENAI_API_KEY,
+        base_url=app_settings.OPENAI_BASE_URL,
+        temperature=0.0,
+    ),
+    instructions="""You condense data extracted from social media reports and comments so a data scientist can write a report from it.
+        You are given the user's query and passages of extracted data, and you return a condensed version of the passages.
+
+        REQUIREMENTS:
+        - Keep every number, count, share, date, metric name and file name that could help answer the query.
+        - Keep representative quotes short and merge passages that say the same thing.
+        - Never add information that is not in the passages.
+        - Return only the condensed text.
+    """,
+)
@@ -0,0 +1,24 @@
+from agno.agent import Agent
+
+from src.config import app_settings
+from src.observability.models import InstrumentedOpenAIChat
+
+conversation_summarizer_agent = Agent(
+    name="Conversation Summarizer Agent",
+    role="Conversation Summarizer",
+    model=InstrumentedOpenAIChat(
+        id=app_settings.CONVERSATION_SUMMARY_MODEL,
+        api_key=app_settings.OPENAI_API_KEY,
+        base_url=app_settings.OPENAI_BASE_URL,
+        temperature=0.0,
+    ),
+    instructions="""You keep the running summary of a conversation between a user and a social media data analyst.
+        You are given the current summary and the turns that happened after it, and you return the updated summary.
+
+        REQUIREMENTS:
+        - Keep the user's goals, the files and metrics discussed, the key findings with their numbers and the open questions.
+        - Drop greetings, formatting and anything the later turns made obsolete.
+        - Never add information that is not in the summary or the turns.
+        - Return only the summary text, in plain prose.
+    """,
+)
@@ -1,7 +1,8 @@
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from pydantic import BaseModel
 from src.config import app_settings
+from src.memory.conversation_buffer import agent_memory_db
+from src.observability.models import InstrumentedOpenAIChat
 
 
 class DataAnalystAgentResponse(BaseModel):
@@ -11,21 +12,38 @@ class DataAnalystAgentResponse(BaseModel):
     information_extract_guidelines: str
 
 
-data_analyst_agent = Agent(
-    name="Data Analyst Agent",
-    role="Data Analyst",
-    add_history_to_messages=True,
-    num_history_runs=3,
-    read_chat_history=True,
-    debug_level=2,
-    debug_mode=True,
-    response_model=DataAnalystAgentResponse,
-    parser_model=OpenAIChat(
-        id="gpt-4o-mini",
-        api_key=app_settings.OPENAI_API_KEY,
-        temperature=0.3,
-    ),
-    instructions="""You are a friendly data analyst agent for a team that specializes in reading data-heavy reports and extracting
+# In "summary" mode the conversation memory passes a bounded summary and the last turns as messages
+history_in_prompt = app_settings.CONVERSATION_MEMORY == "history"
+
+
+def create_data_analyst_agent() -> Agent:
+    """
+    Build the data analyst agent for one run.
+    An Agent keeps the session, user and history of its current run, so concurrent requests each
+    need their own instance; they share the storage.
+    """
+    return Agent(
+        name="Data Analyst Agent",
+        role="Data Analyst",
+        model=InstrumentedOpenAIChat(
+            id="gpt-4o",
+            api_key=app_settings.OPENAI_API_KEY,
+            base_url=app_settings.OPENAI_BASE_URL,
+        ),
+        storage=agent_memory_db,
+        add_history_to_messages=history_in_prompt,
+        num_history_runs=3,
+        read_chat_history=history_in_prompt,
+        debug_level=2,
+        debug_mode=True,
+        response_model=DataAnalystAgentResponse,
+        parser_model=InstrumentedOpenAIChat(
+            id="gpt-4o-mini",
+            api_key=app_settings.OPENAI_API_KEY,
+            base_url=app_settings.OPENAI_BASE_URL,
+            temperature=0.3,
+        ),
+        instructions="""You are a friendly data analyst agent for a team that specializes in reading data-heavy reports and extracting
         insights regarding the social media activity on a media brand space.
 
         - Your role is to understand the customer query and identify if it is analytical in nature.
@@ -42,5 +60,5 @@ data_analyst_agent = Agent(
         - helpful_message: A message to the user to help them understand the query and the output.
         - information_extract_guidelines: A list of guidelines to extract information from the extra content if the query is analytical.
         Empty string if its other query type.
-    """,
-)
+        """,
+    )
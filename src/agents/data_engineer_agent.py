@@ -1,9 +1,9 @@
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from pydantic import BaseModel
 
 from src.config import app_settings
 from src.memory.knowledge_base import knowledge_base
+from src.observability.models import InstrumentedOpenAIChat
 
 
 class DataEngineerAgentResponse(BaseModel):
@@ -12,18 +12,25 @@ class DataEngineerAgentResponse(BaseModel):
     error: str
 
 
-data_engineer_agent = Agent(
-    name="Data Engineer Agent",
-    role="Data Engineer",
-    model=OpenAIChat(
-        id="gpt-4o",
-        api_key=app_settings.OPENAI_API_KEY,
-        temperature=0.0,
-    ),
-    response_model=DataEngineerAgentResponse,
-    knowledge=knowledge_base,
-    search_knowledge=True,
-    instructions="""You are a data engineer for a team that specializes in reading data-heavy reports and extracting
+def create_data_engineer_agent() -> Agent:
+    """
+    Build the data engineer agent for one run.
+    An Agent keeps the state of its current run, so concurrent requests each need their own
+    instance.
+    """
+    return Agent(
+        name="Data Engineer Agent",
+        role="Data Engineer",
+        model=InstrumentedOpenAIChat(
+            id="gpt-4o",
+            api_key=app_settings.OPENAI_API_KEY,
+            base_url=app_settings.OPENAI_BASE_URL,
+            temperature=0.0,
+        ),
+        response_model=DataEngineerAgentResponse,
+        knowledge=knowledge_base,
+        search_knowledge=True,
+        instructions="""You are a data engineer for a team that specializes in reading data-heavy reports and extracting
         insights regarding the social media activity on a media brand space.
 
         You are given guidelines in what to extract and a list of files or the content in plain text (or both). The content in plain
@@ -47,5 +54,5 @@ data_engineer_agent = Agent(
         - filename: The name of the file
         - extracted_content: The content of the file extracted according to the guidelines
         - error: An error message if the file could not be processed
-    """,
-)
+        """,
+    )
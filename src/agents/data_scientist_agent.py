@@ -1,18 +1,26 @@
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 
 from src.config import app_settings
+from src.observability.models import InstrumentedOpenAIChat
 
-data_scientist_agent = Agent(
-    name="Social Media Data Scientist Agent",
-    role="Data Scientist for Social Media",
-    model=OpenAIChat(
-        id="gpt-4o",
-        api_key=app_settings.OPENAI_API_KEY,
-        temperature=0.2,
-    ),
-    markdown=True,
-    instructions="""You are a data scientist for a team that specializes in reading data-heavy reports and extracting
+
+def create_data_scientist_agent() -> Agent:
+    """
+    Build the data scientist agent for one run.
+    An Agent keeps the state of its current run, so concurrent requests each need their own
+    instance.
+    """
+    return Agent(
+        name="Social Media Data Scientist Agent",
+        role="Data Scientist for Social Media",
+        model=InstrumentedOpenAIChat(
+            id="gpt-4o",
+            api_key=app_settings.OPENAI_API_KEY,
+            base_url=app_settings.OPENAI_BASE_URL,
+            temperature=0.2,
+        ),
+        markdown=True,
+        instructions="""You are a data scientist for a team that specializes in reading data-heavy reports and extracting
         insights regarding the social media activity on a media brand space.
         You are responsible for:
         - Analyzing the data at hand and extracting insights from the data to answer the query.
@@ -25,5 +33,5 @@ data_scientist_agent = Agent(
         - Always embase your answer on the data at hand.
         - Always provide a summary of the data and the insights you have extracted from the data.
         - Always provide a list of the most relevant information that you have used to answer the query.
-    """,
-)
+        """,
+    )
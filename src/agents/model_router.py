@@ -0,0 +1,127 @@
+import asyncio
+from typing import Any, Callable, List, Optional
+
+from agno.agent import Agent
+from agno.utils.log import logger
+
+from src.config import app_settings
+from src.observability.metrics import model_escalations, model_routes
+from src.observability.models import InstrumentedOpenAIChat
+
+QUERY_CHECK = "query_check"
+EXTRACTION = "extraction"
+REPORT = "report"
+
+
+def route(
+    task: str,
+    input_tokens: int,
+    attachments: bool = False,
+    policy: Optional[str] = None,
+) -> List[str]:
+    """
+    The models to try for a call, in order, under a routing policy (MODEL_ROUTING_POLICY by default):
+    "large" always uses ROUTING_LARGE_MODEL and "small" always ROUTING_SMALL_MODEL.
+    "cascade" tries the small model first and escalates to the large one, except for extractions
+    with attached files to read or over ROUTING_SMALL_MODEL_MAX_TOKENS, and for reports over
+    ROUTING_SMALL_REPORT_MAX_TOKENS, which go to the large model directly.
+    """
+    policy = policy or app_settings.MODEL_ROUTING_POLICY
+    small, large = app_settings.ROUTING_SMALL_MODEL, app_settings.ROUTING_LARGE_MODEL
+    if policy == "large":
+        return [large]
+    if policy == "small":
+        return [small]
+    if task == EXTRACTION and (
+        attachments or input_tokens > app_settings.ROUTING_SMALL_MODEL_MAX_TOKENS
+    ):
+        return [large]
+    if task == REPORT and input_tokens > app_settings.ROUTING_SMALL_REPORT_MAX_TOKENS:
+        return [large]
+    return [small, large]
+
+
+def routing_key(task: str) -> str:
+    """The models a task can be routed to under the current policy, to key its cached outputs"""
+    return ",".join(route(task, 0))
+
+
+class DeferredStorage:
+    """
+    Agent storage whose session writes are held back until `commit`, so the run of an attempt
+    that is escalated leaves no trace in the session history. Reads go to the wrapped storage.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.pending = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.storage, name)
+
+    def upsert(self, session):
+        self.pending = session
+        return session
+
+    def commit(self) -> None:
+        if self.pending is not None:
+            self.storage.upsert(session=self.pending)
+            self.pending = None
+
+
+def model_variant(agent: Agent, model_id: str, defer_history: bool = False) -> Agent:
+    """
+    The agent itself if it already uses the model, otherwise a copy of it using the model.
+    Copies are made per call with `Agent.deep_copy`, so they keep no state of their own runs.
+    With `defer_history`, the copy writes its session to a `DeferredStorage` instead.
+    """
+    update = {}
+    if agent.model.id != model_id:
+        update["model"] = InstrumentedOpenAIChat(
+            id=model_id,
+            api_key=app_settings.OPENAI_API_KEY,
+            base_url=app_settings.OPENAI_BASE_URL,
+            temperature=agent.model.temperature,
+        )
+    if defer_history and agent.storage is not None:
+        update["storage"] = DeferredStorage(agent.storage)
+    if not update:
+        return agent
+    return agent.deep_copy(update=update)
+
+
+async def run_routed(
+    agent: Agent,
+    task: str,
+    message: Any,
+    is_valid: Callable[[Any], bool],
+    input_tokens: int,
+    attachments: bool = False,
+    **kwargs,
+) -> Any:
+    """
+    Run the agent on the models the routing policy gives for the call, moving to the next model
+    when the response content is not valid or the call fails, and return the last response.
+    Only the returned run is written to the session history.
+    """
+    models = route(task, input_tokens, attachments)
+    model_routes.inc(task=task, model=models[0])
+    for attempt, model_id in enumerate(models):
+        last_attempt = attempt == len(models) - 1
+        variant = model_variant(agent, model_id, defer_history=not last_attempt)
+        try:
+            response = await variant.arun(message, **kwargs)
+        except Exception as e:
+            if last_attempt:
+                raise
+            logger.warning(f"{task} on {model_id} failed, escalating: {e}")
+            model_escalations.inc(task=task, reason="error")
+            continue
+        if last_attempt or is_valid(response.content):
+            if isinstance(variant.storage, DeferredStorage):
+                await asyncio.to_thread(variant.storage.commit)
+            return response
+        logger.info(
+            f"{task} on {model_id} returned an invalid or empty output, escalating"
+        )
+        model_escalations.inc(task=task, reason="invalid_output")
@@ -0,0 +1,242 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+from src.config import app_settings
+from src.observability.metrics import (
+    admission_active_runs,
+    admission_queue_depth,
+    admission_rejections,
+    admission_wait,
+)
+
+# Run duration assumed for Retry-After until runs have been measured
+DEFAULT_RUN_SECONDS = 10.0
+# Weight of the latest run in the moving average of run durations
+RUN_SECONDS_SMOOTHING = 0.2
+
+
+class Priority(IntEnum):
+    """Priority classes of the wait queue, lower first"""
+
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    A request's place in the admission queue, then its slot once granted.
+    Releasing it frees the slot or leaves the queue; releasing twice does nothing.
+    A request starting a run hands the slot over to the run's task, which releases it when done.
+    """
+
+    def __init__(
+        self,
+        controller: "AdmissionController",
+        user_id: Optional[str],
+        priority: Priority,
+    ):
+        self.controller = controller
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.released = False
+        self.run_task: Optional[asyncio.Task] = None
+        self._granted = asyncio.Event()
+
+    @property
+    def granted(self) -> bool:
+        return self.granted_at is not None
+
+    async def wait(self) -> None:
+        """Wait for the slot; a request cancelled while waiting leaves the queue"""
+        try:
+            await self._granted.wait()
+        except asyncio.CancelledError:
+            self.release(ran=False)
+            raise
+
+    def release(self, ran: bool = True) -> None:
+        """Give the slot back; `ran` is False when the request did not start a run after all"""
+        self.controller.release(self, ran)
+
+    def hand_over(self, task: asyncio.Task) -> None:
+        """Let a run's task hold the slot until it is done, whatever happens to the request"""
+        self.run_task = task
+        task.add_done_callback(lambda _: self.release())
+
+    def release_unused(self) -> None:
+        """Give the slot back unless a run holds it, for requests ending before or without a run"""
+        if self.run_task is None:
+            self.release(ran=False)
+
+
+class AdmissionController:
+    """
+    Admission control for workflow runs, which make the agents' model calls.
+    At most `max_concurrent` runs hold a slot, and at most `max_per_user` for one user id.
+    Other requests wait in a priority queue bounded to `max_queue` requests in total,
+    `max_queued_bulk` bulk requests, so interactive requests always find room, and
+    `max_queued_per_user` per user id; they are rejected with a retry delay when it is full.
+    Requests without a user id only count against the global limits.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_per_user: int,
+        max_queue: int,
+        max_queued_bulk: int,
+        max_queued_per_user: int,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.max_queued_bulk = max_queued_bulk
+        self.max_queued_per_user = max_queued_per_user
+        self.active = 0
+        self.active_per_user: Dict[str, int] = {}
+        self.queued_per_user: Dict[str, int] = {}
+        self.queue: List[Tuple[int, int, AdmissionTicket]] = []
+        self.run_seconds = DEFAULT_RUN_SECONDS
+        self._order = itertools.count()
+
+    def _can_run(self, ticket: AdmissionTicket) -> bool:
+        return self.active < self.max_concurrent and (
+            ticket.user_id is None
+            or self.active_per_user.get(ticket.user_id, 0) < self.max_per_user
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until the queue is expected to have drained by one slot's worth of runs"""
+        waves = (len(self.queue) + 1) / self.max_concurrent
+        return max(1, math.ceil(self.run_seconds * waves))
+
+    def admit(
+        self, user_id: Optional[str], priority: Priority = Priority.INTERACTIVE
+    ) -> AdmissionTicket:
+        """
+        A ticket granted at once if a slot is free and nobody is waiting for it, queued otherwise.
+        Raises AdmissionRejected when the queue, or the user's share of it, is full.
+        """
+        ticket = AdmissionTicket(self, user_id, priority)
+        # Free slots are always granted to waiting tickets first, so the ones left waiting are
+        # blocked by their user's cap and a free slot can go to this ticket
+        if self._can_run(ticket):
+            self._grant(ticket)
+            return ticket
+
+        if len(self.queue) >= self.max_queue:
+            admission_rejections.inc(reason="queue_full")
+            raise AdmissionRejected(
+                "The service is busy, please retry later.", self.retry_after()
+            )
+        if priority == Priority.BULK and (
+            sum(entry[0] == Priority.BULK for entry in self.queue)
+            >= self.max_queued_bulk
+        ):
+            admission_rejections.inc(reason="bulk_queue_full")
+            raise AdmissionRejected(
+                "Too many bulk requests waiting, please retry later.",
+                self.retry_after(),
+            )
+        if (
+            user_id is not None
+            and self.queued_per_user.get(user_id, 0) >= self.max_queued_per_user
+        ):
+            admission_rejections.inc(reason="user_queue_full")
+            raise AdmissionRejected(
+                "Too many requests waiting for this user, please retry later.",
+                self.retry_after(),
+            )
+
+        heapq.heappush(self.queue, (priority, next(self._order), ticket))
+        if user_id is not None:
+            self.queued_per_user[user_id] = self.queued_per_user.get(user_id, 0) + 1
+        self._update_queue_depth()
+        return ticket
+
+    def release(self, ticket: AdmissionTicket, ran: bool = True) -> None:
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self.active -= 1
+            if ticket.user_id is not None:
+                self.active_per_user[ticket.user_id] -= 1
+                if not self.active_per_user[ticket.user_id]:
+                    del self.active_per_user[ticket.user_id]
+            if ran:
+                self.run_seconds += RUN_SECONDS_SMOOTHING * (
+                    time.monotonic() - ticket.granted_at - self.run_seconds
+                )
+            admission_active_runs.set(self.active)
+        else:
+            self.queue = [entry for entry in self.queue if entry[2] is not ticket]
+            heapq.heapify(self.queue)
+            self._dequeued(ticket)
+        self._grant_waiting()
+
+    def _grant(self, ticket: AdmissionTicket) -> None:
+        ticket.granted_at = time.monotonic()
+        self.active += 1
+        if ticket.user_id is not None:
+            self.active_per_user[ticket.user_id] = (
+                self.active_per_user.get(ticket.user_id, 0) + 1
+            )
+        admission_active_runs.set(self.active)
+        admission_wait.observe(
+            ticket.granted_at - ticket.enqueued_at,
+            priority=ticket.priority.name.lower(),
+        )
+        ticket._granted.set()
+
+    def _dequeued(self, ticket: AdmissionTicket) -> None:
+        if ticket.user_id is not None:
+            self.queued_per_user[ticket.user_id] -= 1
+            if not self.queued_per_user[ticket.user_id]:
+                del self.queued_per_user[ticket.user_id]
+        self._update_queue_depth()
+
+    def _grant_waiting(self) -> None:
+        """Grant free slots to the waiting tickets in priority order, skipping users at their cap"""
+        if self.active >= self.max_concurrent or not self.queue:
+            return
+        waiting = []
+        while self.queue and self.active < self.max_concurrent:
+            entry = heapq.heappop(self.queue)
+            if self._can_run(entry[2]):
+                self._dequeued(entry[2])
+                self._grant(entry[2])
+            else:
+                waiting.append(entry)
+        for entry in waiting:
+            heapq.heappush(self.queue, entry)
+        self._update_queue_depth()
+
+    def _update_queue_depth(self) -> None:
+        for priority in Priority:
+            admission_queue_depth.set(
+                sum(entry[0] == priority for entry in self.queue),
+                priority=priority.name.lower(),
+            )
+
+
+admission_controller = AdmissionController(
+    max_concurrent=app_settings.ADMISSION_MAX_CONCURRENT_RUNS,
+    max_per_user=app_settings.ADMISSION_MAX_RUNS_PER_USER,
+    max_queue=app_settings.ADMISSION_MAX_QUEUE,
+    max_queued_bulk=app_settings.ADMISSION_MAX_QUEUED_BULK,
+    max_queued_per_user=app_settings.ADMISSION_MAX_QUEUED_PER_USER,
+)
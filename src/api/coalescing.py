@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from agno.utils.log import logger
+
+
+def coalescing_key(
+    message: str, files_fingerprint: str, context: str = "", session_id: str = ""
+) -> str:
+    """
+    Key of a run: the message with whitespace and casing normalized, the files, the context and,
+    for runs only requests of one session may share, the session
+    """
+    normalized_message = " ".join(message.split()).casefold()
+    return hashlib.sha256(
+        "\n".join([normalized_message, files_fingerprint, context, session_id]).encode(
+            "utf-8"
+        )
+    ).hexdigest()
+
+
+class RunFailed(Exception):
+    pass
+
+
+class InFlightRun:
+    """
+    A run whose events are broadcast to every request attached to it.
+    Events are kept until the run ends, so a request attaching late first replays them.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Any] = []
+        self.done = False
+        self.error: str = ""
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: Any) -> None:
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def finish(self, error: str = "") -> None:
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        """Every event of the run, from the first one; raises RunFailed if the run failed"""
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda position=position: position < len(self.events) or self.done
+                )
+                events = self.events[position:]
+                position = len(self.events)
+                done, error = self.done, self.error
+            for event in events:
+                yield event
+            if done and position == len(self.events):
+                if error:
+                    raise RunFailed(error)
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent runs: the first request with a key starts the run in its own
+    task and later requests with the same key attach to it while it is in flight.
+    The run is cancelled when every attached request has gone away.
+    """
+
+    def __init__(self):
+        self.runs: Dict[str, InFlightRun] = {}
+
+    def attach(
+        self, key: str, produce: Callable[[], AsyncIterator[Any]]
+    ) -> Tuple[InFlightRun, bool]:
+        """The in-flight run of a key, started with `produce` if there is none, and whether it was"""
+        run = self.runs.get(key)
+        started = run is None
+        if started:
+            run = self.runs[key] = InFlightRun(key)
+            run.task = asyncio.create_task(self._produce(run, produce))
+        run.subscribers += 1
+        return run, started
+
+    async def _produce(
+        self, run: InFlightRun, produce: Callable[[], AsyncIterator[Any]]
+    ) -> None:
+        try:
+            async for event in produce():
+                await run.publish(event)
+            await run.finish()
+        except asyncio.CancelledError:
+            await run.finish("The run was cancelled")
+            raise
+        except Exception as e:
+            logger.warning(f"Coalesced run {run.key} failed: {e}")
+            await run.finish(str(e))
+        finally:
+            if self.runs.get(run.key) is run:
+                del self.runs[run.key]
+
+    def detach(self, run: InFlightRun) -> None:
+        """Detach a request from its run, cancelling the run if it was the last one attached"""
+        run.subscribers -= 1
+        if run.subscribers == 0 and run.task is not None and not run.task.done():
+            run.task.cancel()
+            if self.runs.get(run.key) is run:
+                del self.runs[run.key]
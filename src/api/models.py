@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any
+from typing import Literal, Optional, Dict, Any
 from pydantic import BaseModel
 
 
@@ -55,7 +55,27 @@ class ChatEntry(BaseModel):
 class RunRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
+    user_id: Optional[str] = None
     stream: Optional[bool] = True
+    priority: Literal["interactive", "bulk"] = "interactive"
+
+
+class UploadedFile(BaseModel):
+    file_id: str
+    name: str
+    mime_type: str
+    status: str
+    error: str = ""
+
+
+class DocumentEntry(BaseModel):
+    file_id: str
+    name: str
+    mime_type: str
+    size_bytes: int
+    added_at: int
+    last_used_at: int
+    status: str
 
 
 class RunResponse(BaseModel):
@@ -1,8 +1,31 @@
-from typing import List, Optional
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
-from fastapi.responses import StreamingResponse
-from src.api.models import Agent, Team, SessionEntry, RunRequest, StatusResponse
+import asyncio
+import uuid
+from typing import List, Literal, Optional
+from agno.media import File as FileHandle
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from src.api.admission import (
+    AdmissionRejected,
+    AdmissionTicket,
+    Priority,
+    admission_controller,
+)
+from src.api.models import (
+    Agent,
+    DocumentEntry,
+    Team,
+    SessionEntry,
+    RunRequest,
+    StatusResponse,
+    UploadedFile,
+)
 from src.api.services import playground_service
+from src.config import app_settings
+from src.memory.blob_store import UploadTooLargeError, blob_store
+from src.memory.session_store import InvalidCursorError
+from src.memory.session_workspace import WorkspaceQuotaError
+from src.observability.metrics import registry
+from src.workflow.file_preparation import file_preparer
 
 playground_router = APIRouter(prefix="/v1/playground", tags=["playground"])
 
@@ -21,37 +44,153 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@chat_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of this worker process"""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+async def store_files(
+    files: Optional[List[UploadFile]], file_ids: Optional[List[str]]
+) -> List[FileHandle]:
+    """
+    Handles of the files referenced by id and of the uploads, which are stored and registered for
+    preparation. Raises a 404 for unknown file ids.
+    """
+    file_handles = []
+    for file_id in file_ids or []:
+        file_handle = await file_preparer.file(file_id)
+        if file_handle is None:
+            raise HTTPException(status_code=404, detail=f"Unknown file {file_id}")
+        file_handles.append(file_handle)
+    for file in files or []:
+        file_handle = await blob_store.put_upload(file)
+        await file_preparer.register(file_handle)
+        file_handles.append(file_handle)
+    return file_handles
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    A streaming response holding an admission ticket, given back however the response ends: the
+    stream gives it back itself, but it never runs when the client is gone before streaming starts.
+    """
+
+    def __init__(self, content, ticket: Optional[AdmissionTicket], **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.ticket:
+                self.ticket.release_unused()
+
+
 @chat_router.post("/chat")
 async def chat_endpoint(
-    message: str = Form(...), files: Optional[List[UploadFile]] = File(None)
+    message: str = Form(...),
+    files: Optional[List[UploadFile]] = File(None),
+    file_ids: Optional[List[str]] = Form(None),
+    session_id: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    priority: Literal["interactive", "bulk"] = Form("interactive"),
 ):
-    """chat endpoint - redirects to team run"""
+    """
+    chat endpoint - redirects to team run.
+    Without a session id a new session is started; its id is sent back in the RunCompleted event.
+    When the admission queue is full the request is rejected with a 429 and a Retry-After header
+    before its files are read.
+    Files uploaded earlier to /v1/playground/files are referenced by their ids in `file_ids`.
+    Uploaded files start being prepared in the background before the workflow runs.
+    The files are added to the session's document workspace before the response starts, so an
+    upload over the size limit or the workspace quota is rejected with a 413.
+    """
+    ticket = None
     try:
-        file_data = []
-        if files:
-            for file in files:
-                content = await file.read()
-                file_info = {
-                    "filename": file.filename,
-                    "content_type": file.content_type,
-                    "content": content,
-                }
-                file_data.append(file_info)
-
-        request = RunRequest(message=message, stream=True)
-
-        return StreamingResponse(
-            playground_service.stream_response("social-media-team", request, file_data),
+        if app_settings.ADMISSION_CONTROL_ENABLED:
+            ticket = admission_controller.admit(user_id, Priority[priority.upper()])
+
+        file_handles = await store_files(files, file_ids)
+
+        request = RunRequest(
+            message=message,
+            session_id=session_id,
+            user_id=user_id,
+            stream=True,
+            priority=priority,
+        )
+        run_session_id = session_id or str(uuid.uuid4())
+        if app_settings.SESSION_WORKSPACE_ENABLED:
+            await asyncio.to_thread(
+                playground_service.add_documents, run_session_id, file_handles
+            )
+
+        return AdmittedStreamingResponse(
+            playground_service.stream_response(
+                "social-media-team", request, file_handles, ticket, run_session_id
+            ),
+            ticket,
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
             },
         )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except (UploadTooLargeError, WorkspaceQuotaError) as e:
+        if ticket:
+            ticket.release(ran=False)
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        if ticket:
+            ticket.release(ran=False)
+        raise
     except Exception as e:
+        if ticket:
+            ticket.release(ran=False)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@playground_router.post("/files", response_model=List[UploadedFile])
+async def upload_files(files: List[UploadFile] = File(...)):
+    """
+    Store files and start preparing them in the background, so a question sent later to /chat
+    with their ids in `file_ids` finds them already parsed, indexed and digested.
+    """
+    uploaded_files = []
+    try:
+        for file in files:
+            file_id = await file_preparer.register(await blob_store.put_upload(file))
+            uploaded_files.append(await get_file(file_id))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return uploaded_files
+
+
+@playground_router.get("/files/{file_id}", response_model=UploadedFile)
+async def get_file(file_id: str):
+    """Get an uploaded file and the state of its preparation"""
+    prepared_file = await file_preparer.status(file_id)
+    if prepared_file is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return UploadedFile(
+        file_id=prepared_file.file_id,
+        name=prepared_file.name,
+        mime_type=prepared_file.mime_type,
+        status=prepared_file.status,
+        error=prepared_file.error,
+    )
+
+
 @playground_router.get("/agents", response_model=List[Agent])
 async def get_playground_agents():
     """Get all available agents"""
@@ -59,15 +198,33 @@ async def get_playground_agents():
 
 
 @playground_router.get("/agents/{agent_id}/sessions", response_model=List[SessionEntry])
-async def get_agent_sessions(agent_id: str):
-    """Get sessions for a specific agent"""
-    return playground_service.get_agent_sessions(agent_id)
+async def get_agent_sessions(
+    agent_id: str,
+    response: Response,
+    limit: int = Query(
+        app_settings.SESSION_PAGE_SIZE, ge=1, le=app_settings.SESSION_MAX_PAGE_SIZE
+    ),
+    cursor: Optional[str] = None,
+):
+    """
+    Get sessions for a specific agent, newest first.
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    """
+    try:
+        sessions, next_cursor = await asyncio.to_thread(
+            playground_service.get_agent_sessions, agent_id, limit, cursor
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return sessions
 
 
 @playground_router.get("/agents/{agent_id}/sessions/{session_id}")
 async def get_agent_session(agent_id: str, session_id: str):
     """Get a specific agent session"""
-    session = playground_service.get_session(session_id)
+    session = await asyncio.to_thread(playground_service.get_session, session_id)
     if not session or session.get("agent_id") != agent_id:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
@@ -76,11 +233,11 @@ async def get_agent_session(agent_id: str, session_id: str):
 @playground_router.delete("/agents/{agent_id}/sessions/{session_id}")
 async def delete_agent_session(agent_id: str, session_id: str):
     """Delete an agent session"""
-    session = playground_service.get_session(session_id)
+    session = await asyncio.to_thread(playground_service.get_session, session_id)
     if not session or session.get("agent_id") != agent_id:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    success = playground_service.delete_session(session_id)
+    success = await asyncio.to_thread(playground_service.delete_session, session_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete session")
     return {"message": "Session deleted successfully"}
@@ -93,15 +250,33 @@ async def get_playground_teams():
 
 
 @playground_router.get("/teams/{team_id}/sessions", response_model=List[SessionEntry])
-async def get_team_sessions(team_id: str):
-    """Get sessions for a specific team"""
-    return playground_service.get_team_sessions(team_id)
+async def get_team_sessions(
+    team_id: str,
+    response: Response,
+    limit: int = Query(
+        app_settings.SESSION_PAGE_SIZE, ge=1, le=app_settings.SESSION_MAX_PAGE_SIZE
+    ),
+    cursor: Optional[str] = None,
+):
+    """
+    Get sessions for a specific team, newest first.
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    """
+    try:
+        sessions, next_cursor = await asyncio.to_thread(
+            playground_service.get_team_sessions, team_id, limit, cursor
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return sessions
 
 
 @playground_router.get("/teams/{team_id}/sessions/{session_id}")
 async def get_team_session(team_id: str, session_id: str):
     """Get a specific team session"""
-    session = playground_service.get_session(session_id)
+    session = await asyncio.to_thread(playground_service.get_session, session_id)
     if not session or session.get("team_id") != team_id:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
@@ -110,11 +285,114 @@ async def get_team_session(team_id: str, session_id: str):
 @playground_router.delete("/teams/{team_id}/sessions/{session_id}")
 async def delete_team_session(team_id: str, session_id: str):
     """Delete a team session"""
-    session = playground_service.get_session(session_id)
+    session = await asyncio.to_thread(playground_service.get_session, session_id)
     if not session or session.get("team_id") != team_id:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    success = playground_service.delete_session(session_id)
+    success = await asyncio.to_thread(playground_service.delete_session, session_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete session")
     return {"message": "Session deleted successfully"}
+
+
+async def get_owned_session(entity_key: str, entity_id: str, session_id: str) -> None:
+    """Raise a 404 unless the session exists and belongs to the agent or team"""
+    session = await asyncio.to_thread(playground_service.get_session, session_id)
+    if not session or session.get(entity_key) != entity_id:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+
+async def add_session_documents(
+    session_id: str,
+    files: Optional[List[UploadFile]],
+    file_ids: Optional[List[str]],
+) -> List[DocumentEntry]:
+    try:
+        file_handles = await store_files(files, file_ids)
+        await asyncio.to_thread(
+            playground_service.add_documents, session_id, file_handles
+        )
+    except (UploadTooLargeError, WorkspaceQuotaError) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return await asyncio.to_thread(playground_service.get_documents, session_id)
+
+
+async def remove_session_document(session_id: str, file_id: str):
+    removed = await asyncio.to_thread(
+        playground_service.remove_document, session_id, file_id
+    )
+    if not removed:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"message": "Document removed successfully"}
+
+
+@playground_router.get(
+    "/agents/{agent_id}/sessions/{session_id}/documents",
+    response_model=List[DocumentEntry],
+)
+async def get_agent_session_documents(agent_id: str, session_id: str):
+    """Get the documents of an agent session's workspace, reused by every turn of the session"""
+    await get_owned_session("agent_id", agent_id, session_id)
+    return await asyncio.to_thread(playground_service.get_documents, session_id)
+
+
+@playground_router.post(
+    "/agents/{agent_id}/sessions/{session_id}/documents",
+    response_model=List[DocumentEntry],
+)
+async def add_agent_session_documents(
+    agent_id: str,
+    session_id: str,
+    files: Optional[List[UploadFile]] = File(None),
+    file_ids: Optional[List[str]] = Form(None),
+):
+    """
+    Add uploaded files, or files uploaded earlier by id, to an agent session's workspace.
+    The least recently used documents are evicted over the workspace quota.
+    """
+    await get_owned_session("agent_id", agent_id, session_id)
+    return await add_session_documents(session_id, files, file_ids)
+
+
+@playground_router.delete(
+    "/agents/{agent_id}/sessions/{session_id}/documents/{file_id}"
+)
+async def delete_agent_session_document(agent_id: str, session_id: str, file_id: str):
+    """Remove a document from an agent session's workspace"""
+    await get_owned_session("agent_id", agent_id, session_id)
+    return await remove_session_document(session_id, file_id)
+
+
+@playground_router.get(
+    "/teams/{team_id}/sessions/{session_id}/documents",
+    response_model=List[DocumentEntry],
+)
+async def get_team_session_documents(team_id: str, session_id: str):
+    """Get the documents of a team session's workspace, reused by every turn of the session"""
+    await get_owned_session("team_id", team_id, session_id)
+    return await asyncio.to_thread(playground_service.get_documents, session_id)
+
+
+@playground_router.post(
+    "/teams/{team_id}/sessions/{session_id}/documents",
+    response_model=List[DocumentEntry],
+)
+async def add_team_session_documents(
+    team_id: str,
+    session_id: str,
+    files: Optional[List[UploadFile]] = File(None),
+    file_ids: Optional[List[str]] = Form(None),
+):
+    """
+    Add uploaded files, or files uploaded earlier by id, to a team session's workspace.
+    The least recently used documents are evicted over the workspace quota.
+    """
+    await get_owned_session("team_id", team_id, session_id)
+    return await add_session_documents(session_id, files, file_ids)
+
+
+@playground_router.delete("/teams/{team_id}/sessions/{session_id}/documents/{file_id}")
+async def delete_team_session_document(team_id: str, session_id: str, file_id: str):
+    """Remove a document from a team session's workspace"""
+    await get_owned_session("team_id", team_id, session_id)
+    return await remove_session_document(session_id, file_id)
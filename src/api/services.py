@@ -1,21 +1,57 @@
-import json
 import asyncio
+import json
+import os
 import uuid
-from typing import List, Optional, Dict, Any, AsyncGenerator
-from datetime import datetime
-from src.orchestrator import social_media_analysis_workflow
-from src.api.models import Agent, Team, SessionEntry, RunRequest
+from typing import List, Optional, Dict, Any, AsyncGenerator, Tuple
+from src.orchestrator import create_social_media_analysis_workflow
+from src.api.models import Agent, Team, SessionEntry, RunRequest, DocumentEntry
 from agno.media import File
+from agno.utils.log import logger
+from agno.run.response import RunResponseContentEvent
+from agno.run.v2.workflow import (
+    StepCompletedEvent,
+    StepStartedEvent,
+    WorkflowCompletedEvent,
+    WorkflowErrorEvent,
+)
 
+from src.api.admission import AdmissionTicket
+from src.api.coalescing import SingleFlight, coalescing_key
+from src.workflow import generate_report_step
 from src.workflow.agent_message import AgentFinalResponse
 from src.config import app_settings
+from src.memory.answer_cache import AnswerCacheHit, answer_cache, answer_scope
+from src.memory.blob_store import blob_store, file_digest, files_fingerprint
+from src.memory.conversation_buffer import memory_db
+from src.memory.conversation_memory import conversation_memory
+from src.memory.embedder import embedder
+from src.memory.prepared_files import STORED, prepared_file_store
+from src.memory.session_store import SessionStore, session_store
+from src.memory.session_workspace import (
+    SessionWorkspace,
+    WorkspaceDocument,
+    session_workspace,
+)
+from src.observability.metrics import (
+    coalesced_requests,
+    workflow_run_duration,
+    workflow_runs,
+    workflow_time_to_first_token,
+)
+from src.observability.tracing import run_trace, span
+
+SESSION_TITLE_LENGTH = 60
+# Last event of a workflow run, carrying its answer; consumed by stream_response, never sent
+WORKFLOW_RESULT_EVENT = "WorkflowResult"
 
 
 class PlaygroundService:
     def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.sessions: SessionStore = session_store
+        self.workspace: SessionWorkspace = session_workspace
         self.agents: List[Agent] = []
         self.teams: List[Team] = []
+        self.in_flight = SingleFlight()
         self._initialize_agents_and_teams()
 
     def _initialize_agents_and_teams(self):
@@ -65,37 +101,19 @@ class PlaygroundService:
         """Get all available teams"""
         return self.teams
 
-    def get_agent_sessions(self, agent_id: str) -> List[SessionEntry]:
-        """Get sessions for a specific agent"""
-        sessions = []
-        for session_id, session_data in self.sessions.items():
-            if session_data.get("agent_id") == agent_id:
-                sessions.append(
-                    SessionEntry(
-                        session_id=session_id,
-                        title=session_data.get("title", "Untitled Session"),
-                        created_at=session_data.get(
-                            "created_at", int(datetime.now().timestamp())
-                        ),
-                    )
-                )
-        return sessions
-
-    def get_team_sessions(self, team_id: str) -> List[SessionEntry]:
-        """Get sessions for a specific team"""
-        sessions = []
-        for session_id, session_data in self.sessions.items():
-            if session_data.get("team_id") == team_id:
-                sessions.append(
-                    SessionEntry(
-                        session_id=session_id,
-                        title=session_data.get("title", "Untitled Session"),
-                        created_at=session_data.get(
-                            "created_at", int(datetime.now().timestamp())
-                        ),
-                    )
-                )
-        return sessions
+    def get_agent_sessions(
+        self, agent_id: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[SessionEntry], Optional[str]]:
+        """Get a page of sessions for a specific agent, with the cursor of the next page"""
+        sessions, next_cursor = self.sessions.list("agent", agent_id, limit, cursor)
+        return [SessionEntry(**session) for session in sessions], next_cursor
+
+    def get_team_sessions(
+        self, team_id: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[SessionEntry], Optional[str]]:
+        """Get a page of sessions for a specific team, with the cursor of the next page"""
+        sessions, next_cursor = self.sessions.list("team", team_id, limit, cursor)
+        return [SessionEntry(**session) for session in sessions], next_cursor
 
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific session by ID"""
@@ -105,70 +123,358 @@ class PlaygroundService:
         self, entity_id: str, entity_type: str, title: str = "New Session"
     ) -> str:
         """Create a new session"""
-        session_id = str(uuid.uuid4())
-        self.sessions[session_id] = {
-            "session_id": session_id,
-            "title": title,
-            "created_at": int(datetime.now().timestamp()),
-            "messages": [],
-            f"{entity_type}_id": entity_id,
-        }
-        return session_id
+        return self.sessions.create(entity_id, entity_type, title)
 
     def delete_session(self, session_id: str) -> bool:
-        """Delete a session"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
-            return True
-        return False
+        """Delete a session and its document workspace"""
+        self.workspace.clear(session_id)
+        return self.sessions.delete(session_id)
 
-    async def stream_response(
-        self, team_id: str, request: RunRequest, file_data: List[Dict] = None
-    ) -> AsyncGenerator[str, None]:
-        """Stream response from team execution"""
+    def add_documents(self, session_id: str, files: List[File]) -> None:
+        """Add stored files to a session's document workspace, evicting the least recently used"""
+        self.workspace.add(
+            session_id,
+            [
+                WorkspaceDocument(
+                    session_id=session_id,
+                    file_id=file_digest(file),
+                    name=file.name or file_digest(file),
+                    mime_type=file.mime_type or "",
+                    size_bytes=os.path.getsize(file.filepath),
+                )
+                for file in files
+            ],
+        )
+
+    def get_documents(self, session_id: str) -> List[DocumentEntry]:
+        """The documents of a session's workspace, with the state of their preparation"""
+        entries = []
+        for document in self.workspace.list(session_id):
+            prepared_file = prepared_file_store.get(document.file_id)
+            entries.append(
+                DocumentEntry(
+                    file_id=document.file_id,
+                    name=document.name,
+                    mime_type=document.mime_type,
+                    size_bytes=document.size_bytes,
+                    added_at=int(document.added_at),
+                    last_used_at=int(document.used_at),
+                    status=prepared_file.status if prepared_file else STORED,
+                )
+            )
+        return entries
+
+    def remove_document(self, session_id: str, file_id: str) -> bool:
+        """Remove a document from a session's workspace"""
+        return self.workspace.remove(session_id, file_id)
+
+    def session_files(self, session_id: str) -> List[File]:
+        """
+        The files a turn analyzes: every document of the session's workspace, where the files sent
+        with it were added, so follow-ups need not upload them again.
+        """
+        return [
+            blob_store.file(document.file_id, document.name, document.mime_type)
+            for document in self.workspace.use(session_id)
+            if blob_store.contains(document.file_id, document.mime_type)
+        ]
+
+    async def lookup_cached_answer(
+        self, message: str, files: Optional[List[File]], context: str
+    ) -> Tuple[Optional[AnswerCacheHit], Optional[List[float]], str]:
+        """
+        Look the query up in the answer cache among the answers given over the same files in the
+        same conversation context, returning its embedding and that scope for storage
+        """
+        if not app_settings.ANSWER_CACHE_ENABLED:
+            return None, None, ""
         try:
-            files = None
-            if file_data:
-                files = []
-                for file_obj in file_data:
-                    files.append(
-                        File(
-                            name=file_obj["filename"],
-                            content=file_obj["content"],
-                            mime_type=file_obj["content_type"],
-                        )
-                    )
+            fingerprint = answer_scope(
+                await asyncio.to_thread(files_fingerprint, files or []), context
+            )
+            query_embedding = await asyncio.to_thread(embedder.get_embedding, message)
+            cache_hit = await asyncio.to_thread(
+                answer_cache.lookup, query_embedding, fingerprint
+            )
+        except Exception as e:
+            logger.warning(f"Answer cache unavailable: {e}")
+            return None, None, ""
+        return cache_hit, query_embedding, fingerprint
 
-            workflow_response = await social_media_analysis_workflow.arun(
-                message=request.message,
-                additional_data={"files": files},
-                session_id=app_settings.SESSION_ID,
-                user_id=app_settings.USER_ID,
+    def remember_turn(self, session_id: str, message: str, answer: str) -> None:
+        """Fold an answered turn into the session's conversation memory in the background"""
+        if app_settings.CONVERSATION_MEMORY == "summary" and answer:
+            conversation_memory.schedule_update(session_id, message, answer)
+
+    async def has_history(self, request: RunRequest, session_id: str) -> bool:
+        """Whether the session has earlier turns the message may refer to"""
+        if not request.session_id:
+            return False
+        if app_settings.CONVERSATION_MEMORY == "summary":
+            messages = await asyncio.to_thread(
+                conversation_memory.context_messages, session_id
             )
+            return bool(messages)
+        return True
 
-            response_content = (
-                workflow_response.content
-                if workflow_response.content
-                else AgentFinalResponse()
+    async def coalescing_context(self, request: RunRequest, session_id: str) -> str:
+        """
+        The conversation context the workflow sees for this request, part of the coalescing key
+        and of the answer cache scope, so only requests that would get the same answer share a run
+        or a cached answer.
+        """
+        if app_settings.CONVERSATION_MEMORY == "summary":
+            messages = await asyncio.to_thread(
+                conversation_memory.context_messages, session_id
             )
-            if isinstance(response_content, AgentFinalResponse):
-                response_content = (
-                    response_content.error_message or response_content.final_answer
+            return json.dumps([[message.role, message.content] for message in messages])
+        # The agent replays the session history: only new sessions have an empty context, and
+        # the session's context changes with each run stored in it
+        if not request.session_id:
+            return ""
+        latest_run_id = await asyncio.to_thread(memory_db.latest_run_id, session_id)
+        return json.dumps([session_id, latest_run_id])
+
+    async def workflow_events(
+        self,
+        request: RunRequest,
+        files: Optional[List[File]],
+        session_id: str,
+        user_id: str,
+        query_embedding: Optional[List[float]],
+        fingerprint: str,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Run the workflow, yielding its step and content events as SSE payloads and, last, a
+        WorkflowResult event with the answer and whether a report was generated.
+        Successful reports are stored in the answer cache.
+        """
+        workflow_stream = await create_social_media_analysis_workflow().arun(
+            message=request.message,
+            additional_data={
+                "files": files,
+                "session_id": session_id,
+                "user_id": user_id,
+                "has_history": await self.has_history(request, session_id),
+            },
+            session_id=session_id,
+            user_id=user_id,
+            stream=True,
+            stream_intermediate_steps=True,
+        )
+
+        streamed = False
+        report_generated = False
+        response_content = AgentFinalResponse()
+        async for event in workflow_stream:
+            if isinstance(event, (StepStartedEvent, StepCompletedEvent)):
+                if (
+                    isinstance(event, StepCompletedEvent)
+                    and event.step_name == generate_report_step.name
+                ):
+                    report_generated = True
+                yield {"event": event.event, "content": event.step_name}
+            elif isinstance(event, RunResponseContentEvent) and isinstance(
+                event.content, str
+            ):
+                streamed = True
+                yield {"content": event.content, "event": "RunResponseContent"}
+            elif isinstance(event, WorkflowErrorEvent):
+                raise RuntimeError(event.error)
+            elif isinstance(event, WorkflowCompletedEvent) and event.content:
+                response_content = event.content
+
+        if (
+            report_generated
+            and query_embedding is not None
+            and isinstance(response_content, AgentFinalResponse)
+            and response_content.final_answer
+            and not response_content.error_message
+        ):
+            with span("answer_cache_store"):
+                await asyncio.to_thread(
+                    answer_cache.store,
+                    request.message,
+                    query_embedding,
+                    fingerprint,
+                    response_content.model_dump_json(),
                 )
-            else:
-                response_content = str(response_content)
 
-            chunk_size = 100
-            for i in range(0, len(response_content), chunk_size):
-                chunk = response_content[i : i + chunk_size]
-                yield f"data: {json.dumps({'content': chunk, 'event': 'RunResponseContent'})}\n\n"
-                await asyncio.sleep(0.01)
+        if isinstance(response_content, AgentFinalResponse):
+            response_content = (
+                response_content.error_message or response_content.final_answer
+            )
+        else:
+            response_content = str(response_content)
 
-            yield f"data: {json.dumps({'event': 'RunCompleted', 'content': response_content})}\n\n"
+        if not streamed:
+            yield {"content": response_content, "event": "RunResponseContent"}
+        yield {
+            "event": WORKFLOW_RESULT_EVENT,
+            "content": response_content,
+            "report_generated": report_generated,
+        }
 
-        except Exception as e:
-            error_data = {"event": "RunError", "content": str(e)}
-            yield f"data: {json.dumps(error_data)}\n\n"
+    async def stream_response(
+        self,
+        team_id: str,
+        request: RunRequest,
+        files: Optional[List[File]] = None,
+        ticket: Optional[AdmissionTicket] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream response from team execution.
+        Answers to queries similar enough to an earlier one over the same files, in the same
+        conversation context, are served from the answer cache; the RunCompleted metadata tells whether the answer cache was hit.
+        Identical requests in flight at the same time, with the same message, files and
+        conversation context, share one workflow run and all receive its events; in "history"
+        conversation memory mode only requests of the same session do.
+        With an admission ticket, a request starting a workflow run waits for its slot first and
+        the run holds the slot until it ends; cache hits and coalesced requests give it back.
+        Requests without a session id start a new session, `session_id` when given, returned in
+        the RunCompleted event.
+        With the session workspace enabled, the files sent must already be in the session's
+        document workspace, and the turn analyzes all of the workspace's documents. The blobs of
+        the files sent are kept from the blob store's sweep until the run ends.
+        Each answered turn is added to the session's conversation memory after the response.
+        Every run is traced and measured; its trace id is sent in the RunCompleted metadata.
+        """
+        session_id = session_id or request.session_id or str(uuid.uuid4())
+        user_id = request.user_id or app_settings.USER_ID
+        with (
+            run_trace(session_id) as trace,
+            blob_store.pinned(file_digest(file) for file in files or []),
+        ):
+            trace.attributes.update(
+                team_id=team_id,
+                user_id=user_id,
+                files=len(files or []),
+                priority=request.priority,
+            )
+            outcome = "error"
+            first_token = True
+            try:
+                with span("session_touch"):
+                    await asyncio.to_thread(
+                        self.sessions.touch,
+                        session_id,
+                        team_id,
+                        "team",
+                        request.message[:SESSION_TITLE_LENGTH],
+                    )
+                if app_settings.SESSION_WORKSPACE_ENABLED:
+                    with span("session_workspace") as workspace_attributes:
+                        files = await asyncio.to_thread(self.session_files, session_id)
+                        workspace_attributes["documents"] = len(files)
+                context = await self.coalescing_context(request, session_id)
+                with span("answer_cache_lookup") as lookup_attributes:
+                    (
+                        cache_hit,
+                        query_embedding,
+                        fingerprint,
+                    ) = await self.lookup_cached_answer(request.message, files, context)
+                    lookup_attributes["hit"] = cache_hit is not None
+                if cache_hit:
+                    outcome = "cache_hit"
+                    response_content = AgentFinalResponse.model_validate_json(
+                        cache_hit.answer
+                    ).final_answer
+                    metadata = {
+                        "answer_cache": {
+                            "hit": True,
+                            "similarity": round(cache_hit.similarity, 4),
+                            "cached_query": cache_hit.cached_query,
+                            "cached_at": int(cache_hit.created_at),
+                        },
+                        "trace_id": trace.trace_id,
+                    }
+                    logger.info(
+                        f"Answer cache hit for {request.message!r}: {metadata['answer_cache']}"
+                    )
+                    workflow_time_to_first_token.observe(trace.elapsed_ms() / 1000)
+                    yield f"data: {json.dumps({'content': response_content, 'event': 'RunResponseContent'})}\n\n"
+                    yield f"data: {json.dumps({'event': 'RunCompleted', 'content': response_content, 'session_id': session_id, 'metadata': metadata})}\n\n"
+                    self.remember_turn(session_id, request.message, response_content)
+                    return
+
+                def produce():
+                    return self.workflow_events(
+                        request,
+                        files,
+                        session_id,
+                        user_id,
+                        query_embedding,
+                        fingerprint,
+                    )
+
+                if app_settings.COALESCE_IDENTICAL_REQUESTS:
+                    in_flight = self.in_flight
+                    key = coalescing_key(
+                        request.message,
+                        fingerprint
+                        or await asyncio.to_thread(files_fingerprint, files or []),
+                        context,
+                        # The run stores its turn in the history of its own session, which
+                        # the agents replay in history mode: requests of other sessions would
+                        # miss it
+                        session_id
+                        if app_settings.CONVERSATION_MEMORY == "history"
+                        else "",
+                    )
+                else:
+                    in_flight, key = SingleFlight(), session_id
+                if ticket and key not in in_flight.runs:
+                    with span("admission_wait"):
+                        await ticket.wait()
+                run, started = in_flight.attach(key, produce)
+                if ticket and started:
+                    ticket.hand_over(run.task)
+                trace.attributes["coalesced"] = not started
+                if not started:
+                    coalesced_requests.inc()
+
+                response_content, report_generated = "", False
+                try:
+                    async for event in run.subscribe():
+                        if event["event"] == WORKFLOW_RESULT_EVENT:
+                            response_content = event["content"]
+                            report_generated = event["report_generated"]
+                            continue
+                        if event["event"] == "RunResponseContent" and first_token:
+                            workflow_time_to_first_token.observe(
+                                trace.elapsed_ms() / 1000
+                            )
+                            first_token = False
+                        yield f"data: {json.dumps(event)}\n\n"
+                finally:
+                    in_flight.detach(run)
+
+                outcome = "report" if report_generated else "declined"
+                metadata = {
+                    "answer_cache": {"hit": False},
+                    "coalesced": not started,
+                    "trace_id": trace.trace_id,
+                }
+                yield f"data: {json.dumps({'event': 'RunCompleted', 'content': response_content, 'session_id': session_id, 'metadata': metadata})}\n\n"
+                self.remember_turn(session_id, request.message, response_content)
+
+            except (GeneratorExit, asyncio.CancelledError):
+                outcome = "cancelled"
+                raise
+            except Exception as e:
+                outcome = "error"
+                trace.attributes["error"] = str(e)
+                error_data = {"event": "RunError", "content": str(e)}
+                yield f"data: {json.dumps(error_data)}\n\n"
+            finally:
+                if ticket:
+                    ticket.release_unused()
+                trace.attributes["outcome"] = outcome
+                workflow_runs.inc(outcome=outcome)
+                workflow_run_duration.observe(
+                    trace.elapsed_ms() / 1000, outcome=outcome
+                )
 
 
 playground_service = PlaygroundService()
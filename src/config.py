@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -6,10 +8,110 @@ class Settings(BaseSettings):
 
     HUGGINGFACE_API_KEY: str
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None
 
     CHROMA_DB_PERSISTENT_PATH: str = "~/.chroma"
 
-    SESSION_ID: str = "user_session_123"
+    BLOCKING_IO_WORKERS: int = 16
+
+    BLOB_STORE_PATH: str = "tmp/blobs"
+    MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    MAX_BLOB_STORE_BYTES: int = 10 * 1024 * 1024 * 1024
+    MAX_REQUEST_BYTES: int = 200 * 1024 * 1024
+
+    EXTRACTION_CONCURRENCY: int = 4
+    EXTRACTION_CHUNK_TOKENS: int = 4000
+    # Hugging Face tokenizer of the models, for token counts; empty to estimate them
+    TOKENIZER_ID: str = "Xenova/gpt-4o"
+    PDF_MIN_TEXT_CHARS: int = 100
+    COMMENT_MODEL_EXTRACTION: bool = True
+
+    COMMENT_SEARCH_ENABLED: bool = True
+    COMMENT_SEARCH_MIN_COMMENTS: int = 1000
+    COMMENT_SEARCH_TOP_K: int = 500
+    COMMENT_SEARCH_MIN_SCORE_RATIO: float = 0.2
+
+    COMMENT_DEDUP_ENABLED: bool = True
+    COMMENT_DEDUP_TOP_REPEATED: int = 5
+
+    CACHE_PRUNE_INTERVAL: int = 64
+
+    EXTRACTION_CACHE_DB_FILE: str = "tmp/extraction_cache.db"
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 512
+    EXTRACTION_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60
+
+    UPLOAD_PREPARATION_ENABLED: bool = True
+    PREPARATION_CONCURRENCY: int = 4
+    PREPARATION_DIGEST_MAX_COMMENTS: int = 1000
+    PREPARED_FILES_DB_FILE: str = "tmp/prepared_files.db"
+
+    EMBEDDING_BACKEND: Literal["local", "huggingface"] = "local"
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_CACHE_DB_FILE: str = "tmp/embedding_cache.db"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 1_000_000
+
+    RETRIEVAL_EXTRACTION: bool = True
+    INGESTION_CHUNK_TOKENS: int = 300
+    RETRIEVAL_TOP_K: int = 8
+    RETRIEVAL_MIN_CHUNKS: int = 32
+
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_DB_FILE: str = "tmp/answer_cache.db"
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.9
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+
+    MODEL_ROUTING_POLICY: Literal["large", "small", "cascade"] = "cascade"
+    ROUTING_SMALL_MODEL: str = "gpt-4o-mini"
+    ROUTING_LARGE_MODEL: str = "gpt-4o"
+    ROUTING_SMALL_MODEL_MAX_TOKENS: int = 16000
+    ROUTING_SMALL_REPORT_MAX_TOKENS: int = 1500
+
+    CONTEXT_PACK_TOKEN_BUDGET: int = 6000
+    CONTEXT_PACK_PASSAGE_TOKENS: int = 300
+    CONTEXT_PACK_DUPLICATE_THRESHOLD: float = 0.8
+    CONTEXT_PACK_MAX_INPUT_TOKENS: int = 60000
+    CONTEXT_PACK_GROUP_TOKENS: int = 3000
+    CONTEXT_PACK_SUMMARY_TOKENS: int = 500
+    CONTEXT_PACK_CONCURRENCY: int = 8
+    CONTEXT_PACK_SUMMARY_MODEL: str = "gpt-4o-mini"
+
+    COALESCE_IDENTICAL_REQUESTS: bool = True
+
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENT_RUNS: int = 8
+    ADMISSION_MAX_RUNS_PER_USER: int = 2
+    ADMISSION_MAX_QUEUE: int = 32
+    ADMISSION_MAX_QUEUED_BULK: int = 16
+    ADMISSION_MAX_QUEUED_PER_USER: int = 8
+
+    QUERY_CLASSIFIER_ENABLED: bool = True
+    QUERY_CLASSIFIER_TRAINING_FILE: str = "data/queries/train.jsonl"
+    QUERY_CLASSIFIER_THRESHOLD: float = 0.9
+
+    SESSION_STORE_DB_FILE: str = "tmp/sessions.db"
+    SESSION_TTL_SECONDS: int = 30 * 24 * 60 * 60
+    SESSION_PAGE_SIZE: int = 50
+    SESSION_MAX_PAGE_SIZE: int = 500
+
+    SESSION_WORKSPACE_ENABLED: bool = True
+    SESSION_WORKSPACE_MAX_DOCUMENTS: int = 20
+    SESSION_WORKSPACE_MAX_BYTES: int = 200 * 1024 * 1024
+    SESSION_WORKSPACE_TOTAL_MAX_BYTES: int = 20 * 1024 * 1024 * 1024
+
+    SQLITE_POOL_SIZE: int = 8
+    SQLITE_BUSY_TIMEOUT_MS: int = 10_000
+    CONVERSATION_DB_FILE: str = "tmp/workflow_test.db"
+
+    CONVERSATION_MEMORY: Literal["history", "summary"] = "summary"
+    CONVERSATION_MEMORY_TOKEN_BUDGET: int = 1500
+    CONVERSATION_MEMORY_RAW_TURNS: int = 2
+    CONVERSATION_SUMMARY_TOKENS: int = 400
+    CONVERSATION_SUMMARY_MODEL: str = "gpt-4o-mini"
+    CONVERSATION_STORED_RUNS: int = 10
+
+    RUN_TRACES_ENABLED: bool = True
+
     USER_ID: str = "user_123"
 
 
@@ -1,4 +1,15 @@
 from src.memory.knowledge_base import knowledge_base
 from src.memory.conversation_buffer import memory_db
+from src.memory.extraction_cache import extraction_cache
+from src.memory.blob_store import blob_store
+from src.memory.answer_cache import answer_cache
+from src.memory.session_store import session_store
 
-__all__ = ["knowledge_base", "memory_db"]
+__all__ = [
+    "knowledge_base",
+    "memory_db",
+    "extraction_cache",
+    "blob_store",
+    "answer_cache",
+    "session_store",
+]
@@ -0,0 +1,178 @@
+import hashlib
+import time
+from typing import List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    Text,
+    delete,
+    func,
+    select,
+    update,
+)
+
+from src.config import app_settings
+from src.memory.sqlite import PruneSchedule, create_sqlite_engine, create_tables
+from src.observability.metrics import cache_lookups
+
+
+def answer_scope(files_fingerprint: str, context: str) -> str:
+    """
+    Fingerprint answers are stored and looked up under: the files and the conversation context,
+    so a follow-up is never answered with a reply given in another conversation.
+    """
+    return hashlib.sha256(f"{files_fingerprint}\n{context}".encode("utf-8")).hexdigest()
+
+
+class AnswerCacheHit(BaseModel):
+    answer: str
+    similarity: float
+    cached_query: str
+    created_at: float
+
+
+class AnswerCache:
+    """
+    Semantic cache of workflow answers.
+    An answer is reused for a new query over the same files, in the same conversation context (see
+    `answer_scope`), when the query embeddings have a
+    cosine similarity of at least `similarity_threshold`. Entries expire after `ttl_seconds` and
+    the least recently used ones are evicted once the cache holds more than `max_entries`,
+    checked every `prune_interval` stored answers.
+    """
+
+    def __init__(
+        self,
+        db_file: str,
+        similarity_threshold: float,
+        ttl_seconds: int,
+        max_entries: int,
+        prune_interval: int,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prune_schedule = PruneSchedule(prune_interval)
+
+        self.engine = create_sqlite_engine(db_file)
+        metadata = MetaData()
+        self.table = Table(
+            "answer_cache",
+            metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("files_fingerprint", String, nullable=False, index=True),
+            Column("query", Text, nullable=False),
+            Column("embedding", LargeBinary, nullable=False),
+            Column("answer", Text, nullable=False),
+            Column("created_at", Float, nullable=False),
+            Column("accessed_at", Float, nullable=False, index=True),
+        )
+        create_tables(metadata, self.engine)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(
+        self, query_embedding: List[float], files_fingerprint: str
+    ) -> Optional[AnswerCacheHit]:
+        """Most similar live answer for the same files, if it clears the similarity threshold"""
+        now = time.time()
+        with self.engine.begin() as conn:
+            rows = conn.execute(
+                select(
+                    self.table.c.id,
+                    self.table.c.query,
+                    self.table.c.embedding,
+                    self.table.c.answer,
+                    self.table.c.created_at,
+                ).where(
+                    self.table.c.files_fingerprint == files_fingerprint,
+                    self.table.c.created_at >= now - self.ttl_seconds,
+                )
+            ).all()
+            if not rows:
+                cache_lookups.inc(cache="answer", result="miss")
+                return None
+
+            embeddings = np.stack(
+                [np.frombuffer(row.embedding, dtype=np.float32) for row in rows]
+            )
+            similarities = embeddings @ self._normalize(query_embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                cache_lookups.inc(cache="answer", result="miss")
+                return None
+
+            row = rows[best]
+            cache_lookups.inc(cache="answer", result="hit")
+            conn.execute(
+                update(self.table)
+                .where(self.table.c.id == row.id)
+                .values(accessed_at=now)
+            )
+            return AnswerCacheHit(
+                answer=row.answer,
+                similarity=float(similarities[best]),
+                cached_query=row.query,
+                created_at=row.created_at,
+            )
+
+    def store(
+        self,
+        query: str,
+        query_embedding: List[float],
+        files_fingerprint: str,
+        answer: str,
+    ) -> None:
+        """Store an answer and evict expired or least recently used entries"""
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(
+                self.table.insert().values(
+                    files_fingerprint=files_fingerprint,
+                    query=query,
+                    embedding=self._normalize(query_embedding).tobytes(),
+                    answer=answer,
+                    created_at=now,
+                    accessed_at=now,
+                )
+            )
+            if not self.prune_schedule.due():
+                return
+            conn.execute(
+                delete(self.table).where(
+                    self.table.c.created_at < now - self.ttl_seconds
+                )
+            )
+            count = conn.execute(select(func.count()).select_from(self.table)).scalar()
+            if count > self.max_entries:
+                oldest = (
+                    select(self.table.c.id)
+                    .order_by(self.table.c.accessed_at)
+                    .limit(count - self.max_entries)
+                )
+                conn.execute(delete(self.table).where(self.table.c.id.in_(oldest)))
+
+    def clear(self) -> None:
+        """Remove every entry from the cache"""
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table))
+
+
+answer_cache = AnswerCache(
+    db_file=app_settings.ANSWER_CACHE_DB_FILE,
+    similarity_threshold=app_settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ttl_seconds=app_settings.ANSWER_CACHE_TTL_SECONDS,
+    max_entries=app_settings.ANSWER_CACHE_MAX_ENTRIES,
+    prune_interval=app_settings.CACHE_PRUNE_INTERVAL,
+)
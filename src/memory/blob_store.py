@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Set
+
+from agno.media import File
+from fastapi import UploadFile
+
+from src.config import app_settings
+
+COPY_CHUNK_SIZE = 1 << 20
+# A sweep frees space down to this share of the size cap, so it does not run on every upload
+SWEEP_LOW_WATERMARK = 0.9
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded files.
+    Blobs are stored once per sha256 digest, so identical uploads share a single copy on disk.
+    The store is capped at `max_total_bytes`: past it, the least recently used blobs are removed,
+    except the ones still referenced: pinned by a run in progress, or listed by a reference source
+    such as the session workspaces.
+    """
+
+    def __init__(self, root: str, max_blob_bytes: int, max_total_bytes: int):
+        self.root = Path(root)
+        self.max_blob_bytes = max_blob_bytes
+        self.max_total_bytes = max_total_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.total_bytes: Optional[int] = None
+        self.pins: Counter[str] = Counter()
+        self.reference_sources: List[Callable[[], Iterable[str]]] = []
+
+    def path_for(self, digest: str, mime_type: Optional[str]) -> Path:
+        extension = mimetypes.guess_extension(mime_type or "") or ""
+        return self.root / digest[:2] / f"{digest}{extension}"
+
+    def _hash(self, stream: BinaryIO) -> str:
+        """Hash a stream chunk by chunk, failing as soon as it exceeds the size limit"""
+        digest = hashlib.sha256()
+        size = 0
+        while chunk := stream.read(COPY_CHUNK_SIZE):
+            size += len(chunk)
+            if size > self.max_blob_bytes:
+                raise UploadTooLargeError(
+                    f"File exceeds the {self.max_blob_bytes} bytes upload limit"
+                )
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def put_stream(self, stream: BinaryIO, mime_type: Optional[str]) -> str:
+        """Store a stream and return its digest. Already stored content is only hashed"""
+        digest = self._hash(stream)
+        path = self.path_for(digest, mime_type)
+        if path.exists():
+            self.touch(path)
+            return digest
+
+        stream.seek(0)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as temporary:
+            try:
+                shutil.copyfileobj(stream, temporary, COPY_CHUNK_SIZE)
+            except BaseException:
+                temporary.close()
+                os.unlink(temporary.name)
+                raise
+        size = os.path.getsize(temporary.name)
+        os.replace(temporary.name, path)
+        self._add_stored_bytes(size)
+        return digest
+
+    def blobs(self) -> Iterator[os.DirEntry]:
+        """The stored blobs, without the temporary files of uploads in progress"""
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.is_file() and not entry.name.startswith(
+                    tempfile.gettempprefix()
+                ):
+                    yield entry
+
+    def _add_stored_bytes(self, size: int) -> None:
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(entry.stat().st_size for entry in self.blobs())
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_total_bytes:
+                self._sweep()
+
+    def add_reference_source(self, source: Callable[[], Iterable[str]]) -> None:
+        """Register a callable listing digests the sweep must keep"""
+        self.reference_sources.append(source)
+
+    @contextmanager
+    def pinned(self, digests: Iterable[str]) -> Iterator[None]:
+        """Keep the blobs from being swept while the block runs"""
+        digests = list(digests)
+        with self.lock:
+            self.pins.update(digests)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.pins.subtract(digests)
+                self.pins += Counter()
+
+    def _referenced(self) -> Set[str]:
+        referenced = set(self.pins)
+        for source in self.reference_sources:
+            referenced.update(source())
+        return referenced
+
+    def _sweep(self) -> None:
+        """
+        Remove the least recently used blobs that are not referenced until the store is under its
+        low watermark
+        """
+        referenced = self._referenced()
+        entries = sorted(
+            (
+                (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                for entry in self.blobs()
+                if Path(entry.name).stem not in referenced
+            )
+        )
+        target = self.max_total_bytes * SWEEP_LOW_WATERMARK
+        for _, size, blob_path in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.unlink(blob_path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+
+    @staticmethod
+    def touch(path: Path) -> None:
+        """Mark a blob as recently used, so the sweep keeps it"""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def contains(self, digest: str, mime_type: Optional[str]) -> bool:
+        return self.path_for(digest, mime_type).exists()
+
+    async def put_upload(self, upload: UploadFile) -> File:
+        """Stream an upload into the store and return a lazily read file handle"""
+        digest = await asyncio.to_thread(
+            self.put_stream, upload.file, upload.content_type
+        )
+        return self.file(digest, upload.filename, upload.content_type)
+
+    def file(self, digest: str, name: Optional[str], mime_type: Optional[str]) -> File:
+        """A handle on a stored blob, which marks it as recently used"""
+        path = self.path_for(digest, mime_type)
+        self.touch(path)
+        return File(filepath=path, name=name, mime_type=mime_type)
+
+
+def file_digest(file: File) -> str:
+    """Digest of a file, taken from its blob path when it is stored in the blob store"""
+    if file.filepath is not None and Path(file.filepath).is_relative_to(
+        blob_store.root
+    ):
+        return Path(file.filepath).stem
+    if file.filepath is not None:
+        with open(file.filepath, "rb") as stream:
+            return hashlib.file_digest(stream, "sha256").hexdigest()
+    content = file.content
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content or b"").hexdigest()
+
+
+def files_fingerprint(files: List[File]) -> str:
+    """Order-independent fingerprint of a set of files, from their digests and mime types"""
+    parts = sorted(f"{file_digest(file)}:{file.mime_type}" for file in files)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def open_file(file: File) -> BinaryIO:
+    """Open a file for streaming reads, whether it is backed by a path or by bytes"""
+    if file.filepath is not None:
+        return open(file.filepath, "rb")
+    content = file.content
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return BytesIO(content or b"")
+
+
+blob_store = BlobStore(
+    root=app_settings.BLOB_STORE_PATH,
+    max_blob_bytes=app_settings.MAX_UPLOAD_BYTES,
+    max_total_bytes=app_settings.MAX_BLOB_STORE_BYTES,
+)
@@ -1,7 +1,72 @@
+from typing import Literal, Optional
+
 from agno.storage.sqlite import SqliteStorage
+from sqlalchemy import inspect, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from src.config import app_settings
+from src.memory.sqlite import create_sqlite_engine
+
+
+class PooledSqliteStorage(SqliteStorage):
+    """
+    SqliteStorage bound to a shared engine.
+    SqliteStorage.__init__ replaces a given db_engine with an in-memory one, so the engine is
+    bound after construction.
+    With `max_runs`, only the last runs of a session are stored: the whole session is rewritten
+    after every run, so keeping every run would make each turn of a long session slower.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        db_engine: Engine,
+        mode: Literal["agent", "team", "workflow", "workflow_v2"],
+        max_runs: Optional[int] = None,
+    ):
+        super().__init__(table_name=table_name, mode=mode)
+        self.db_engine = db_engine
+        self.inspector = inspect(db_engine)
+        self.SqlSession = sessionmaker(bind=db_engine)
+        self.max_runs = max_runs
+
+    def upsert(self, session, create_and_retry: bool = True):
+        if self.max_runs is not None:
+            if self.mode == "workflow_v2" and session.runs:
+                session.runs = session.runs[-self.max_runs :]
+            elif self.mode == "agent" and session.memory and session.memory.get("runs"):
+                session.memory["runs"] = session.memory["runs"][-self.max_runs :]
+        return super().upsert(session, create_and_retry=create_and_retry)
 
-memory_db = SqliteStorage(
+    def latest_run_id(self, session_id: str) -> Optional[str]:
+        """The id of the last run stored for a workflow session, None when it has none"""
+        try:
+            with self.SqlSession() as sess:
+                runs = sess.execute(
+                    select(self.table.c.runs).where(
+                        self.table.c.session_id == session_id
+                    )
+                ).scalar()
+        except Exception as e:
+            if "no such table" not in str(e):
+                raise
+            return None
+        return runs[-1].get("run_id") if runs else None
+
+
+conversation_engine = create_sqlite_engine(app_settings.CONVERSATION_DB_FILE)
+
+memory_db = PooledSqliteStorage(
     table_name="workflow_test",
-    db_file="tmp/workflow_test.db",
+    db_engine=conversation_engine,
     mode="workflow_v2",
+    max_runs=app_settings.CONVERSATION_STORED_RUNS,
+)
+
+agent_memory_db = PooledSqliteStorage(
+    table_name="agent_sessions",
+    db_engine=conversation_engine,
+    mode="agent",
+    max_runs=app_settings.CONVERSATION_STORED_RUNS,
 )
@@ -0,0 +1,232 @@
+import asyncio
+import time
+from typing import List, Optional, Set
+
+from agno.models.message import Message
+from agno.utils.log import logger
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    delete,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+
+from src.agents.conversation_summarizer_agent import conversation_summarizer_agent
+from src.config import app_settings
+from src.memory.conversation_buffer import conversation_engine
+from src.memory.sqlite import create_tables
+from src.processing.tokens import count_tokens, truncate_to_tokens
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+class ConversationMemory:
+    """
+    Rolling conversation memory: an incrementally updated summary of the older turns of a session
+    plus its last `raw_turns` turns verbatim, packed into at most `token_budget` tokens.
+    Turns are recorded after the answer has been sent, and folding the turns that fall out of the
+    raw window into the summary happens in the background, so the request path only reads one
+    summary row and a few turns whatever the length of the session.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        token_budget: int,
+        raw_turns: int,
+        summary_tokens: int,
+    ):
+        self.token_budget = token_budget
+        self.raw_turns = raw_turns
+        self.summary_tokens = summary_tokens
+        self._background_tasks: Set[asyncio.Task] = set()
+
+        self.engine = engine
+        metadata = MetaData()
+        self.turns = Table(
+            "conversation_turns",
+            metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("session_id", String, nullable=False, index=True),
+            Column("query", Text, nullable=False),
+            Column("answer", Text, nullable=False),
+            Column("created_at", Float, nullable=False),
+        )
+        self.summaries = Table(
+            "conversation_summaries",
+            metadata,
+            Column("session_id", String, primary_key=True),
+            Column("summary", Text, nullable=False),
+            Column("last_turn_id", Integer, nullable=False),
+            Column("updated_at", Float, nullable=False),
+        )
+        create_tables(metadata, self.engine)
+
+    def _load(self, session_id: str, limit: Optional[int] = None):
+        """Summary row of a session and its unsummarized turns, the newest `limit` ones if given"""
+        with self.engine.connect() as conn:
+            summary = conn.execute(
+                select(self.summaries).where(self.summaries.c.session_id == session_id)
+            ).first()
+            last_turn_id = summary.last_turn_id if summary else 0
+            query = (
+                select(self.turns)
+                .where(
+                    self.turns.c.session_id == session_id,
+                    self.turns.c.id > last_turn_id,
+                )
+                .order_by(self.turns.c.id.desc())
+            )
+            if limit is not None:
+                query = query.limit(limit)
+            turns = conn.execute(query).all()
+        return summary, list(reversed(turns))
+
+    def context_messages(self, session_id: str) -> List[Message]:
+        """
+        Messages carrying the conversation so far: the summary, then the newest raw turns that fit
+        in the token budget. The oldest turn that does not fit entirely has its answer truncated.
+        """
+        summary, turns = self._load(session_id, limit=self.raw_turns)
+        messages: List[Message] = []
+        remaining = self.token_budget
+        if summary and summary.summary:
+            summary_text = SUMMARY_PREFIX + truncate_to_tokens(
+                summary.summary, min(self.summary_tokens, remaining)
+            )
+            messages.append(Message(role="system", content=summary_text))
+            remaining -= count_tokens(summary_text)
+
+        raw_messages: List[Message] = []
+        for turn in reversed(turns):
+            query_tokens = count_tokens(turn.query)
+            if query_tokens >= remaining:
+                break
+            answer = truncate_to_tokens(turn.answer, remaining - query_tokens)
+            raw_messages[:0] = [
+                Message(role="user", content=turn.query),
+                Message(role="assistant", content=answer),
+            ]
+            remaining -= query_tokens + count_tokens(answer)
+            if answer != turn.answer:
+                break
+        return messages + raw_messages
+
+    def add_turn(self, session_id: str, query: str, answer: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(
+                self.turns.insert().values(
+                    session_id=session_id,
+                    query=query,
+                    answer=answer,
+                    created_at=time.time(),
+                )
+            )
+
+    def _save_summary(
+        self, session_id: str, summary: str, previous_turn_id: int, last_turn_id: int
+    ) -> bool:
+        """
+        Store a summary folding the turns up to `last_turn_id`, unless another worker folded turns
+        of the session since `previous_turn_id` was read. The folded turns are deleted.
+        """
+        now = time.time()
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                insert(self.summaries)
+                .values(
+                    session_id=session_id,
+                    summary=summary,
+                    last_turn_id=last_turn_id,
+                    updated_at=now,
+                )
+                .on_conflict_do_update(
+                    index_elements=[self.summaries.c.session_id],
+                    set_={
+                        "summary": summary,
+                        "last_turn_id": last_turn_id,
+                        "updated_at": now,
+                    },
+                    where=self.summaries.c.last_turn_id == previous_turn_id,
+                )
+            )
+            if result.rowcount == 0:
+                return False
+            conn.execute(
+                delete(self.turns).where(
+                    self.turns.c.session_id == session_id,
+                    self.turns.c.id <= last_turn_id,
+                )
+            )
+        return True
+
+    async def summarize(self, summary: str, turns) -> str:
+        """Fold turns into the running summary with the summarizer model"""
+        rendered_turns = "\n\n".join(
+            f"USER: {turn.query}\nANALYST: {truncate_to_tokens(turn.answer, self.summary_tokens * 4)}"
+            for turn in turns
+        )
+        response = await conversation_summarizer_agent.arun(
+            f"""
+            CURRENT SUMMARY:
+            {summary or "The conversation just started."}
+
+            NEW TURNS:
+            {rendered_turns}
+
+            Return the updated summary in at most {self.summary_tokens * 3 // 4} words.
+            """
+        )
+        return truncate_to_tokens(str(response.content).strip(), self.summary_tokens)
+
+    async def update(self, session_id: str, query: str, answer: str) -> None:
+        """Record a turn and fold the turns that fell out of the raw window into the summary"""
+        await asyncio.to_thread(self.add_turn, session_id, query, answer)
+        summary, turns = await asyncio.to_thread(self._load, session_id)
+        if len(turns) <= self.raw_turns:
+            return
+        overflow = turns[: len(turns) - self.raw_turns]
+        new_summary = await self.summarize(summary.summary if summary else "", overflow)
+        await asyncio.to_thread(
+            self._save_summary,
+            session_id,
+            new_summary,
+            summary.last_turn_id if summary else 0,
+            overflow[-1].id,
+        )
+
+    async def _update_in_background(
+        self, session_id: str, query: str, answer: str
+    ) -> None:
+        try:
+            await self.update(session_id, query, answer)
+        except Exception as e:
+            logger.warning(f"Conversation memory update failed for {session_id}: {e}")
+
+    def schedule_update(self, session_id: str, query: str, answer: str) -> None:
+        """Update the memory of a session off the request path"""
+        task = asyncio.create_task(
+            self._update_in_background(session_id, query, answer)
+        )
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def wait_for_updates(self) -> None:
+        """Wait for the scheduled updates, for shutdown and benchmarks"""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks)
+
+
+conversation_memory = ConversationMemory(
+    engine=conversation_engine,
+    token_budget=app_settings.CONVERSATION_MEMORY_TOKEN_BUDGET,
+    raw_turns=app_settings.CONVERSATION_MEMORY_RAW_TURNS,
+    summary_tokens=app_settings.CONVERSATION_SUMMARY_TOKENS,
+)
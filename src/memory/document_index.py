@@ -0,0 +1,123 @@
+import hashlib
+from itertools import batched
+from typing import Iterable, Iterator, List, Optional
+
+from agno.media import File
+from agno.vectordb.chroma import ChromaDb
+
+from src.config import app_settings
+from src.memory.blob_store import file_digest, open_file
+from src.memory.knowledge_base import vector_storage_pdf, vector_storage_text
+from src.processing.comment_parser import chunk_comments, iter_comments, render_comments
+from src.processing.pdf_parser import ParsedPdf, parse_pdf
+
+
+class DocumentIndex:
+    """
+    Chunk index of uploaded files over a Chroma collection.
+    Chunk ids are derived from the file digest and the chunk text, so chunks that are already
+    indexed are never embedded again.
+    """
+
+    def __init__(self, vector_db: ChromaDb, batch_size: int = 64):
+        self.vector_db = vector_db
+        self.batch_size = batch_size
+
+    @property
+    def collection(self):
+        if self.vector_db._collection is None:
+            self.vector_db.create()
+        return self.vector_db._collection
+
+    @staticmethod
+    def chunk_id(digest: str, text: str) -> str:
+        return hashlib.sha256(f"{digest}:{text}".encode("utf-8")).hexdigest()
+
+    def ingest(self, digest: str, filename: str, chunks: Iterable[str]) -> int:
+        """Index the chunks of a file, embedding only the missing ones. Returns the chunk count"""
+        total = 0
+        for batch in batched(enumerate(chunks), self.batch_size):
+            chunks_by_id = {}
+            for position, text in batch:
+                chunks_by_id.setdefault(self.chunk_id(digest, text), (position, text))
+            existing = set(
+                self.collection.get(ids=list(chunks_by_id), include=[])["ids"]
+            )
+            missing = [
+                (chunk_id, position, text)
+                for chunk_id, (position, text) in chunks_by_id.items()
+                if chunk_id not in existing
+            ]
+            total += len(batch)
+            if not missing:
+                continue
+
+            self.collection.add(
+                ids=[chunk_id for chunk_id, _, _ in missing],
+                embeddings=self.vector_db.embedder.get_embeddings(
+                    [text for _, _, text in missing]
+                ),
+                documents=[text for _, _, text in missing],
+                metadatas=[
+                    {"file_digest": digest, "filename": filename, "position": position}
+                    for _, position, _ in missing
+                ],
+            )
+        return total
+
+    def search(self, query: str, digest: str, limit: int) -> List[str]:
+        """Top `limit` chunks of a file for the query, in document order"""
+        documents = self.vector_db.search(
+            query, limit=limit, filters={"file_digest": digest}
+        )
+        documents.sort(key=lambda document: document.meta_data.get("position", 0))
+        return [document.content for document in documents]
+
+
+def comment_chunks(file: File) -> Iterator[str]:
+    with open_file(file) as stream:
+        for chunk in chunk_comments(
+            iter_comments(stream), app_settings.INGESTION_CHUNK_TOKENS
+        ):
+            yield render_comments(chunk)
+
+
+def page_chunks(parsed_pdf: ParsedPdf) -> Iterator[str]:
+    for page in parsed_pdf.text_pages:
+        yield f"[page {page.page_number + 1}]\n{page.text}"
+
+
+def report_chunks(file: File) -> Iterator[str]:
+    with open_file(file) as stream:
+        parsed_pdf = parse_pdf(stream, app_settings.PDF_MIN_TEXT_CHARS)
+    return page_chunks(parsed_pdf)
+
+
+report_index = DocumentIndex(vector_storage_pdf)
+comment_index = DocumentIndex(vector_storage_text)
+
+
+def index_for(file: File) -> DocumentIndex:
+    return comment_index if file.mime_type == "text/plain" else report_index
+
+
+def ingest_file(file: File, chunks: Optional[Iterable[str]] = None) -> int:
+    """
+    Chunk and index an uploaded PDF or comment file. Returns its chunk count.
+    Already computed chunks (e.g. the pages of a parsed PDF) can be passed to skip re-reading the file.
+    """
+    if chunks is None:
+        chunks = (
+            comment_chunks(file)
+            if file.mime_type == "text/plain"
+            else report_chunks(file)
+        )
+    return index_for(file).ingest(file_digest(file), file.name or "", chunks)
+
+
+def retrieve_context(file: File, query: str) -> str:
+    """Text of the chunks of a file most relevant to the query"""
+    chunks = index_for(file).search(
+        query, file_digest(file), app_settings.RETRIEVAL_TOP_K
+    )
+    return "\n\n".join(chunks)
@@ -1,7 +1,102 @@
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.embedder.base import Embedder
 from agno.embedder.huggingface import HuggingfaceCustomEmbedder
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
 from src.config import app_settings
+from src.memory.embedding_cache import EmbeddingCache, embedding_cache
+
+
+@dataclass
+class LocalEmbedder(Embedder):
+    """
+    all-MiniLM-L6-v2 run in-process on CPU with ONNX Runtime.
+    The model is downloaded on first use, then loaded once and shared by every request.
+    """
+
+    id: str = "sentence-transformers/all-MiniLM-L6-v2"
+    dimensions: int = 384
+    batch_size: int = 64
+    _model: Optional[ONNXMiniLM_L6_V2] = field(default=None, init=False, repr=False)
+    _lock: Any = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @property
+    def model(self) -> ONNXMiniLM_L6_V2:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    model = ONNXMiniLM_L6_V2()
+                    # The first call downloads the weights and loads the tokenizer and session
+                    model(["warm up"])
+                    self._model = model
+        return self._model
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(
+                embedding.tolist()
+                for embedding in self.model(texts[start : start + self.batch_size])
+            )
+        return embeddings
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+
+@dataclass
+class CachedEmbedder(Embedder):
+    """Embedder wrapper that serves already embedded texts from the embedding cache"""
+
+    embedder: Embedder = field(default_factory=LocalEmbedder)
+    cache: EmbeddingCache = field(default=embedding_cache)
+
+    def __post_init__(self):
+        self.dimensions = self.embedder.dimensions
+
+    def cache_key(self, text: str) -> str:
+        model_id = getattr(self.embedder, "id", type(self.embedder).__name__)
+        return hashlib.sha256(f"{model_id}:{text}".encode("utf-8")).hexdigest()
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in one batch, only computing the ones missing from the cache"""
+        keys = [self.cache_key(text) for text in texts]
+        embeddings = self.cache.get_many(set(keys))
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in embeddings}
+        if missing:
+            if hasattr(self.embedder, "get_embeddings"):
+                computed = self.embedder.get_embeddings(list(missing.values()))
+            else:
+                computed = [
+                    self.embedder.get_embedding(text) for text in missing.values()
+                ]
+            computed_embeddings = dict(zip(missing, computed))
+            self.cache.set_many(computed_embeddings)
+            embeddings.update(computed_embeddings)
+
+        return [embeddings[key] for key in keys]
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+
+if app_settings.EMBEDDING_BACKEND == "huggingface":
+    embedding_backend = HuggingfaceCustomEmbedder(
+        id="sentence-transformers/all-MiniLM-L6-v2",
+        api_key=app_settings.HUGGINGFACE_API_KEY,
+    )
+else:
+    embedding_backend = LocalEmbedder(batch_size=app_settings.EMBEDDING_BATCH_SIZE)
 
-embedder = HuggingfaceCustomEmbedder(
-    id="sentence-transformers/all-MiniLM-L6-v2",
-    api_key=app_settings.HUGGINGFACE_API_KEY,
-)
+embedder = CachedEmbedder(embedder=embedding_backend, cache=embedding_cache)
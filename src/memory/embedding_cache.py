@@ -0,0 +1,105 @@
+import time
+from itertools import batched
+from typing import Dict, Iterable, List
+
+import numpy as np
+from sqlalchemy import (
+    Column,
+    Float,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    select,
+)
+
+from src.config import app_settings
+from src.memory.sqlite import PruneSchedule, create_sqlite_engine, create_tables
+from src.observability.metrics import cache_lookups
+
+SQLITE_MAX_PARAMETERS = 500
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of embeddings, keyed by a hash of the embedding model and the text.
+    Vectors are stored as float32 bytes. Once the cache holds more than `max_entries`,
+    the oldest entries are evicted, checked every `prune_interval` stored embeddings.
+    """
+
+    def __init__(self, db_file: str, max_entries: int, prune_interval: int):
+        self.max_entries = max_entries
+        self.prune_schedule = PruneSchedule(prune_interval)
+
+        self.engine = create_sqlite_engine(db_file)
+        metadata = MetaData()
+        self.table = Table(
+            "embedding_cache",
+            metadata,
+            Column("key", String, primary_key=True),
+            Column("embedding", LargeBinary, nullable=False),
+            Column("created_at", Float, nullable=False, index=True),
+        )
+        create_tables(metadata, self.engine)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """Get the cached embeddings of the keys that are present"""
+        keys = list(keys)
+        embeddings = {}
+        with self.engine.connect() as conn:
+            for batch in batched(keys, SQLITE_MAX_PARAMETERS):
+                rows = conn.execute(
+                    select(self.table.c.key, self.table.c.embedding).where(
+                        self.table.c.key.in_(batch)
+                    )
+                )
+                for row in rows:
+                    embeddings[row.key] = np.frombuffer(
+                        row.embedding, dtype=np.float32
+                    ).tolist()
+        cache_lookups.inc(len(embeddings), cache="embedding", result="hit")
+        cache_lookups.inc(len(keys) - len(embeddings), cache="embedding", result="miss")
+        return embeddings
+
+    def set_many(self, embeddings: Dict[str, List[float]]) -> None:
+        """Store embeddings and evict the oldest entries above the capacity"""
+        if not embeddings:
+            return
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(self.table).prefix_with("OR IGNORE"),
+                [
+                    {
+                        "key": key,
+                        "embedding": np.asarray(embedding, dtype=np.float32).tobytes(),
+                        "created_at": now,
+                    }
+                    for key, embedding in embeddings.items()
+                ],
+            )
+            if not self.prune_schedule.due(len(embeddings)):
+                return
+            count = conn.execute(select(func.count()).select_from(self.table)).scalar()
+            if count > self.max_entries:
+                oldest = (
+                    select(self.table.c.key)
+                    .order_by(self.table.c.created_at)
+                    .limit(count - self.max_entries)
+                )
+                conn.execute(delete(self.table).where(self.table.c.key.in_(oldest)))
+
+    def clear(self) -> None:
+        """Remove every entry from the cache"""
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table))
+
+
+embedding_cache = EmbeddingCache(
+    db_file=app_settings.EMBEDDING_CACHE_DB_FILE,
+    max_entries=app_settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    prune_interval=app_settings.CACHE_PRUNE_INTERVAL,
+)
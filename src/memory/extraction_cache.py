@@ -0,0 +1,128 @@
+import hashlib
+import time
+from typing import List, Optional
+
+from agno.media import File
+from sqlalchemy import (
+    Column,
+    Float,
+    MetaData,
+    String,
+    Table,
+    Text,
+    delete,
+    func,
+    select,
+    update,
+)
+
+from src.config import app_settings
+from src.memory.sqlite import PruneSchedule, create_sqlite_engine, create_tables
+from src.memory.blob_store import file_digest
+from src.observability.metrics import cache_lookups
+
+
+def normalize_guidelines(guidelines: str) -> str:
+    """Collapse whitespace and casing so equivalent guidelines share a key"""
+    return " ".join(guidelines.split()).casefold()
+
+
+class ExtractionCache:
+    """
+    Persistent cache for extraction results, keyed on file contents and guidelines.
+    Entries expire after `ttl_seconds` and the least recently used ones are evicted
+    once the cache holds more than `max_entries`, checked every `prune_interval` writes.
+    """
+
+    def __init__(
+        self, db_file: str, max_entries: int, ttl_seconds: int, prune_interval: int
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.prune_schedule = PruneSchedule(prune_interval)
+
+        self.engine = create_sqlite_engine(db_file)
+        metadata = MetaData()
+        self.table = Table(
+            "extraction_cache",
+            metadata,
+            Column("key", String, primary_key=True),
+            Column("value", Text, nullable=False),
+            Column("created_at", Float, nullable=False),
+            Column("accessed_at", Float, nullable=False, index=True),
+        )
+        create_tables(metadata, self.engine)
+
+    @staticmethod
+    def make_key(files: List[File], guidelines: str, models: str = "") -> str:
+        """
+        Build a cache key from the file bytes, mime types, normalized guidelines and the models
+        the extraction can be routed to
+        """
+        parts = sorted(f"{file_digest(file)}:{file.mime_type}" for file in files)
+        parts.append(normalize_guidelines(guidelines))
+        parts.append(models)
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached value, refreshing its recency. Expired entries are dropped"""
+        now = time.time()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(self.table.c.value, self.table.c.created_at).where(
+                    self.table.c.key == key
+                )
+            ).first()
+            if row is None:
+                cache_lookups.inc(cache="extraction", result="miss")
+                return None
+            if now - row.created_at > self.ttl_seconds:
+                conn.execute(delete(self.table).where(self.table.c.key == key))
+                cache_lookups.inc(cache="extraction", result="miss")
+                return None
+            conn.execute(
+                update(self.table)
+                .where(self.table.c.key == key)
+                .values(accessed_at=now)
+            )
+            cache_lookups.inc(cache="extraction", result="hit")
+            return row.value
+
+    def set(self, key: str, value: str) -> None:
+        """Store a value and evict expired or least recently used entries"""
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == key))
+            conn.execute(
+                self.table.insert().values(
+                    key=key, value=value, created_at=now, accessed_at=now
+                )
+            )
+            if not self.prune_schedule.due():
+                return
+            conn.execute(
+                delete(self.table).where(
+                    self.table.c.created_at < now - self.ttl_seconds
+                )
+            )
+            count = conn.execute(select(func.count()).select_from(self.table)).scalar()
+            if count > self.max_entries:
+                oldest = (
+                    select(self.table.c.key)
+                    .order_by(self.table.c.accessed_at)
+                    .limit(count - self.max_entries)
+                )
+                conn.execute(delete(self.table).where(self.table.c.key.in_(oldest)))
+
+    def clear(self) -> None:
+        """Remove every entry from the cache"""
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table))
+
+
+extraction_cache = ExtractionCache(
+    db_file=app_settings.EXTRACTION_CACHE_DB_FILE,
+    max_entries=app_settings.EXTRACTION_CACHE_MAX_ENTRIES,
+    ttl_seconds=app_settings.EXTRACTION_CACHE_TTL_SECONDS,
+    prune_interval=app_settings.CACHE_PRUNE_INTERVAL,
+)
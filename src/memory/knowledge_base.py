@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from agno.vectordb.chroma import ChromaDb
 from agno.knowledge.combined import CombinedKnowledgeBase
 from agno.knowledge.pdf import PDFKnowledgeBase
@@ -6,7 +8,7 @@ from src.config import app_settings
 from src.memory.embedder import embedder
 
 vector_storage_config = {
-    "path": app_settings.CHROMA_DB_PERSISTENT_PATH,
+    "path": str(Path(app_settings.CHROMA_DB_PERSISTENT_PATH).expanduser()),
     "persistent_client": True,
     "embedder": embedder,
 }
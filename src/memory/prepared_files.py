@@ -0,0 +1,72 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, delete, select
+
+from src.config import app_settings
+from src.memory.sqlite import create_sqlite_engine, create_tables
+
+STORED = "stored"
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+
+
+@dataclass
+class PreparedFile:
+    file_id: str
+    name: str
+    mime_type: str
+    status: str
+    error: str
+    updated_at: float
+
+
+class PreparedFileStore:
+    """
+    Uploaded files and the state of their background preparation, persisted in SQLite so every
+    worker process can resolve a file id and tell whether its artifacts are ready.
+    A file id is the digest of the file contents in the blob store.
+    """
+
+    def __init__(self, db_file: str):
+        self.engine = create_sqlite_engine(db_file)
+        metadata = MetaData()
+        self.table = Table(
+            "prepared_files",
+            metadata,
+            Column("file_id", String, primary_key=True),
+            Column("name", String, nullable=False),
+            Column("mime_type", String, nullable=False),
+            Column("status", String, nullable=False),
+            Column("error", Text, nullable=False, default=""),
+            Column("updated_at", Float, nullable=False),
+        )
+        create_tables(metadata, self.engine)
+
+    def set(
+        self, file_id: str, name: str, mime_type: str, status: str, error: str = ""
+    ) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.file_id == file_id))
+            conn.execute(
+                self.table.insert().values(
+                    file_id=file_id,
+                    name=name,
+                    mime_type=mime_type,
+                    status=status,
+                    error=error,
+                    updated_at=time.time(),
+                )
+            )
+
+    def get(self, file_id: str) -> Optional[PreparedFile]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table).where(self.table.c.file_id == file_id)
+            ).first()
+        return PreparedFile(**row._mapping) if row else None
+
+
+prepared_file_store = PreparedFileStore(app_settings.PREPARED_FILES_DB_FILE)
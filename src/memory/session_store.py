@@ -0,0 +1,231 @@
+import base64
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    and_,
+    delete,
+    or_,
+    select,
+    update,
+)
+
+from src.config import app_settings
+from src.memory.sqlite import PruneSchedule, create_sqlite_engine, create_tables
+
+ENTITY_TYPES = ("agent", "team")
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+class SessionStore:
+    """
+    Playground sessions persisted in SQLite, so every worker process shares them.
+    Sessions are listed newest first with keyset pagination over (created_at, session_id), which
+    the per-entity indexes serve directly. Sessions untouched for `ttl_seconds` are evicted,
+    checked every `prune_interval` created or touched sessions; reads skip them until then.
+    """
+
+    def __init__(self, db_file: str, ttl_seconds: int, prune_interval: int):
+        self.ttl_seconds = ttl_seconds
+        self.prune_schedule = PruneSchedule(prune_interval)
+
+        self.engine = create_sqlite_engine(db_file)
+        metadata = MetaData()
+        self.table = Table(
+            "playground_sessions",
+            metadata,
+            Column("session_id", String, primary_key=True),
+            Column("title", String, nullable=False),
+            Column("agent_id", String, nullable=True),
+            Column("team_id", String, nullable=True),
+            Column("created_at", Integer, nullable=False),
+            Column("updated_at", Integer, nullable=False, index=True),
+            Column("messages", Text, nullable=False, default="[]"),
+            Index(
+                "ix_playground_sessions_agent", "agent_id", "created_at", "session_id"
+            ),
+            Index("ix_playground_sessions_team", "team_id", "created_at", "session_id"),
+        )
+        create_tables(metadata, self.engine)
+
+    @staticmethod
+    def encode_cursor(created_at: int, session_id: str) -> str:
+        return base64.urlsafe_b64encode(f"{created_at}:{session_id}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[int, str]:
+        try:
+            created_at, session_id = (
+                base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+            )
+            return int(created_at), session_id
+        except ValueError as e:
+            raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+    def _entity_column(self, entity_type: str):
+        if entity_type not in ENTITY_TYPES:
+            raise ValueError(f"Unknown entity type {entity_type}")
+        return self.table.c[f"{entity_type}_id"]
+
+    def _row_to_session(self, row) -> Dict[str, Any]:
+        session = {
+            "session_id": row.session_id,
+            "title": row.title,
+            "created_at": row.created_at,
+            "messages": json.loads(row.messages),
+        }
+        for entity_type in ENTITY_TYPES:
+            entity_id = getattr(row, f"{entity_type}_id")
+            if entity_id is not None:
+                session[f"{entity_type}_id"] = entity_id
+        return session
+
+    def _evict_expired(self, conn, now: int) -> None:
+        if self.prune_schedule.due():
+            conn.execute(
+                delete(self.table).where(
+                    self.table.c.updated_at < now - self.ttl_seconds
+                )
+            )
+
+    def create(
+        self, entity_id: str, entity_type: str, title: str = "New Session"
+    ) -> str:
+        """Create a session for an agent or a team, evicting expired sessions"""
+        entity_column = self._entity_column(entity_type)
+        session_id = str(uuid.uuid4())
+        now = int(time.time())
+        with self.engine.begin() as conn:
+            conn.execute(
+                self.table.insert().values(
+                    {
+                        "session_id": session_id,
+                        "title": title,
+                        entity_column.name: entity_id,
+                        "created_at": now,
+                        "updated_at": now,
+                        "messages": "[]",
+                    }
+                )
+            )
+            self._evict_expired(conn, now)
+        return session_id
+
+    def touch(
+        self, session_id: str, entity_id: str, entity_type: str, title: str
+    ) -> None:
+        """
+        Record activity on a session, creating it with the given title if it does not exist,
+        evicting expired sessions
+        """
+        entity_column = self._entity_column(entity_type)
+        now = int(time.time())
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                update(self.table)
+                .where(self.table.c.session_id == session_id)
+                .values(updated_at=now)
+            )
+            if updated.rowcount == 0:
+                conn.execute(
+                    self.table.insert()
+                    .prefix_with("OR IGNORE")
+                    .values(
+                        {
+                            "session_id": session_id,
+                            "title": title,
+                            entity_column.name: entity_id,
+                            "created_at": now,
+                            "updated_at": now,
+                            "messages": "[]",
+                        }
+                    )
+                )
+            self._evict_expired(conn, now)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session by id, None if it does not exist or has expired"""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table).where(
+                    self.table.c.session_id == session_id,
+                    self.table.c.updated_at >= int(time.time()) - self.ttl_seconds,
+                )
+            ).first()
+        return self._row_to_session(row) if row else None
+
+    def list(
+        self,
+        entity_type: str,
+        entity_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        A page of the sessions of an agent or a team, newest first.
+        Returns the sessions and the cursor of the next page, None on the last page.
+        """
+        entity_column = self._entity_column(entity_type)
+        query = select(
+            self.table.c.session_id, self.table.c.title, self.table.c.created_at
+        ).where(
+            entity_column == entity_id,
+            self.table.c.updated_at >= int(time.time()) - self.ttl_seconds,
+        )
+        if cursor:
+            created_at, session_id = self.decode_cursor(cursor)
+            query = query.where(
+                or_(
+                    self.table.c.created_at < created_at,
+                    and_(
+                        self.table.c.created_at == created_at,
+                        self.table.c.session_id < session_id,
+                    ),
+                )
+            )
+        query = query.order_by(
+            self.table.c.created_at.desc(), self.table.c.session_id.desc()
+        ).limit(limit + 1)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        sessions = [
+            {
+                "session_id": row.session_id,
+                "title": row.title,
+                "created_at": row.created_at,
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = (
+            self.encode_cursor(rows[limit - 1].created_at, rows[limit - 1].session_id)
+            if len(rows) > limit
+            else None
+        )
+        return sessions, next_cursor
+
+    def delete(self, session_id: str) -> bool:
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                delete(self.table).where(self.table.c.session_id == session_id)
+            )
+        return result.rowcount > 0
+
+
+session_store = SessionStore(
+    db_file=app_settings.SESSION_STORE_DB_FILE,
+    ttl_seconds=app_settings.SESSION_TTL_SECONDS,
+    prune_interval=app_settings.CACHE_PRUNE_INTERVAL,
+)
@@ -0,0 +1,236 @@
+import time
+from dataclasses import dataclass
+from typing import List, Set
+
+from sqlalchemy import (
+    Column,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    PrimaryKeyConstraint,
+    String,
+    Table,
+    and_,
+    delete,
+    func,
+    select,
+    update,
+)
+
+from src.config import app_settings
+from src.memory.blob_store import blob_store
+from src.memory.sqlite import create_sqlite_engine, create_tables
+from src.observability.metrics import workspace_evictions
+
+
+class WorkspaceQuotaError(Exception):
+    pass
+
+
+@dataclass
+class WorkspaceDocument:
+    session_id: str
+    file_id: str
+    name: str
+    mime_type: str
+    size_bytes: int
+    added_at: float = 0.0
+    used_at: float = 0.0
+
+
+class SessionWorkspace:
+    """
+    The documents of each playground session, so follow-up turns reuse them without re-uploading.
+    Documents are referenced by the digest of their contents in the blob store, whose parsed
+    representations (statistics, index chunks, prepared digest) are keyed on the same digest.
+    A session holds at most `max_session_documents` documents and `max_session_bytes` bytes, and
+    all sessions together `max_total_bytes`; the least recently used documents are evicted to stay
+    within these quotas, and documents unused for `ttl_seconds` expire.
+    """
+
+    def __init__(
+        self,
+        db_file: str,
+        max_session_documents: int,
+        max_session_bytes: int,
+        max_total_bytes: int,
+        ttl_seconds: int,
+    ):
+        self.max_session_documents = max_session_documents
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self.engine = create_sqlite_engine(db_file)
+        metadata = MetaData()
+        self.table = Table(
+            "session_documents",
+            metadata,
+            Column("session_id", String, nullable=False),
+            Column("file_id", String, nullable=False),
+            Column("name", String, nullable=False),
+            Column("mime_type", String, nullable=False),
+            Column("size_bytes", Integer, nullable=False),
+            Column("added_at", Float, nullable=False),
+            Column("used_at", Float, nullable=False, index=True),
+            PrimaryKeyConstraint("session_id", "file_id"),
+            Index("ix_session_documents_session", "session_id", "used_at"),
+        )
+        create_tables(metadata, self.engine)
+
+    def add(self, session_id: str, documents: List[WorkspaceDocument]) -> None:
+        """
+        Add documents to a session, or mark them used if they are already in it, then evict the
+        least recently used documents over the quotas.
+        Raises WorkspaceQuotaError if the documents alone exceed the session quota.
+        """
+        if not documents:
+            return
+        unique = {document.file_id: document for document in documents}
+        if len(unique) > self.max_session_documents:
+            raise WorkspaceQuotaError(
+                f"A session holds at most {self.max_session_documents} documents"
+            )
+        if (
+            sum(document.size_bytes for document in unique.values())
+            > self.max_session_bytes
+        ):
+            raise WorkspaceQuotaError(
+                f"Documents exceed the {self.max_session_bytes} bytes session quota"
+            )
+
+        now = time.time()
+        with self.engine.begin() as conn:
+            for document in unique.values():
+                updated = conn.execute(
+                    update(self.table)
+                    .where(
+                        self.table.c.session_id == session_id,
+                        self.table.c.file_id == document.file_id,
+                    )
+                    .values(name=document.name, used_at=now)
+                )
+                if updated.rowcount == 0:
+                    conn.execute(
+                        self.table.insert().values(
+                            session_id=session_id,
+                            file_id=document.file_id,
+                            name=document.name,
+                            mime_type=document.mime_type,
+                            size_bytes=document.size_bytes,
+                            added_at=now,
+                            used_at=now,
+                        )
+                    )
+
+            expired = conn.execute(
+                delete(self.table).where(self.table.c.used_at < now - self.ttl_seconds)
+            )
+            if expired.rowcount:
+                workspace_evictions.inc(expired.rowcount, reason="expired")
+            self._evict(
+                conn,
+                self.table.c.session_id == session_id,
+                self.max_session_documents,
+                self.max_session_bytes,
+                "session_quota",
+            )
+            self._evict(conn, None, None, self.max_total_bytes, "total_quota")
+
+    def _evict(self, conn, where, max_documents, max_bytes, reason: str) -> None:
+        """Delete the least recently used documents matching `where` until they fit the limits"""
+        count_query = select(
+            func.count(), func.coalesce(func.sum(self.table.c.size_bytes), 0)
+        )
+        if where is not None:
+            count_query = count_query.where(where)
+        count, total_bytes = conn.execute(count_query).one()
+        if (
+            max_documents is None or count <= max_documents
+        ) and total_bytes <= max_bytes:
+            return
+
+        oldest = select(
+            self.table.c.session_id, self.table.c.file_id, self.table.c.size_bytes
+        ).order_by(self.table.c.used_at, self.table.c.added_at)
+        if where is not None:
+            oldest = oldest.where(where)
+        for row in conn.execute(oldest).all():
+            if (
+                max_documents is None or count <= max_documents
+            ) and total_bytes <= max_bytes:
+                break
+            conn.execute(
+                delete(self.table).where(
+                    and_(
+                        self.table.c.session_id == row.session_id,
+                        self.table.c.file_id == row.file_id,
+                    )
+                )
+            )
+            count -= 1
+            total_bytes -= row.size_bytes
+            workspace_evictions.inc(reason=reason)
+
+    def list(self, session_id: str) -> List[WorkspaceDocument]:
+        """The documents of a session, in the order they were added"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(self.table)
+                .where(
+                    self.table.c.session_id == session_id,
+                    self.table.c.used_at >= time.time() - self.ttl_seconds,
+                )
+                .order_by(self.table.c.added_at, self.table.c.file_id)
+            ).all()
+        return [WorkspaceDocument(**row._mapping) for row in rows]
+
+    def use(self, session_id: str) -> List[WorkspaceDocument]:
+        """The documents of a session, marked as used now"""
+        documents = self.list(session_id)
+        if documents:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    update(self.table)
+                    .where(self.table.c.session_id == session_id)
+                    .values(used_at=time.time())
+                )
+        return documents
+
+    def remove(self, session_id: str, file_id: str) -> bool:
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                delete(self.table).where(
+                    self.table.c.session_id == session_id,
+                    self.table.c.file_id == file_id,
+                )
+            )
+        return result.rowcount > 0
+
+    def file_ids(self) -> Set[str]:
+        """The digests of the documents of every session that have not expired"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(self.table.c.file_id)
+                .where(self.table.c.used_at >= time.time() - self.ttl_seconds)
+                .distinct()
+            ).all()
+        return {row.file_id for row in rows}
+
+    def clear(self, session_id: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(
+                delete(self.table).where(self.table.c.session_id == session_id)
+            )
+
+
+session_workspace = SessionWorkspace(
+    db_file=app_settings.SESSION_STORE_DB_FILE,
+    max_session_documents=app_settings.SESSION_WORKSPACE_MAX_DOCUMENTS,
+    max_session_bytes=app_settings.SESSION_WORKSPACE_MAX_BYTES,
+    max_total_bytes=app_settings.SESSION_WORKSPACE_TOTAL_MAX_BYTES,
+    ttl_seconds=app_settings.SESSION_TTL_SECONDS,
+)
+# Blobs of workspace documents are kept by the blob store's sweep
+blob_store.add_reference_source(session_workspace.file_ids)
@@ -0,0 +1,70 @@
+import threading
+from pathlib import Path
+
+from sqlalchemy import MetaData, create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from src.config import app_settings
+
+
+def create_sqlite_engine(db_file: str) -> Engine:
+    """
+    Engine for a SQLite file shared by threads and worker processes.
+    Connections are pooled and use WAL journaling, so readers never block the writer, and wait up to
+    SQLITE_BUSY_TIMEOUT_MS for the write lock instead of failing with "database is locked".
+    """
+    Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(
+        f"sqlite:///{db_file}",
+        pool_size=app_settings.SQLITE_POOL_SIZE,
+        max_overflow=app_settings.SQLITE_POOL_SIZE,
+        pool_pre_ping=True,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": app_settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        },
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={app_settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+    return engine
+
+
+def create_tables(metadata: MetaData, engine: Engine, attempts: int = 3) -> None:
+    """Create the missing tables, tolerating worker processes that create them at the same time"""
+    for attempt in range(attempts):
+        try:
+            metadata.create_all(engine)
+            return
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+
+
+class PruneSchedule:
+    """
+    Counts the writes to a cache table, so its capacity is enforced every `interval` writes instead
+    of counting the whole table on each one. Between prunes a table may exceed its capacity by up
+    to `interval` entries.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = max(interval, 1)
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def due(self, writes: int = 1) -> bool:
+        """Record writes, returning whether the table should be pruned now"""
+        with self.lock:
+            self.pending += writes
+            if self.pending < self.interval:
+                return False
+            self.pending = 0
+            return True
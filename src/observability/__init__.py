@@ -0,0 +1,11 @@
+from src.observability.metrics import registry
+from src.observability.models import InstrumentedOpenAIChat
+from src.observability.tracing import instrumented_step, run_trace, span
+
+__all__ = [
+    "registry",
+    "InstrumentedOpenAIChat",
+    "instrumented_step",
+    "run_trace",
+    "span",
+]
@@ -0,0 +1,310 @@
+import bisect
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric(ABC):
+    """
+    A metric family with a fixed set of label names, rendered in the Prometheus text format.
+    The registry's constant labels are added to every sample.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.constant_labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        return _format_labels(
+            (*self.label_names, *self.constant_labels),
+            (*key, *self.constant_labels.values()),
+            extra,
+        )
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """The sample lines of every series of the family"""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{self._labels(key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{self._labels(key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: the count of each bucket (not cumulative), the +Inf overflow, the sum
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(
+                [*map(_format_value, self.buckets), "+Inf"], values[:-1]
+            ):
+                cumulative += bucket_count
+                labels = self._labels(key, f'le="{upper_bound}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = self._labels(key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    The metrics of this process, rendered together for the /metrics route.
+    Every worker process has its own registry: its samples carry a `worker` label with the
+    process id, so the series of the workers scraped behind one port are never mixed up.
+    """
+
+    def __init__(self, constant_labels: Dict[str, str]):
+        self.constant_labels = constant_labels
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        metric.constant_labels = self.constant_labels
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+registry = MetricsRegistry({"worker": str(os.getpid())})
+
+workflow_runs = registry.register(
+    Counter("workflow_runs_total", "Workflow runs by outcome", ["outcome"])
+)
+workflow_run_duration = registry.register(
+    Histogram(
+        "workflow_run_duration_seconds", "Wall time of workflow runs", ["outcome"]
+    )
+)
+workflow_time_to_first_token = registry.register(
+    Histogram(
+        "workflow_time_to_first_token_seconds",
+        "Time from the start of a run to its first streamed answer token",
+    )
+)
+coalesced_requests = registry.register(
+    Counter(
+        "coalesced_requests_total",
+        "Requests served by attaching to an identical run already in flight",
+    )
+)
+admission_active_runs = registry.register(
+    Gauge("admission_active_runs", "Workflow runs holding an admission slot")
+)
+admission_queue_depth = registry.register(
+    Gauge(
+        "admission_queue_depth",
+        "Requests waiting for an admission slot",
+        ["priority"],
+    )
+)
+admission_wait = registry.register(
+    Histogram(
+        "admission_wait_seconds",
+        "Time admitted requests waited for a slot",
+        ["priority"],
+    )
+)
+admission_rejections = registry.register(
+    Counter(
+        "admission_rejections_total",
+        "Requests rejected with a 429 because the wait queue was full",
+        ["reason"],
+    )
+)
+step_duration = registry.register(
+    Histogram(
+        "workflow_step_duration_seconds",
+        "Wall time of workflow steps",
+        ["step", "outcome"],
+    )
+)
+step_retries = registry.register(
+    Counter(
+        "workflow_step_retries_total",
+        "Workflow step attempts after the first",
+        ["step"],
+    )
+)
+model_request_duration = registry.register(
+    Histogram(
+        "llm_request_duration_seconds",
+        "Latency of model requests, up to the last streamed chunk",
+        ["model", "step"],
+    )
+)
+model_tokens = registry.register(
+    Counter("llm_tokens_total", "Model tokens by kind", ["model", "step", "kind"])
+)
+model_cost = registry.register(
+    Counter(
+        "llm_cost_usd_total", "Estimated model cost in US dollars", ["model", "step"]
+    )
+)
+model_errors = registry.register(
+    Counter("llm_request_errors_total", "Failed model requests", ["model", "step"])
+)
+model_routes = registry.register(
+    Counter(
+        "llm_routes_total",
+        "Model calls by task and the model the routing policy chose first",
+        ["task", "model"],
+    )
+)
+model_escalations = registry.register(
+    Counter(
+        "llm_escalations_total",
+        "Model calls retried on a larger model, by task and reason",
+        ["task", "reason"],
+    )
+)
+file_preparations = registry.register(
+    Counter(
+        "file_preparations_total",
+        "Background preparations of uploaded files by outcome",
+        ["outcome"],
+    )
+)
+file_preparation_duration = registry.register(
+    Histogram(
+        "file_preparation_duration_seconds",
+        "Wall time of background file preparations, including the wait for a slot",
+        ["outcome"],
+    )
+)
+comment_search_comments = registry.register(
+    Counter(
+        "comment_search_comments_total",
+        "Comments of searched comment files, by whether they were selected for extraction",
+        ["result"],
+    )
+)
+comment_dedup_comments = registry.register(
+    Counter(
+        "comment_dedup_comments_total",
+        "Comments of extracted comment files, sent as a near-duplicate cluster representative "
+        "or collapsed into one",
+        ["result"],
+    )
+)
+workspace_evictions = registry.register(
+    Counter(
+        "workspace_evictions_total",
+        "Session workspace documents evicted, by reason",
+        ["reason"],
+    )
+)
+cache_lookups = registry.register(
+    Counter(
+        "cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"]
+    )
+)
@@ -0,0 +1,111 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from agno.models.openai import OpenAIChat
+
+from src.observability.metrics import (
+    model_cost,
+    model_errors,
+    model_request_duration,
+    model_tokens,
+)
+from src.observability.tracing import current_step, span
+
+# USD per million tokens: (prompt, cached prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+
+def estimate_cost(
+    model_id: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int
+) -> float:
+    """Cost of a request in US dollars, 0 for models without a known price"""
+    prompt_price, cached_price, completion_price = MODEL_PRICES.get(model_id, (0, 0, 0))
+    return (
+        (prompt_tokens - cached_tokens) * prompt_price
+        + cached_tokens * cached_price
+        + completion_tokens * completion_price
+    ) / 1_000_000
+
+
+@dataclass
+class InstrumentedOpenAIChat(OpenAIChat):
+    """
+    OpenAIChat recording the latency, token usage and estimated cost of every request, as metrics
+    labelled with the running workflow step and as a span of the current run trace.
+    """
+
+    @contextmanager
+    def _instrumented_request(self, stream: bool) -> Iterator[Dict[str, Any]]:
+        step = current_step.get()
+        started = time.perf_counter()
+        with span(f"model:{self.id}", model=self.id, stream=stream) as attributes:
+            try:
+                yield attributes
+            except Exception:
+                model_errors.inc(model=self.id, step=step)
+                attributes["error"] = True
+                raise
+            finally:
+                model_request_duration.observe(
+                    time.perf_counter() - started, model=self.id, step=step
+                )
+
+    def _record_usage(self, usage: Optional[Any], attributes: Dict[str, Any]) -> None:
+        if usage is None:
+            return
+        step = current_step.get()
+        prompt_tokens = usage.prompt_tokens or 0
+        completion_tokens = usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        cost = estimate_cost(self.id, prompt_tokens, cached_tokens, completion_tokens)
+
+        model_tokens.inc(prompt_tokens, model=self.id, step=step, kind="prompt")
+        model_tokens.inc(cached_tokens, model=self.id, step=step, kind="cached_prompt")
+        model_tokens.inc(completion_tokens, model=self.id, step=step, kind="completion")
+        model_cost.inc(cost, model=self.id, step=step)
+        attributes.update(
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+            completion_tokens=completion_tokens,
+            cost_usd=round(cost, 6),
+        )
+
+    def invoke(self, *args, **kwargs):
+        with self._instrumented_request(stream=False) as attributes:
+            response = super().invoke(*args, **kwargs)
+            self._record_usage(response.usage, attributes)
+            return response
+
+    async def ainvoke(self, *args, **kwargs):
+        with self._instrumented_request(stream=False) as attributes:
+            response = await super().ainvoke(*args, **kwargs)
+            self._record_usage(response.usage, attributes)
+            return response
+
+    def invoke_stream(self, *args, **kwargs) -> Iterator[Any]:
+        started = time.perf_counter()
+        with self._instrumented_request(stream=True) as attributes:
+            for chunk in super().invoke_stream(*args, **kwargs):
+                if "time_to_first_chunk_ms" not in attributes:
+                    attributes["time_to_first_chunk_ms"] = round(
+                        (time.perf_counter() - started) * 1000, 3
+                    )
+                self._record_usage(chunk.usage, attributes)
+                yield chunk
+
+    async def ainvoke_stream(self, *args, **kwargs) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        with self._instrumented_request(stream=True) as attributes:
+            async for chunk in super().ainvoke_stream(*args, **kwargs):
+                if "time_to_first_chunk_ms" not in attributes:
+                    attributes["time_to_first_chunk_ms"] = round(
+                        (time.perf_counter() - started) * 1000, 3
+                    )
+                self._record_usage(chunk.usage, attributes)
+                yield chunk
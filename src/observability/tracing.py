@@ -0,0 +1,156 @@
+import functools
+import inspect
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from agno.utils.log import logger
+from agno.workflow.v2.step import Step, StepOutput
+
+from src.config import app_settings
+from src.observability.metrics import step_duration, step_retries
+
+
+@dataclass
+class Span:
+    name: str
+    start_ms: float
+    duration_ms: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RunTrace:
+    """The spans of one workflow run, logged as a single JSON line when the run ends"""
+
+    session_id: str
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    started_at: float = field(default_factory=time.time)
+    spans: List[Span] = field(default_factory=list)
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    step_attempts: Dict[str, int] = field(default_factory=dict)
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.elapsed_ms(), 3),
+            "attributes": self.attributes,
+            "spans": [asdict(span) for span in self.spans],
+        }
+
+
+current_trace: ContextVar[Optional[RunTrace]] = ContextVar(
+    "current_trace", default=None
+)
+current_step: ContextVar[str] = ContextVar("current_step", default="none")
+
+
+@contextmanager
+def run_trace(session_id: str) -> Iterator[RunTrace]:
+    """Collect the spans of a run in the current context and log them when it ends"""
+    trace = RunTrace(session_id=session_id)
+    previous_trace = current_trace.get()
+    current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        # Not reset with a token: a streamed run may be closed from another context
+        current_trace.set(previous_trace)
+        if app_settings.RUN_TRACES_ENABLED:
+            logger.info(f"Run trace {json.dumps(trace.to_dict(), default=str)}")
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block as a span of the current run, if there is one.
+    Yields the span attributes, so the block can add the ones it only knows at the end.
+    """
+    trace = current_trace.get()
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        if trace is not None:
+            trace.spans.append(
+                Span(
+                    name=name,
+                    start_ms=round((started - trace._started) * 1000, 3),
+                    duration_ms=round((time.perf_counter() - started) * 1000, 3),
+                    attributes=attributes,
+                )
+            )
+
+
+@contextmanager
+def _step_attempt(name: str) -> Iterator[Dict[str, Any]]:
+    trace = current_trace.get()
+    if trace is not None:
+        attempt = trace.step_attempts.get(name, 0) + 1
+        trace.step_attempts[name] = attempt
+        if attempt > 1:
+            step_retries.inc(step=name)
+    previous_step = current_step.get()
+    current_step.set(name)
+    started = time.perf_counter()
+    with span(f"step:{name}") as attributes:
+        attributes["outcome"] = "error"
+        try:
+            yield attributes
+        finally:
+            current_step.set(previous_step)
+            step_duration.observe(
+                time.perf_counter() - started, step=name, outcome=attributes["outcome"]
+            )
+
+
+def _outcome(output: Any) -> Optional[str]:
+    if isinstance(output, StepOutput):
+        return "success" if output.success else "failure"
+    return None
+
+
+def instrument_executor(name: str, executor: Callable) -> Callable:
+    """
+    Wrap a step executor to record its wall time, outcome and retries.
+    Model calls made while it runs are attributed to the step.
+    """
+    if inspect.isasyncgenfunction(executor):
+
+        @functools.wraps(executor)
+        async def instrumented_generator(*args, **kwargs):
+            with _step_attempt(name) as attributes:
+                outcome = None
+                async for output in executor(*args, **kwargs):
+                    outcome = _outcome(output) or outcome
+                    if outcome:
+                        attributes["outcome"] = outcome
+                    yield output
+                attributes["outcome"] = outcome or "success"
+
+        return instrumented_generator
+
+    @functools.wraps(executor)
+    async def instrumented(*args, **kwargs):
+        with _step_attempt(name) as attributes:
+            output = await executor(*args, **kwargs)
+            attributes["outcome"] = _outcome(output) or "success"
+            return output
+
+    return instrumented
+
+
+def instrumented_step(**kwargs: Any) -> Step:
+    """A workflow step whose executor is instrumented under the step name"""
+    kwargs["executor"] = instrument_executor(kwargs["name"], kwargs["executor"])
+    return Step(**kwargs)
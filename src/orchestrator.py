@@ -6,13 +6,20 @@ from src.workflow import (
     generate_report_step,
 )
 
-social_media_analysis_workflow = Workflow(
-    name="Social Media Analysis Workflow",
-    description="A workflow to analyze social media data and provide insights.",
-    storage=memory_db,
-    steps=[
-        check_query_subject_step,
-        gather_data_from_context_step,
-        generate_report_step,
-    ],
-)
+
+def create_social_media_analysis_workflow() -> Workflow:
+    """
+    Build a workflow instance for one run.
+    A Workflow keeps the session and run ids of its current run, so concurrent requests each need
+    their own instance; they share the steps and the storage.
+    """
+    return Workflow(
+        name="Social Media Analysis Workflow",
+        description="A workflow to analyze social media data and provide insights.",
+        storage=memory_db,
+        steps=[
+            check_query_subject_step,
+            gather_data_from_context_step,
+            generate_report_step,
+        ],
+    )
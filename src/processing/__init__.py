@@ -0,0 +1,25 @@
+from src.processing.comment_analytics import CommentCorpus, corpus_cache
+from src.processing.comment_dedup import CommentClusters, comment_clusters_cache
+from src.processing.comment_index import CommentIndex, comment_index_cache
+from src.processing.comment_parser import chunk_comments, iter_comments, render_comments
+from src.processing.pdf_parser import extract_pages, parse_pdf
+from src.processing.query_classifier import QueryClassifier, query_classifier
+from src.processing.tokens import count_tokens, truncate_to_tokens
+
+__all__ = [
+    "CommentCorpus",
+    "corpus_cache",
+    "CommentClusters",
+    "comment_clusters_cache",
+    "CommentIndex",
+    "comment_index_cache",
+    "chunk_comments",
+    "iter_comments",
+    "render_comments",
+    "extract_pages",
+    "parse_pdf",
+    "QueryClassifier",
+    "query_classifier",
+    "count_tokens",
+    "truncate_to_tokens",
+]
@@ -0,0 +1,352 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+import numpy as np
+from pydantic import BaseModel
+
+from src.processing.comment_parser import iter_comments
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset(
+    """a about after again all also am an and any are as at be because been being but by can
+    could did do does doing for from get got had has have how i i'm i've i'd i'll if in into is it
+    it's its just me more most my no not of off on once only or other our out over own same so
+    some such than that that's the their them then there these they this those through to too
+    under until up very was we were what when where which while who why will with would you
+    your you're yours don't can't didn't isn't wasn't one really still even much""".split()
+)
+
+TOPIC_LEXICON: Dict[str, List[str]] = {
+    "pricing": [
+        "price",
+        "prices",
+        "pricing",
+        "expensive",
+        "cheap",
+        "money",
+        "pay",
+        "paying",
+        "paid",
+        "charge",
+        "charging",
+        "cost",
+        "costs",
+        "fee",
+        "fees",
+        "worth",
+    ],
+    "cancellation": [
+        "cancel",
+        "canceling",
+        "cancelling",
+        "cancelled",
+        "canceled",
+        "unsubscribe",
+        "unsubscribed",
+        "subscription",
+        "subscriptions",
+    ],
+    "app_experience": [
+        "app",
+        "navigate",
+        "glitch",
+        "glitches",
+        "bug",
+        "bugs",
+        "buggy",
+        "crash",
+        "crashes",
+        "logged",
+        "login",
+        "buffering",
+        "loading",
+        "streaming",
+    ],
+    "customer_service": ["customer", "service", "support", "help"],
+    "content_quality": [
+        "acting",
+        "story",
+        "storyline",
+        "plot",
+        "cast",
+        "cinematography",
+        "soundtrack",
+        "character",
+        "characters",
+        "episode",
+        "episodes",
+        "season",
+        "writing",
+        "production",
+        "finale",
+        "ending",
+        "twist",
+        "costumes",
+        "storylines",
+    ],
+    "anticipation": [
+        "premiere",
+        "release",
+        "releases",
+        "upcoming",
+        "trailer",
+        "drop",
+        "coming",
+        "waiting",
+        "calendar",
+        "next",
+    ],
+    "spam": [
+        "click",
+        "link",
+        "dm",
+        "giveaway",
+        "earn",
+        "download",
+        "visit",
+        "unlimited",
+        "unlock",
+        "free",
+    ],
+}
+
+SENTIMENT_LEXICON: Dict[str, float] = {
+    **{
+        word: 1.0
+        for word in """love loved loving amazing great best beautiful beautifully epic incredible
+        awesome excited exciting favorite fire heartwarming perfect obsessed brilliant fun happy
+        good enjoy enjoyed wow impressive original masterpiece grateful pumped goosebumps
+        appreciate nails emotional notch""".split()
+    },
+    **{
+        word: -1.0
+        for word in """terrible awful boring waste disappointed disappointing letdown mess hate
+        worst bad annoying expensive frustrating disaster predictable overhyped underwhelming
+        cancel canceling cancelling unsubscribed glitches rushed tired shame downhill recycled
+        hard justify garbage poor slow existent""".split()
+    },
+}
+
+NEGATORS = frozenset(
+    "not no never don't didn't isn't wasn't doesn't won't nothing wouldn't".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower().replace("’", "'"))
+
+
+class TopicStatistics(BaseModel):
+    topic: str
+    comment_count: int
+    share: float
+    examples: List[str]
+
+
+class CommentStatistics(BaseModel):
+    filename: str
+    comment_count: int
+    sentiment_distribution: Dict[str, int]
+    topics: List[TopicStatistics]
+    top_keywords: List[Tuple[str, int]]
+
+    def to_prompt(self) -> str:
+        """Render the statistics as plain text for the report prompt"""
+        total = max(self.comment_count, 1)
+        lines = [f"{self.filename}: {self.comment_count} comments"]
+        lines.append(
+            "Sentiment: "
+            + ", ".join(
+                f"{label} {count} ({count / total:.1%})"
+                for label, count in self.sentiment_distribution.items()
+            )
+        )
+        lines.append("Topics (comments mentioning each topic):")
+        for topic in self.topics:
+            lines.append(
+                f"- {topic.topic}: {topic.comment_count} ({topic.share:.1%})"
+                + (
+                    "; e.g. " + " | ".join(f'"{example}"' for example in topic.examples)
+                    if topic.examples
+                    else ""
+                )
+            )
+        lines.append(
+            "Top keywords: "
+            + ", ".join(f"{keyword} ({count})" for keyword, count in self.top_keywords)
+        )
+        return "\n".join(lines)
+
+
+class CommentCorpus:
+    """
+    Columnar form of a comment file.
+    Every token of every comment is stored as a vocabulary id in one flat array, with `offsets`
+    marking where each comment starts, so aggregates are computed in vectorized passes.
+    """
+
+    def __init__(self, comments: List[str]):
+        self.comments = comments
+        self.vocabulary: Dict[str, int] = {}
+        token_ids = []
+        lengths = np.empty(len(comments), dtype=np.int64)
+        for index, comment in enumerate(comments):
+            tokens = tokenize(comment)
+            lengths[index] = len(tokens)
+            token_ids.extend(
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+                for token in tokens
+            )
+        self.token_ids = np.asarray(token_ids, dtype=np.int32)
+        self.offsets = np.zeros(len(comments) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.comment_index = np.repeat(
+            np.arange(len(comments), dtype=np.int32), lengths
+        )
+        self.words = np.array(list(self.vocabulary), dtype=object)
+
+    @classmethod
+    def from_stream(cls, stream: BinaryIO) -> "CommentCorpus":
+        return cls(list(iter_comments(stream)))
+
+    def __len__(self) -> int:
+        return len(self.comments)
+
+    def _term_ids(self, terms: List[str]) -> np.ndarray:
+        return np.array(
+            [self.vocabulary[term] for term in terms if term in self.vocabulary],
+            dtype=np.int32,
+        )
+
+    def polar_term_mask(self) -> np.ndarray:
+        """Whether each vocabulary id is a negator or a sentiment lexicon term"""
+        mask = np.zeros(len(self.vocabulary), dtype=bool)
+        mask[self._term_ids([*NEGATORS, *SENTIMENT_LEXICON])] = True
+        return mask
+
+    def term_hits(self, terms: List[str]) -> np.ndarray:
+        """Count, per comment, the tokens that belong to `terms`"""
+        mask = np.isin(self.token_ids, self._term_ids(terms))
+        return np.bincount(self.comment_index[mask], minlength=len(self))
+
+    def sentiment_scores(self) -> np.ndarray:
+        """Lexicon sentiment score per comment, flipping words that follow a negator"""
+        weights = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for word, weight in SENTIMENT_LEXICON.items():
+            if word in self.vocabulary:
+                weights[self.vocabulary[word]] = weight
+        token_weights = weights[self.token_ids]
+
+        negated = np.zeros(len(self.token_ids), dtype=bool)
+        negator_mask = np.isin(self.token_ids, self._term_ids(list(NEGATORS)))
+        same_comment = self.comment_index[1:] == self.comment_index[:-1]
+        negated[1:] = negator_mask[:-1] & same_comment
+        token_weights[negated] *= -1
+
+        return np.bincount(
+            self.comment_index, weights=token_weights, minlength=len(self)
+        )
+
+    def keyword_frequencies(self, top_n: int) -> List[Tuple[str, int]]:
+        counts = np.bincount(self.token_ids, minlength=len(self.vocabulary))
+        stopword_ids = self._term_ids(list(STOPWORDS))
+        counts[stopword_ids] = 0
+        top_ids = np.argsort(-counts, kind="stable")[:top_n]
+        return [(self.words[i], int(counts[i])) for i in top_ids if counts[i] > 0]
+
+    def statistics(
+        self, filename: str, top_n_keywords: int = 15, top_n_examples: int = 3
+    ) -> CommentStatistics:
+        total = max(len(self), 1)
+        scores = self.sentiment_scores()
+        sentiment_distribution = {
+            "positive": int(np.count_nonzero(scores > 0)),
+            "negative": int(np.count_nonzero(scores < 0)),
+            "neutral": int(np.count_nonzero(scores == 0)),
+        }
+
+        topics = []
+        for topic, terms in TOPIC_LEXICON.items():
+            hits = self.term_hits(terms)
+            comment_count = int(np.count_nonzero(hits))
+            ranked = np.argsort(-hits, kind="stable")[
+                : min(top_n_examples, comment_count)
+            ]
+            topics.append(
+                TopicStatistics(
+                    topic=topic,
+                    comment_count=comment_count,
+                    share=comment_count / total,
+                    examples=[self.comments[i] for i in ranked],
+                )
+            )
+        topics.sort(key=lambda topic: topic.comment_count, reverse=True)
+
+        return CommentStatistics(
+            filename=filename,
+            comment_count=len(self),
+            sentiment_distribution=sentiment_distribution,
+            topics=topics,
+            top_keywords=self.keyword_frequencies(top_n_keywords),
+        )
+
+
+T = TypeVar("T")
+
+
+class DigestCache(Generic[T]):
+    """
+    Thread-safe in-memory LRU of values built from a file, keyed by the file's digest.
+    Concurrent misses on the same digest build the value once, the other callers waiting for it.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.values: "OrderedDict[str, T]" = OrderedDict()
+        self.builds: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def build(self, digest: str, open_stream: Callable[[], BinaryIO]) -> T:
+        raise NotImplementedError
+
+    def cached(self, digest: str) -> Optional[T]:
+        with self.lock:
+            if digest not in self.values:
+                return None
+            self.values.move_to_end(digest)
+            return self.values[digest]
+
+    def get(self, digest: str, open_stream: Callable[[], BinaryIO]) -> T:
+        value = self.cached(digest)
+        if value is not None:
+            return value
+        with self.lock:
+            build_lock = self.builds.setdefault(digest, threading.Lock())
+        with build_lock:
+            value = self.cached(digest)
+            if value is not None:
+                return value
+            try:
+                value = self.build(digest, open_stream)
+                with self.lock:
+                    self.values[digest] = value
+                    while len(self.values) > self.max_entries:
+                        self.values.popitem(last=False)
+            finally:
+                with self.lock:
+                    self.builds.pop(digest, None)
+        return value
+
+
+class CorpusCache(DigestCache[CommentCorpus]):
+    """In-memory LRU of parsed corpora, keyed by file digest"""
+
+    def build(self, digest: str, open_stream: Callable[[], BinaryIO]) -> CommentCorpus:
+        with open_stream() as stream:
+            return CommentCorpus.from_stream(stream)
+
+
+corpus_cache = CorpusCache(max_entries=32)
@@ -0,0 +1,344 @@
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.processing.comment_analytics import CommentCorpus, DigestCache, corpus_cache
+from src.processing.comment_parser import render_comment
+
+# Marks the start of a comment in bigram shingles, and salts bigrams apart from unigrams
+BOUNDARY = np.uint64(0)
+BIGRAM_SALT = np.uint64(0x9E3779B97F4A7C15)
+POLAR_SALT = np.uint64(0xD6E8FEB86659FD93)
+
+
+def mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads 64-bit keys over all bits"""
+    values = values ^ (values >> np.uint64(30))
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+def distinct_sorted(values: np.ndarray) -> np.ndarray:
+    """The distinct values of an integer array, sorted, without the hash table of np.unique"""
+    values = np.sort(values)
+    distinct = np.ones(len(values), dtype=bool)
+    distinct[1:] = values[1:] != values[:-1]
+    return values[distinct]
+
+
+def token_positions(
+    offsets: np.ndarray, comment_ids: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The positions in the token array of the tokens of the given comments, concatenated, with the
+    length and the start of each comment in them
+    """
+    lengths = offsets[comment_ids + 1] - offsets[comment_ids]
+    starts = np.zeros(len(comment_ids), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    positions = np.repeat(offsets[comment_ids] - starts, lengths) + np.arange(
+        int(lengths.sum())
+    )
+    return positions, lengths, starts
+
+
+def comment_shingles(
+    token_ids: np.ndarray, offsets: np.ndarray, comment_ids: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Hashes of the unigram and bigram shingles ending at each token of the given non-empty
+    comments, concatenated, with the start of each comment in them and the position of each
+    token in `token_ids`.
+    """
+    positions, _, starts = token_positions(offsets, comment_ids)
+    tokens = token_ids[positions].astype(np.uint64) + np.uint64(1)
+    previous = np.empty_like(tokens)
+    previous[1:] = tokens[:-1]
+    previous[starts] = BOUNDARY
+    unigrams = mix(tokens)
+    bigrams = mix(((previous << np.uint64(32)) | tokens) ^ BIGRAM_SALT)
+    return unigrams, bigrams, starts, positions
+
+
+def polar_fingerprints(
+    token_ids: np.ndarray,
+    protected: np.ndarray,
+    starts: np.ndarray,
+    positions: np.ndarray,
+) -> np.ndarray:
+    """
+    Order-insensitive fingerprint of the protected tokens of each comment, each marked by whether
+    it follows another protected token, as a negated sentiment term does. Comments whose
+    negations or sentiment terms differ never share it.
+    """
+    tokens = token_ids[positions].astype(np.uint64) + np.uint64(1)
+    polar = protected[token_ids[positions]]
+    after_polar = np.zeros_like(polar)
+    after_polar[1:] = polar[:-1]
+    after_polar[starts] = False
+    marked = np.where(after_polar, tokens ^ POLAR_SALT, tokens)
+    return np.add.reduceat(np.where(polar, mix(marked), np.uint64(0)), starts)
+
+
+def word_jaccard(
+    token_ids: np.ndarray, offsets: np.ndarray, firsts: np.ndarray, seconds: np.ndarray
+) -> np.ndarray:
+    """
+    Exact Jaccard similarity of the word sets of each pair of non-empty comments. Words are
+    compared rather than bigrams, which one dropped or added word changes up to three of.
+    """
+    pair_count = len(firsts)
+    comment_ids = np.concatenate([firsts, seconds])
+    positions, lengths, _ = token_positions(offsets, comment_ids)
+    owners = np.repeat(np.arange(len(comment_ids), dtype=np.uint64), lengths)
+    # Distinct words of each comment, then the ones both comments of a pair hold, as
+    # (comment << 32 | word) keys
+    words = distinct_sorted(
+        (owners << np.uint64(32)) | token_ids[positions].astype(np.uint64)
+    )
+    owners = words >> np.uint64(32)
+    sizes = np.bincount(owners.astype(np.int64), minlength=len(comment_ids))
+    keys = np.sort(
+        ((owners % np.uint64(pair_count)) << np.uint64(32))
+        | (words & np.uint64(0xFFFFFFFF))
+    )
+    shared = keys[1:][keys[1:] == keys[:-1]] >> np.uint64(32)
+    intersections = np.bincount(shared.astype(np.int64), minlength=pair_count)
+    return intersections / (sizes[:pair_count] + sizes[pair_count:] - intersections)
+
+
+def batches(comment_ids: np.ndarray, batch_size: int) -> Iterator[np.ndarray]:
+    for start in range(0, len(comment_ids), batch_size):
+        yield comment_ids[start : start + batch_size]
+
+
+def connected_components(
+    size: int, sources: np.ndarray, targets: np.ndarray
+) -> np.ndarray:
+    """Label of each node, the smallest node of its component, by hooking and pointer jumping"""
+    labels = np.arange(size)
+    while True:
+        source_roots, target_roots = labels[sources], labels[targets]
+        linked = source_roots != target_roots
+        if not linked.any():
+            return labels
+        # Roots only ever point to smaller roots, so the forest stays acyclic
+        np.minimum.at(
+            labels,
+            np.maximum(source_roots, target_roots)[linked],
+            np.minimum(source_roots, target_roots)[linked],
+        )
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def near_duplicate_clusters(
+    token_ids: np.ndarray,
+    offsets: np.ndarray,
+    protected: Optional[np.ndarray] = None,
+    bands: int = 10,
+    band_rows: int = 3,
+    threshold: float = 0.8,
+    candidate_threshold: float = 0.6,
+    seed: int = 0,
+    batch_size: int = 1 << 17,
+) -> np.ndarray:
+    """
+    The representative comment of each comment of a tokenized corpus, grouping near-duplicates.
+    Exact duplicates are grouped first by a fingerprint of their shingles, so MinHash signatures of
+    `bands * band_rows` hashes are computed once per distinct comment. Comments sharing the
+    signature rows of any band are candidates. Candidates whose signatures agree on at least
+    `candidate_threshold` of the hashes are verified on the exact Jaccard similarity of their
+    words, kept from `threshold`, and clustered transitively. `protected` marks the token ids
+    that change a comment's meaning, negations and sentiment terms: comments only match when they
+    hold the same protected tokens, negated the same way. Each cluster is represented by its most
+    repeated variant, the earliest on ties. Every pass is linear in the tokens, batch by batch,
+    except for the sorts of the band keys and of the verified shingles.
+    """
+    comment_count = len(offsets) - 1
+    representatives = np.arange(comment_count)
+    lengths = np.diff(offsets)
+    non_empty = np.flatnonzero(lengths)
+    if not len(non_empty):
+        return representatives
+
+    fingerprints = np.empty(len(non_empty), dtype=np.uint64)
+    polarities = np.zeros(len(non_empty), dtype=np.uint64)
+    position = 0
+    for comment_ids in batches(non_empty, batch_size):
+        _, bigrams, starts, positions = comment_shingles(
+            token_ids, offsets, comment_ids
+        )
+        batch = slice(position, position + len(comment_ids))
+        fingerprints[batch] = np.add.reduceat(mix(bigrams), starts) ^ lengths[
+            comment_ids
+        ].astype(np.uint64)
+        if protected is not None:
+            polarities[batch] = polar_fingerprints(
+                token_ids, protected, starts, positions
+            )
+        position += len(comment_ids)
+    _, first_index, inverse, exact_counts = np.unique(
+        fingerprints, return_index=True, return_inverse=True, return_counts=True
+    )
+    del fingerprints
+    # Distinct comments in file order, so batches read the token array forwards
+    order = np.argsort(first_index, kind="stable")
+    distinct = non_empty[first_index[order]]
+    polarities = polarities[first_index[order]]
+    exact_counts = exact_counts[order]
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    inverse = rank[inverse]
+
+    rng = np.random.default_rng(seed)
+    hash_count = bands * band_rows
+    multipliers = rng.integers(1, 2**63, size=hash_count, dtype=np.uint64)
+    multipliers |= np.uint64(1)
+    increments = rng.integers(0, 2**63, size=hash_count, dtype=np.uint64)
+    signatures = np.empty((len(distinct), hash_count), dtype=np.uint32)
+    position = 0
+    for comment_ids in batches(distinct, batch_size):
+        unigrams, bigrams, starts, _ = comment_shingles(token_ids, offsets, comment_ids)
+        for column in range(hash_count):
+            signatures[position : position + len(comment_ids), column] = np.minimum(
+                np.minimum.reduceat(
+                    (unigrams * multipliers[column] + increments[column])
+                    >> np.uint64(32),
+                    starts,
+                ),
+                np.minimum.reduceat(
+                    (bigrams * multipliers[column] + increments[column])
+                    >> np.uint64(32),
+                    starts,
+                ),
+            )
+        position += len(comment_ids)
+
+    sources, targets = [], []
+    indices = np.arange(len(distinct))
+    for band in range(bands):
+        # Comments of different polarities never share a band key
+        keys = polarities.copy()
+        for column in range(band * band_rows, (band + 1) * band_rows):
+            keys = mix(keys ^ signatures[:, column].astype(np.uint64))
+        ranked = np.argsort(keys, kind="stable")
+        sorted_keys = keys[ranked]
+        group_start = np.ones(len(ranked), dtype=bool)
+        group_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        heads = ranked[np.maximum.accumulate(np.where(group_start, indices, 0))]
+        members, heads = ranked[~group_start], heads[~group_start]
+        for start in range(0, len(members), batch_size):
+            batch_members = members[start : start + batch_size]
+            batch_heads = heads[start : start + batch_size]
+            agreement = (signatures[batch_members] == signatures[batch_heads]).mean(
+                axis=1
+            )
+            similar = agreement >= candidate_threshold
+            sources.append(batch_members[similar])
+            targets.append(batch_heads[similar])
+    del signatures
+
+    # Pairs colliding in several bands are verified once
+    pairs = distinct_sorted(
+        np.concatenate(sources) * len(distinct) + np.concatenate(targets)
+        if sources
+        else indices[:0]
+    )
+    sources, targets = pairs // len(distinct), pairs % len(distinct)
+    similar = np.zeros(len(pairs), dtype=bool)
+    for start in range(0, len(pairs), batch_size):
+        batch = slice(start, start + batch_size)
+        similar[batch] = (
+            word_jaccard(
+                token_ids, offsets, distinct[sources[batch]], distinct[targets[batch]]
+            )
+            >= threshold
+        )
+
+    labels = connected_components(len(distinct), sources[similar], targets[similar])
+    # The most repeated variant of each cluster, the earliest on ties
+    ranked = np.lexsort((indices, -exact_counts, labels))
+    first_of_label = np.ones(len(ranked), dtype=bool)
+    first_of_label[1:] = labels[ranked][1:] != labels[ranked][:-1]
+    cluster_representative = np.empty(len(distinct), dtype=np.int64)
+    cluster_representative[labels[ranked][first_of_label]] = distinct[
+        ranked[first_of_label]
+    ]
+    representatives[non_empty] = cluster_representative[labels[inverse]]
+    return representatives
+
+
+class CommentClusters:
+    """
+    Near-duplicate clusters of the comments of a corpus: reposts, copy-pasted spam and small
+    variants of the same comment are represented once, with the number of comments they stand for.
+    Variants that differ in their negations or sentiment terms are kept apart.
+    """
+
+    def __init__(self, corpus: CommentCorpus, **options):
+        self.comments = corpus.comments
+        self.representative_of = near_duplicate_clusters(
+            corpus.token_ids, corpus.offsets, corpus.polar_term_mask(), **options
+        )
+        self.sizes = np.bincount(self.representative_of, minlength=len(corpus))
+        self.representatives = np.flatnonzero(self.sizes)
+
+    def __len__(self) -> int:
+        return len(self.representatives)
+
+    def lines(self) -> Iterator[str]:
+        """One rendered line per cluster, in file order, with its multiplicity"""
+        for comment_id in self.representatives:
+            yield render_comment(self.comments[comment_id], int(self.sizes[comment_id]))
+
+    def collapse(self, comment_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """The representatives of the given comments, in their order without repeats, with sizes"""
+        representatives = self.representative_of[comment_ids]
+        _, first_index = np.unique(representatives, return_index=True)
+        representatives = representatives[np.sort(first_index)]
+        return representatives, self.sizes[representatives]
+
+    def most_repeated(self, top_n: int) -> List[Tuple[str, int]]:
+        """The comments repeated most often, counting their near-duplicates"""
+        repeated = self.representatives[self.sizes[self.representatives] > 1]
+        top = repeated[np.argsort(-self.sizes[repeated], kind="stable")[:top_n]]
+        return [(self.comments[i], int(self.sizes[i])) for i in top]
+
+    def sample(self, max_comments: int) -> List[Tuple[str, int]]:
+        """
+        At most `max_comments` clusters standing for the whole corpus: the most repeated comments
+        first, then comments evenly spread over the rest of the file, with their sizes
+        """
+        repeated = self.representatives[self.sizes[self.representatives] > 1]
+        top = repeated[np.argsort(-self.sizes[repeated], kind="stable")[:max_comments]]
+        unsampled = np.ones(len(self.sizes), dtype=bool)
+        unsampled[top] = False
+        others = self.representatives[unsampled[self.representatives]]
+        slots = max_comments - len(top)
+        if len(others) > slots:
+            others = others[
+                np.linspace(0, len(others), slots, endpoint=False).astype(np.int64)
+            ]
+        return [
+            (self.comments[i], int(self.sizes[i]))
+            for i in np.concatenate([top, others])
+        ]
+
+
+class CommentClustersCache(DigestCache[CommentClusters]):
+    """In-memory LRU of comment clusters, keyed by the digest of the file they were built from"""
+
+    def build(
+        self, digest: str, open_stream: Callable[[], BinaryIO]
+    ) -> CommentClusters:
+        return CommentClusters(corpus_cache.get(digest, open_stream))
+
+
+comment_clusters_cache = CommentClustersCache(max_entries=32)
@@ -0,0 +1,117 @@
+import math
+from typing import BinaryIO, Callable, Dict, List, Set, Tuple
+
+import numpy as np
+
+from src.processing.comment_analytics import (
+    STOPWORDS,
+    TOPIC_LEXICON,
+    CommentCorpus,
+    DigestCache,
+    corpus_cache,
+    tokenize,
+)
+
+# Query terms naming or belonging to a topic also search for the topic's other terms
+TOPIC_EXPANSIONS: Dict[str, Set[str]] = {}
+for topic, terms in TOPIC_LEXICON.items():
+    for term in [*tokenize(topic), *terms]:
+        TOPIC_EXPANSIONS.setdefault(term, set()).update(terms)
+
+
+def query_terms(text: str) -> List[str]:
+    """The distinct search terms of a query, without stopwords, expanded with their topic terms"""
+    terms = {}
+    for token in tokenize(text):
+        if token in STOPWORDS:
+            continue
+        terms.setdefault(token, None)
+        for term in sorted(TOPIC_EXPANSIONS.get(token, ())):
+            terms.setdefault(term, None)
+    return list(terms)
+
+
+class CommentIndex:
+    """
+    BM25 inverted index over the comments of a corpus.
+    Posting lists are stored compactly in CSR form: the comment ids and term frequencies of each
+    term are one contiguous slice of two flat arrays, delimited by `postings_offsets`, so a query
+    only reads the postings of its own terms.
+    """
+
+    def __init__(self, corpus: CommentCorpus, k1: float = 1.2, b: float = 0.75):
+        self.comments = corpus.comments
+        self.vocabulary = corpus.vocabulary
+        self.comment_count = len(corpus)
+        self.k1 = k1
+
+        lengths = np.diff(corpus.offsets).astype(np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+        self.length_norms = k1 * (1 - b + b * lengths / max(average_length, 1.0))
+
+        # One key per token, ordered by term then comment; repeated keys are term frequencies
+        keys = corpus.token_ids.astype(np.int64) * max(self.comment_count, 1)
+        keys += corpus.comment_index
+        keys, frequencies = np.unique(keys, return_counts=True)
+        term_ids = keys // max(self.comment_count, 1)
+        self.comment_ids = (keys - term_ids * max(self.comment_count, 1)).astype(
+            np.int32
+        )
+        self.frequencies = np.minimum(frequencies, np.iinfo(np.uint16).max).astype(
+            np.uint16
+        )
+        self.postings_offsets = np.searchsorted(
+            term_ids, np.arange(len(self.vocabulary) + 1)
+        )
+
+    def __len__(self) -> int:
+        return self.comment_count
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.comment_ids.nbytes
+            + self.frequencies.nbytes
+            + self.postings_offsets.nbytes
+            + self.length_norms.nbytes
+        )
+
+    def search(self, text: str, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The ids and BM25 scores of the `limit` comments best matching the text, best first"""
+        scores = np.zeros(self.comment_count, dtype=np.float32)
+        for term in query_terms(text):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.postings_offsets[term_id : term_id + 2]
+            comment_ids = self.comment_ids[start:end]
+            frequencies = self.frequencies[start:end].astype(np.float32)
+            document_frequency = end - start
+            idf = math.log(
+                1
+                + (self.comment_count - document_frequency + 0.5)
+                / (document_frequency + 0.5)
+            )
+            # Comment ids are unique within a posting list, so the fancy-indexed add is exact
+            scores[comment_ids] += (
+                idf
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + self.length_norms[comment_ids])
+            )
+
+        matches = np.flatnonzero(scores)
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        ranked = matches[np.argsort(-scores[matches], kind="stable")]
+        return ranked, scores[ranked]
+
+
+class CommentIndexCache(DigestCache[CommentIndex]):
+    """In-memory LRU of comment indexes, keyed by the digest of the file they were built from"""
+
+    def build(self, digest: str, open_stream: Callable[[], BinaryIO]) -> CommentIndex:
+        return CommentIndex(corpus_cache.get(digest, open_stream))
+
+
+comment_index_cache = CommentIndexCache(max_entries=32)
@@ -0,0 +1,103 @@
+import codecs
+import json
+from itertools import batched
+from typing import BinaryIO, Iterable, Iterator, List
+
+from src.processing.tokens import count_tokens_many
+
+# Comments counted per tokenizer batch while chunking
+COUNT_BATCH_SIZE = 1024
+
+SEPARATORS = ",\r\n\t "
+
+
+def next_separator(buffer: str, position: int) -> int:
+    """Find the comma or new line ending an unquoted comment, -1 if there is none yet"""
+    ends = [
+        end
+        for end in (buffer.find(",", position), buffer.find("\n", position))
+        if end != -1
+    ]
+    return min(ends) if ends else -1
+
+
+def iter_comments(stream: BinaryIO, block_size: int = 1 << 16) -> Iterator[str]:
+    """
+    Stream the comments of a comment dump, one at a time.
+    Comments are double quoted and separated by commas or new lines, with `""` escaping a quote.
+    Unquoted comments run until the next comma or new line. Only one block of the stream is held in memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    eof = False
+    while not eof:
+        block = stream.read(block_size)
+        eof = not block
+        buffer += decoder.decode(block, final=eof)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in SEPARATORS:
+                position += 1
+            if position >= len(buffer):
+                break
+
+            if buffer[position] == '"':
+                end = position + 1
+                while True:
+                    end = buffer.find('"', end)
+                    if end == -1 or (end + 1 == len(buffer) and not eof):
+                        end = -1
+                        break
+                    if end + 1 < len(buffer) and buffer[end + 1] == '"':
+                        end += 2
+                        continue
+                    break
+                if end == -1:
+                    if eof:
+                        comment = buffer[position + 1 :].replace('""', '"').strip()
+                        if comment:
+                            yield comment
+                        position = len(buffer)
+                    break
+                comment = buffer[position + 1 : end].replace('""', '"').strip()
+                position = end + 1
+            else:
+                end = next_separator(buffer, position)
+                if end == -1:
+                    if not eof:
+                        break
+                    end = len(buffer)
+                comment = buffer[position:end].strip()
+                position = end + 1
+
+            if comment:
+                yield comment
+        buffer = buffer[position:]
+
+
+def chunk_comments(comments: Iterable[str], max_tokens: int) -> Iterator[List[str]]:
+    """Group comments into consecutive chunks of at most `max_tokens` tokens"""
+    chunk = []
+    chunk_tokens = 0
+    for batch in batched(comments, COUNT_BATCH_SIZE):
+        for comment, tokens in zip(batch, count_tokens_many(batch)):
+            comment_tokens = tokens + 1
+            if chunk and chunk_tokens + comment_tokens > max_tokens:
+                yield chunk
+                chunk = []
+                chunk_tokens = 0
+            chunk.append(comment)
+            chunk_tokens += comment_tokens
+    if chunk:
+        yield chunk
+
+
+def render_comment(comment: str, count: int = 1) -> str:
+    """Render a comment quoted, followed by how many times it occurs when more than once"""
+    rendered = json.dumps(comment, ensure_ascii=False)
+    return f"{rendered} (x{count})" if count > 1 else rendered
+
+
+def render_comments(comments: List[str]) -> str:
+    """Render comments one per line, quoted, to be used as prompt content"""
+    return "\n".join(render_comment(comment) for comment in comments)
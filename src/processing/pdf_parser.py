@@ -0,0 +1,52 @@
+from io import BytesIO
+from typing import BinaryIO, List
+
+from pydantic import BaseModel
+from pypdf import PdfReader, PdfWriter
+
+
+class PdfPage(BaseModel):
+    page_number: int
+    text: str
+
+
+class ParsedPdf(BaseModel):
+    text_pages: List[PdfPage]
+    image_page_numbers: List[int]
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(
+            f"[page {page.page_number + 1}]\n{page.text}" for page in self.text_pages
+        )
+
+
+def parse_pdf(stream: BinaryIO, min_text_chars: int) -> ParsedPdf:
+    """
+    Read the text layer of every page of a PDF.
+    Pages with at least `min_text_chars` characters of text are kept as text, using the
+    layout extraction mode so table columns and series values stay aligned. The remaining
+    pages are image-only and need OCR.
+    """
+    reader = PdfReader(stream)
+    text_pages = []
+    image_page_numbers = []
+    for page_number, page in enumerate(reader.pages):
+        text = page.extract_text(extraction_mode="layout") or ""
+        text = "\n".join(line.rstrip() for line in text.splitlines() if line.strip())
+        if len(text) >= min_text_chars:
+            text_pages.append(PdfPage(page_number=page_number, text=text))
+        else:
+            image_page_numbers.append(page_number)
+    return ParsedPdf(text_pages=text_pages, image_page_numbers=image_page_numbers)
+
+
+def extract_pages(stream: BinaryIO, page_numbers: List[int]) -> bytes:
+    """Build a new PDF holding only the given pages"""
+    reader = PdfReader(stream)
+    writer = PdfWriter()
+    for page_number in page_numbers:
+        writer.add_page(reader.pages[page_number])
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
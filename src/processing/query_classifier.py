@@ -0,0 +1,135 @@
+import json
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from src.config import app_settings
+from src.processing.comment_analytics import tokenize
+
+ANALYTICAL = "analytical"
+OTHER = "other"
+
+
+class QueryClassifier:
+    """
+    Local first stage of the query subject check.
+    A logistic regression over hashed word and character n-grams gives the probability that a query
+    is analytical. Only predictions at or above `threshold` confidence are returned, everything else
+    is left to the data analyst agent.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        n_features: int = 1 << 14,
+        l2: float = 1e-4,
+        epochs: int = 500,
+        learning_rate: float = 5.0,
+    ):
+        self.threshold = threshold
+        self.n_features = n_features
+        self.l2 = l2
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.weights = np.zeros(n_features, dtype=np.float64)
+        self.bias = 0.0
+
+    def feature_ids(self, query: str) -> np.ndarray:
+        """Hashed ids of the word unigrams, bigrams and character trigrams of a query"""
+        tokens = tokenize(query)
+        grams = [f"w:{token}" for token in tokens]
+        grams += [f"b:{first} {second}" for first, second in zip(tokens, tokens[1:])]
+        for token in tokens:
+            padded = f"<{token}>"
+            grams += [f"c:{padded[i : i + 3]}" for i in range(len(padded) - 2)]
+        if not grams:
+            grams = ["<empty>"]
+        return np.unique(
+            [zlib.crc32(gram.encode("utf-8")) % self.n_features for gram in grams]
+        )
+
+    def fit(self, queries: List[str], labels: List[str]) -> "QueryClassifier":
+        """Full-batch gradient descent over the sparse feature matrix, stored as coordinates"""
+        rows, columns, values = [], [], []
+        for row, query in enumerate(queries):
+            ids = self.feature_ids(query)
+            rows.append(np.full(len(ids), row))
+            columns.append(ids)
+            values.append(np.full(len(ids), 1.0 / np.sqrt(len(ids))))
+        rows, columns, values = map(np.concatenate, (rows, columns, values))
+        targets = np.array([label == ANALYTICAL for label in labels], dtype=np.float64)
+
+        self.weights = np.zeros(self.n_features, dtype=np.float64)
+        self.bias = 0.0
+        for _ in range(self.epochs):
+            scores = np.bincount(
+                rows, weights=self.weights[columns] * values, minlength=len(queries)
+            )
+            residuals = 1.0 / (1.0 + np.exp(-(scores + self.bias))) - targets
+            gradient = np.bincount(
+                columns, weights=residuals[rows] * values, minlength=self.n_features
+            )
+            self.weights -= self.learning_rate * (
+                gradient / len(queries) + self.l2 * self.weights
+            )
+            self.bias -= self.learning_rate * residuals.mean()
+        return self
+
+    @classmethod
+    def from_jsonl(cls, path: str, threshold: float) -> "QueryClassifier":
+        """Train a classifier on a file of {"query": ..., "label": ...} lines"""
+        with open(path, encoding="utf-8") as stream:
+            rows = [json.loads(line) for line in stream if line.strip()]
+        return cls(threshold).fit(
+            [row["query"] for row in rows], [row["label"] for row in rows]
+        )
+
+    def predict_proba(self, query: str) -> float:
+        """Probability that the query is analytical"""
+        ids = self.feature_ids(query)
+        score = self.weights[ids].sum() / np.sqrt(len(ids)) + self.bias
+        return float(1.0 / (1.0 + np.exp(-score)))
+
+    def classify(self, query: str) -> Optional[str]:
+        """The query type when the classifier is confident about it, None otherwise"""
+        probability = self.predict_proba(query)
+        if probability >= self.threshold:
+            return ANALYTICAL
+        if 1.0 - probability >= self.threshold:
+            return OTHER
+        return None
+
+
+class LazyQueryClassifier:
+    """Trains the classifier on first use, so a missing training file only disables the fast path"""
+
+    def __init__(self, path: str, threshold: float):
+        self.path = path
+        self.threshold = threshold
+        self._classifier: Optional[QueryClassifier] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[QueryClassifier]:
+        """Train the classifier once; None when the training file is missing"""
+        if self._classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    if not Path(self.path).exists():
+                        return None
+                    self._classifier = QueryClassifier.from_jsonl(
+                        self.path, self.threshold
+                    )
+        return self._classifier
+
+    def classify(self, query: str) -> Optional[str]:
+        classifier = self.load()
+        return classifier.classify(query) if classifier else None
+
+
+query_classifier = LazyQueryClassifier(
+    path=app_settings.QUERY_CLASSIFIER_TRAINING_FILE,
+    threshold=app_settings.QUERY_CLASSIFIER_THRESHOLD,
+)
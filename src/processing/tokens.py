@@ -0,0 +1,123 @@
+import threading
+from typing import List, Optional, Sequence
+
+from agno.utils.log import logger
+from tokenizers import Tokenizer
+
+from src.config import app_settings
+
+# Characters per token of the estimate used until the tokenizer is loaded
+CHARS_PER_TOKEN = 4
+PARAGRAPH_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text without calling a tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class TokenCounter:
+    """
+    Token counts of the models' tokenizer, `tokenizer_id` on the Hugging Face hub.
+    `load` downloads it on first use and may block for a while, or fail offline, so the server
+    loads it in the background; until then, counts are estimated from the text length.
+    """
+
+    def __init__(self, tokenizer_id: str):
+        self.tokenizer_id = tokenizer_id
+        self.tokenizer: Optional[Tokenizer] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Load the tokenizer, returning whether counts are now exact"""
+        with self._lock:
+            if self.tokenizer is None and self.tokenizer_id:
+                try:
+                    self.tokenizer = Tokenizer.from_pretrained(self.tokenizer_id)
+                except Exception as e:
+                    logger.warning(
+                        f"Tokenizer {self.tokenizer_id} unavailable, estimating token counts: {e}"
+                    )
+        return self.tokenizer is not None
+
+    def count(self, text: str) -> int:
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return estimate_tokens(text)
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        """Token counts of several texts, encoded in one parallel batch"""
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return [estimate_tokens(text) for text in texts]
+        return [
+            len(encoding)
+            for encoding in tokenizer.encode_batch(
+                list(texts), add_special_tokens=False
+            )
+        ]
+
+    def cut(self, text: str, max_tokens: int) -> str:
+        """The first `max_tokens` tokens of a text"""
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return text[: max_tokens * CHARS_PER_TOKEN]
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= max_tokens:
+            return text
+        return text[: offsets[max_tokens - 1][1]]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cut a text to at most `max_tokens` tokens on passage boundaries: the paragraphs that fit
+        are kept whole, then the lines of the next one that fit. Only a first line longer than the
+        budget is cut between tokens.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        paragraphs = text.split(PARAGRAPH_SEPARATOR)
+        separator_tokens = self.count(PARAGRAPH_SEPARATOR)
+        kept: List[str] = []
+        remaining = max_tokens
+        for paragraph, tokens in zip(paragraphs, self.count_many(paragraphs)):
+            cost = tokens + (separator_tokens if kept else 0)
+            if cost <= remaining:
+                kept.append(paragraph)
+                remaining -= cost
+                continue
+            if kept:
+                remaining -= separator_tokens
+            lines = paragraph.split("\n")
+            kept_lines = []
+            for line, tokens in zip(lines, self.count_many(lines)):
+                cost = tokens + (1 if kept_lines else 0)
+                if cost > remaining:
+                    break
+                kept_lines.append(line)
+                remaining -= cost
+            if kept_lines:
+                kept.append("\n".join(kept_lines))
+            break
+        if not kept:
+            return self.cut(text, max_tokens)
+        return PARAGRAPH_SEPARATOR.join(kept).rstrip()
+
+
+token_counter = TokenCounter(app_settings.TOKENIZER_ID)
+
+
+def count_tokens(text: str) -> int:
+    """Token count of a text, estimated until the tokenizer is loaded"""
+    return token_counter.count(text)
+
+
+def count_tokens_many(texts: Sequence[str]) -> List[int]:
+    return token_counter.count_many(texts)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text to at most `max_tokens` tokens, keeping whole paragraphs and lines"""
+    return token_counter.truncate(text, max_tokens)
@@ -1,9 +1,107 @@
-from fastapi import FastAPI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 import uvicorn
 from src.api import playground_router, chat_router
+from src.config import app_settings
+from src.memory.conversation_memory import conversation_memory
+from src.processing.query_classifier import query_classifier
+from src.processing.tokens import token_counter
+from src.workflow.file_preparation import file_preparer
 
-app = FastAPI(title="BrandBastion Assessment API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run blocking work (file parsing, cache I/O) on a bounded thread pool.
+    The tokenizer is loaded and the query classifier trained in the background; token counts
+    are estimated until the tokenizer is loaded.
+    Pending conversation memory updates are finished and file preparations still running are
+    cancelled before the pool shuts down.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=app_settings.BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io"
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+    tokenizer_loading = asyncio.create_task(asyncio.to_thread(token_counter.load))
+    classifier_training = asyncio.create_task(asyncio.to_thread(query_classifier.load))
+    yield
+    tokenizer_loading.cancel()
+    classifier_training.cancel()
+    await conversation_memory.wait_for_updates()
+    await file_preparer.shutdown()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Reject request bodies over `max_bytes` with a 413: before the body is read when its
+    Content-Length is declared, otherwise as soon as the chunks read exceed it. A malformed
+    Content-Length is rejected with a 400.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def too_large(self) -> str:
+        return f"Request exceeds the {self.max_bytes} bytes limit"
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                declared = -1
+            if declared < 0:
+                response = JSONResponse(
+                    status_code=400, content={"detail": "Malformed Content-Length"}
+                )
+                await response(scope, receive, send)
+                return
+            if declared > self.max_bytes:
+                response = JSONResponse(
+                    status_code=413, content={"detail": self.too_large()}
+                )
+                await response(scope, receive, send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self.too_large())
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            response_started |= message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException as e:
+            # Raised outside of a route, where FastAPI would have turned it into a response
+            if response_started or e.status_code != 413:
+                raise
+            response = JSONResponse(status_code=413, content={"detail": e.detail})
+            await response(scope, receive, send)
+
+
+app = FastAPI(title="BrandBastion Assessment API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,6 +111,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=app_settings.MAX_REQUEST_BYTES)
+
+
 app.include_router(playground_router)
 
 app.include_router(chat_router)
@@ -1,19 +1,82 @@
-from agno.workflow.v2.step import Step, StepInput, StepOutput
-from src.agents.data_analyst_agent import data_analyst_agent
+import asyncio
+
+from agno.workflow.v2.step import StepInput, StepOutput
+from src.agents.data_analyst_agent import (
+    DataAnalystAgentResponse,
+    create_data_analyst_agent,
+)
+from src.agents.model_router import QUERY_CHECK, run_routed
+from src.config import app_settings
+from src.memory.conversation_memory import conversation_memory
+from src.observability.tracing import instrumented_step
+from src.processing.query_classifier import OTHER, query_classifier
+from src.processing.tokens import count_tokens
 from src.workflow.agent_message import AgentFinalResponse
 
+OFF_TOPIC_MESSAGE = (
+    "I can only help with social media and media brand analysis. "
+    "Upload your reports or comments and ask me about them, for example the overall "
+    "sentiment, the most discussed topics or the engagement trends."
+)
+
+
+def is_valid_query_check(content) -> bool:
+    """The analyst's output parsed, with a known query type and guidelines for analytical queries"""
+    return isinstance(content, DataAnalystAgentResponse) and (
+        content.query_type == "other"
+        or (
+            content.query_type == "analytical"
+            and bool(content.information_extract_guidelines.strip())
+        )
+    )
+
 
-def check_query_subject(step_input: StepInput) -> StepOutput:
+async def check_query_subject(step_input: StepInput) -> StepOutput:
     """
     Check if the query is about social media and media brand analysis.
     Also analyze the previous interaction to check context.
+    Queries the local classifier is confident are off-topic are declined without calling the agent,
+    only on the first turn of a session: follow-ups like "why?" or "thanks!" read as off-topic
+    alone but refer to the earlier turns, so the agent sees them with the conversation.
+    In "summary" conversation memory mode the agent gets the session summary and last turns.
+    The model is chosen by the routing policy, escalating when the output does not validate.
     """
     query = step_input.message
     if not query:
         return StepOutput(success=False, error="No query provided")
 
+    additional_data = step_input.additional_data or {}
+    if (
+        app_settings.QUERY_CLASSIFIER_ENABLED
+        and not additional_data.get("has_history", True)
+        and await asyncio.to_thread(query_classifier.classify, query) == OTHER
+    ):
+        return StepOutput(
+            success=False,
+            content=AgentFinalResponse(final_answer=OFF_TOPIC_MESSAGE),
+            stop=True,
+        )
+
     try:
-        response = data_analyst_agent.run(query)
+        session_id = additional_data.get("session_id")
+        context_messages = None
+        if app_settings.CONVERSATION_MEMORY == "summary" and session_id:
+            context_messages = await asyncio.to_thread(
+                conversation_memory.context_messages, session_id
+            )
+        response = await run_routed(
+            create_data_analyst_agent(),
+            QUERY_CHECK,
+            query,
+            is_valid=is_valid_query_check,
+            input_tokens=count_tokens(query)
+            + sum(count_tokens(str(m.content)) for m in context_messages or []),
+            session_id=session_id,
+            user_id=additional_data.get("user_id"),
+            messages=context_messages,
+        )
+        if not isinstance(response.content, DataAnalystAgentResponse):
+            raise ValueError(f"Unexpected response {response.content!r}")
     except Exception as e:
         return StepOutput(
             success=False,
@@ -21,6 +84,7 @@ def check_query_subject(step_input: StepInput) -> StepOutput:
                 error_message="I could not understand your query, please try again."
             ),
             error=f"Error parsing query: {e}",
+            stop=True,
         )
 
     response_content = response.content
@@ -34,7 +98,7 @@ def check_query_subject(step_input: StepInput) -> StepOutput:
         )
 
 
-check_query_subject_step = Step(
+check_query_subject_step = instrumented_step(
     name="Check Query Subject",
     description="Check if the query is about social media and media brand analysis.",
     executor=check_query_subject,
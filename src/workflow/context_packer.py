@@ -0,0 +1,282 @@
+import asyncio
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+from agno.utils.log import logger
+
+from src.agents.context_summarizer_agent import context_summarizer_agent
+from src.config import app_settings
+from src.processing.comment_analytics import STOPWORDS, tokenize
+from src.processing.comment_parser import chunk_comments
+from src.processing.tokens import count_tokens, truncate_to_tokens
+
+# Share of the budget given to the most relevant passages verbatim when the rest is summarized
+VERBATIM_SHARE = 0.5
+SHINGLE_SIZE = 3
+# Near-duplicate candidates come from this many of a passage's rarest shingles, best ones checked
+CANDIDATE_SHINGLES = 8
+MAX_CANDIDATES = 16
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+@dataclass
+class Passage:
+    text: str
+    position: int
+    tokens: int
+    shingles: Set[str] = field(default_factory=set)
+    score: float = 0.0
+
+
+@dataclass
+class PackedContext:
+    text: str
+    input_tokens: int
+    tokens: int
+    passages: int
+    duplicates: int
+    summarized_passages: int = 0
+    summary_levels: int = 0
+    dropped_passages: int = 0
+
+
+def split_passages(extractions: List[str], passage_tokens: int) -> List[Passage]:
+    """Split extractions into paragraphs, long paragraphs into groups of lines of about `passage_tokens`"""
+    passages = []
+    for extraction in extractions:
+        for paragraph in extraction.split("\n\n"):
+            lines = [line for line in paragraph.strip().splitlines() if line.strip()]
+            for group in chunk_comments(lines, passage_tokens):
+                text = "\n".join(group)
+                passages.append(Passage(text, len(passages), count_tokens(text)))
+    return passages
+
+
+def shingles(text: str) -> Set[str]:
+    words = tokenize(text)
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[i : i + SHINGLE_SIZE])
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def deduplicate(passages: List[Passage], threshold: float) -> List[Passage]:
+    """
+    Drop passages whose word shingles are mostly contained in a passage already kept, so the same
+    finding extracted from overlapping chunks or files is sent once.
+    Passages with too many shingles no kept passage has cannot be near-duplicates and are kept
+    at once. For the others, candidates are the kept passages sharing their rarest indexed
+    shingles, so frequent phrases do not make the comparison quadratic, checked exactly.
+    """
+    kept: List[Passage] = []
+    seen_texts: Set[str] = set()
+    index: Dict[str, List[int]] = defaultdict(list)
+    for passage in sorted(passages, key=lambda passage: -passage.tokens):
+        normalized_text = " ".join(tokenize(passage.text))
+        if not normalized_text or normalized_text in seen_texts:
+            continue
+        seen_texts.add(normalized_text)
+        passage.shingles = shingles(passage.text)
+        indexed = [shingle for shingle in passage.shingles if shingle in index]
+        if len(indexed) >= threshold * len(passage.shingles):
+            rarest = sorted(indexed, key=lambda shingle: len(index[shingle]))
+            candidates = Counter(
+                kept_id
+                for shingle in rarest[:CANDIDATE_SHINGLES]
+                for kept_id in index[shingle]
+            )
+            if any(
+                len(passage.shingles & kept[kept_id].shingles)
+                >= threshold * len(passage.shingles)
+                for kept_id, _ in candidates.most_common(MAX_CANDIDATES)
+            ):
+                continue
+        for shingle in passage.shingles:
+            index[shingle].append(len(kept))
+        kept.append(passage)
+    return sorted(kept, key=lambda passage: passage.position)
+
+
+def rank(passages: List[Passage], query: str) -> List[Passage]:
+    """Score passages by BM25 relevance to the query, most relevant first"""
+    query_terms = {term for term in tokenize(query) if term not in STOPWORDS}
+    passage_terms = [Counter(tokenize(passage.text)) for passage in passages]
+    average_length = sum(sum(terms.values()) for terms in passage_terms) / max(
+        1, len(passages)
+    )
+    document_frequency = Counter(
+        term for terms in passage_terms for term in query_terms if term in terms
+    )
+    for passage, terms in zip(passages, passage_terms):
+        length = sum(terms.values())
+        passage.score = 0.0
+        for term in query_terms:
+            frequency = terms.get(term, 0)
+            if not frequency:
+                continue
+            idf = math.log(
+                1
+                + (len(passages) - document_frequency[term] + 0.5)
+                / (document_frequency[term] + 0.5)
+            )
+            passage.score += (
+                idf
+                * frequency
+                * (BM25_K1 + 1)
+                / (
+                    frequency
+                    + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                )
+            )
+    return sorted(passages, key=lambda passage: (-passage.score, passage.position))
+
+
+def take_within(passages: List[Passage], budget: int) -> List[Passage]:
+    """The passages, in the given order, that fit the token budget"""
+    taken, used = [], 0
+    for passage in passages:
+        if used + passage.tokens + 1 <= budget:
+            taken.append(passage)
+            used += passage.tokens + 1
+    return taken
+
+
+def render(passages: List[Passage]) -> str:
+    return "\n\n".join(passage.text for passage in passages)
+
+
+async def summarize_group(
+    texts: List[str], query: str, summary_tokens: int, semaphore: asyncio.Semaphore
+) -> str:
+    async with semaphore:
+        response = await context_summarizer_agent.arun(
+            f"""
+            QUERY:
+            {query}
+
+            PASSAGES:
+            {chr(10).join(f"[{index + 1}] {text}" for index, text in enumerate(texts))}
+
+            Return the condensed passages in at most {summary_tokens * 3 // 4} words.
+            """
+        )
+    return truncate_to_tokens(str(response.content).strip(), summary_tokens)
+
+
+async def summarize_hierarchically(
+    passages: List[Passage], query: str, budget: int
+) -> Tuple[List[str], int]:
+    """
+    Summarize groups of ranked passages in parallel, then the summaries, level by level, until they
+    fit the budget. Returns the summaries and the number of levels.
+    """
+    texts = [passage.text for passage in passages]
+    semaphore = asyncio.Semaphore(app_settings.CONTEXT_PACK_CONCURRENCY)
+    levels = 0
+    while sum(count_tokens(text) + 1 for text in texts) > budget:
+        groups = list(chunk_comments(texts, app_settings.CONTEXT_PACK_GROUP_TOKENS))
+        if levels and len(groups) == len(texts):
+            break
+        texts = await asyncio.gather(
+            *[
+                summarize_group(
+                    group, query, app_settings.CONTEXT_PACK_SUMMARY_TOKENS, semaphore
+                )
+                for group in groups
+            ]
+        )
+        texts = [text for text in texts if text]
+        levels += 1
+    return texts, levels
+
+
+def select_passages(
+    extractions: List[str], query: str, budget: int
+) -> Tuple[List[Passage], PackedContext]:
+    """
+    The unique passages of the extractions that can be sent, the most relevant ones when they do
+    not fit the budget, and the packing statistics so far
+    """
+    passages = split_passages(extractions, app_settings.CONTEXT_PACK_PASSAGE_TOKENS)
+    input_tokens = sum(passage.tokens for passage in passages)
+    candidates = passages
+    if input_tokens > budget:
+        # Only the most relevant passages can be sent, verbatim or summarized, so only they are
+        # deduplicated
+        candidates = take_within(
+            rank(passages, query), budget + app_settings.CONTEXT_PACK_MAX_INPUT_TOKENS
+        )
+    unique = deduplicate(candidates, app_settings.CONTEXT_PACK_DUPLICATE_THRESHOLD)
+    packed = PackedContext(
+        text="",
+        input_tokens=input_tokens,
+        tokens=0,
+        passages=len(unique),
+        duplicates=len(candidates) - len(unique),
+        dropped_passages=len(passages) - len(candidates),
+    )
+    return unique, packed
+
+
+async def pack_context(extractions: List[str], query: str) -> PackedContext:
+    """
+    Fit the extracted data to CONTEXT_PACK_TOKEN_BUDGET tokens for the report prompt.
+    Extractions are split into passages, ranked by relevance to the query when they do not fit,
+    and near-duplicate passages are dropped. If they still do not fit, the most relevant passages
+    are kept verbatim and the next ones, up to CONTEXT_PACK_MAX_INPUT_TOKENS, are summarized in
+    parallel groups, level by level.
+    The least relevant passages are dropped if summarization fails or the input cap is reached, so
+    the report prompt and the packing time stay bounded whatever the amount of data.
+    Splitting, tokenizing, ranking and deduplicating run on a worker thread, off the event loop.
+    """
+    budget = app_settings.CONTEXT_PACK_TOKEN_BUDGET
+    unique, packed = await asyncio.to_thread(
+        select_passages, extractions, query, budget
+    )
+
+    if sum(passage.tokens + 1 for passage in unique) <= budget:
+        packed.text = render(unique)
+        packed.tokens = await asyncio.to_thread(count_tokens, packed.text)
+        return packed
+
+    ranked = sorted(unique, key=lambda passage: (-passage.score, passage.position))
+    verbatim = take_within(ranked, int(budget * VERBATIM_SHARE))
+    verbatim_tokens = sum(passage.tokens + 1 for passage in verbatim)
+    kept = {passage.position for passage in verbatim}
+    overflow = take_within(
+        [passage for passage in ranked if passage.position not in kept],
+        app_settings.CONTEXT_PACK_MAX_INPUT_TOKENS,
+    )
+    packed.dropped_passages += len(ranked) - len(verbatim) - len(overflow)
+
+    summaries = []
+    try:
+        summaries, packed.summary_levels = await summarize_hierarchically(
+            overflow, query, budget - verbatim_tokens
+        )
+        if packed.summary_levels:
+            packed.summarized_passages = len(overflow)
+        else:
+            verbatim, summaries = verbatim + overflow, []
+    except Exception as e:
+        logger.warning(
+            f"Context summarization failed, dropping the least relevant data: {e}"
+        )
+        remaining = take_within(overflow, budget - verbatim_tokens)
+        packed.dropped_passages += len(overflow) - len(remaining)
+        verbatim += remaining
+
+    verbatim.sort(key=lambda passage: passage.position)
+    sections = [render(verbatim)]
+    if summaries:
+        sections.append("SUMMARY OF THE REMAINING DATA:\n" + "\n\n".join(summaries))
+    packed.text = await asyncio.to_thread(
+        truncate_to_tokens, "\n\n".join(sections), budget
+    )
+    packed.tokens = await asyncio.to_thread(count_tokens, packed.text)
+    return packed
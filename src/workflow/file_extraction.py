@@ -0,0 +1,470 @@
+import asyncio
+from agno.media import File
+from agno.utils.log import logger
+from pydantic import BaseModel
+from typing import Iterable, List, Optional
+from src.agents.data_engineer_agent import (
+    DataEngineerAgentResponse,
+    create_data_engineer_agent,
+)
+from src.agents.model_router import EXTRACTION, routing_key, run_routed
+from src.config import app_settings
+from src.memory.blob_store import file_digest, open_file
+from src.memory.document_index import ingest_file, page_chunks, retrieve_context
+from src.memory.extraction_cache import extraction_cache
+from src.observability.metrics import comment_dedup_comments, comment_search_comments
+from src.processing.comment_analytics import corpus_cache
+from src.processing.comment_dedup import CommentClusters, comment_clusters_cache
+from src.processing.comment_index import CommentIndex, comment_index_cache
+from src.processing.comment_parser import (
+    chunk_comments,
+    iter_comments,
+    render_comment,
+)
+from src.processing.pdf_parser import ParsedPdf, extract_pages, parse_pdf
+from src.processing.tokens import count_tokens
+
+
+class DataContextOutput(BaseModel):
+    content_extracted: List[str]
+    comment_statistics: List[str] = []
+    errors: List[str] = []
+
+
+def compute_comment_statistics(file: File) -> str:
+    """
+    Compute exact comment counts, topics and sentiment locally, rendered for the report prompt,
+    with the most repeated comments when near-duplicates are collapsed.
+    """
+    corpus = corpus_cache.get(file_digest(file), lambda: open_file(file))
+    statistics = corpus.statistics(file.name).to_prompt()
+    if app_settings.COMMENT_DEDUP_ENABLED:
+        most_repeated = comment_clusters(file).most_repeated(
+            app_settings.COMMENT_DEDUP_TOP_REPEATED
+        )
+        if most_repeated:
+            statistics += "\nMost repeated comments, near-duplicates included: "
+            statistics += " | ".join(
+                render_comment(comment, count) for comment, count in most_repeated
+            )
+    return statistics
+
+
+def comment_index(file: File) -> CommentIndex:
+    """The BM25 index of a comment file, built once per file digest"""
+    return comment_index_cache.get(file_digest(file), lambda: open_file(file))
+
+
+def comment_clusters(file: File) -> CommentClusters:
+    """The near-duplicate clusters of a comment file, built once per file digest"""
+    return comment_clusters_cache.get(file_digest(file), lambda: open_file(file))
+
+
+def search_comments(file: File, search_text: str) -> Optional[List[str]]:
+    """
+    The comments of a comment file most relevant to the search text by BM25, best first and
+    rendered for the prompt: at most COMMENT_SEARCH_TOP_K, scoring at least
+    COMMENT_SEARCH_MIN_SCORE_RATIO of the best score. With COMMENT_DEDUP_ENABLED near-duplicates
+    are sent once, with the number of comments of the file they stand for.
+    None when the file has fewer than COMMENT_SEARCH_MIN_COMMENTS comments and is sent whole, or
+    when no comment matches.
+    """
+    index = comment_index(file)
+    if len(index) < app_settings.COMMENT_SEARCH_MIN_COMMENTS:
+        return None
+    limit = app_settings.COMMENT_SEARCH_TOP_K
+    # Reposts score alike, so more candidates are ranked to fill the limit with distinct comments
+    comment_ids, scores = index.search(
+        search_text, limit * 4 if app_settings.COMMENT_DEDUP_ENABLED else limit
+    )
+    if not len(comment_ids):
+        return None
+    comment_ids = comment_ids[
+        scores >= scores[0] * app_settings.COMMENT_SEARCH_MIN_SCORE_RATIO
+    ]
+    if app_settings.COMMENT_DEDUP_ENABLED:
+        comment_ids, counts = comment_clusters(file).collapse(comment_ids)
+    else:
+        counts = [1] * len(comment_ids)
+    comment_ids, counts = comment_ids[:limit], counts[:limit]
+    comment_search_comments.inc(len(comment_ids), result="selected")
+    comment_search_comments.inc(len(index) - len(comment_ids), result="skipped")
+    return [
+        render_comment(index.comments[comment_id], int(count))
+        for comment_id, count in zip(comment_ids, counts)
+    ]
+
+
+def sample_comments(file: File, max_comments: int) -> Optional[List[str]]:
+    """
+    At most `max_comments` comments standing for a whole comment file, rendered for the prompt:
+    with COMMENT_DEDUP_ENABLED the most repeated ones, with their multiplicity, then comments
+    evenly spread over the file; otherwise comments evenly spread over the file.
+    None when the file has no more comments than that and is sent whole.
+    """
+    corpus = corpus_cache.get(file_digest(file), lambda: open_file(file))
+    if len(corpus) <= max_comments:
+        return None
+    if app_settings.COMMENT_DEDUP_ENABLED:
+        return [
+            render_comment(comment, count)
+            for comment, count in comment_clusters(file).sample(max_comments)
+        ]
+    step = len(corpus) / max_comments
+    return [
+        render_comment(corpus.comments[int(index * step)])
+        for index in range(max_comments)
+    ]
+
+
+async def select_relevant_comments(
+    file: File, guidelines: str, query: str = ""
+) -> Optional[List[str]]:
+    """
+    The rendered comments most relevant to the guidelines and query, None when the file is sent
+    whole
+    """
+    if not app_settings.COMMENT_SEARCH_ENABLED:
+        return None
+    try:
+        return await asyncio.to_thread(search_comments, file, f"{guidelines}\n{query}")
+    except Exception as e:
+        logger.warning(f"Comment search unavailable for {file.name}: {e}")
+        return None
+
+
+async def relevant_comment_excerpts(
+    file: File, guidelines: str, query: str = ""
+) -> Optional[str]:
+    """The most relevant comments that fit one extraction chunk, rendered for the prompt"""
+    selected_lines = await select_relevant_comments(file, guidelines, query)
+    if not selected_lines:
+        return None
+    return "\n".join(
+        next(chunk_comments(selected_lines, app_settings.EXTRACTION_CHUNK_TOKENS))
+    )
+
+
+def read_pdf(file: File) -> ParsedPdf:
+    with open_file(file) as stream:
+        return parse_pdf(stream, app_settings.PDF_MIN_TEXT_CHARS)
+
+
+def read_pdf_pages(file: File, page_numbers: List[int]) -> bytes:
+    with open_file(file) as stream:
+        return extract_pages(stream, page_numbers)
+
+
+def build_extraction_prompt(guidelines: str, content_text: str = "") -> str:
+    """Build the data engineer prompt, with the plain text content if there is any"""
+    prompt = f"""
+        You are given guidelines in what to extract and the file contents, either attached
+        as files or in plain text (or both).
+        You need to extract the information from the file to the best extent of the guidelines.
+
+        GUIDELINES:
+        {guidelines}
+        """
+    if content_text:
+        prompt += f"""
+        <content>
+        {content_text}
+        </content>
+        """
+    return prompt
+
+
+def is_valid_extraction(content) -> bool:
+    return isinstance(content, DataEngineerAgentResponse) and bool(
+        content.extracted_content.strip()
+    )
+
+
+async def run_extractor(
+    prompt: str, semaphore: asyncio.Semaphore, files: Optional[List[File]] = None
+) -> DataEngineerAgentResponse:
+    """
+    Run a data engineer agent of its own, bounded by the shared semaphore.
+    The model is chosen by the routing policy from the prompt size and the attached files,
+    escalating when the structured output does not validate or the extraction is empty.
+    """
+    async with semaphore:
+        extractor_response = await run_routed(
+            create_data_engineer_agent(),
+            EXTRACTION,
+            prompt,
+            is_valid=is_valid_extraction,
+            input_tokens=count_tokens(prompt),
+            attachments=bool(files),
+            files=files,
+        )
+    return extractor_response.content
+
+
+async def reduce_extractions(
+    partials: List[str], guidelines: str, semaphore: asyncio.Semaphore
+) -> str:
+    """
+    Merge partial extractions of the same file into one.
+    Partials are merged in groups that fit the chunk budget, level by level, until one remains.
+    """
+    while len(partials) > 1:
+        groups = list(chunk_comments(partials, app_settings.EXTRACTION_CHUNK_TOKENS))
+        if len(groups) == len(partials):
+            groups = [partials[i : i + 2] for i in range(0, len(partials), 2)]
+
+        async def reduce_group(group: List[str]) -> str:
+            if len(group) == 1:
+                return group[0]
+            content_text = "\n\n".join(
+                f"[part {index + 1}]\n{partial}" for index, partial in enumerate(group)
+            )
+            response = await run_extractor(
+                build_extraction_prompt(
+                    f"""{guidelines}
+
+        The content holds partial extractions from consecutive parts of the same file.
+        Merge them into a single extraction: add up counts and frequencies across parts
+        and drop repeated information.""",
+                    content_text,
+                ),
+                semaphore,
+            )
+            return response.extracted_content
+
+        reduced = await asyncio.gather(*[reduce_group(group) for group in groups])
+        partials = [partial for partial in reduced if partial]
+    return partials[0] if partials else ""
+
+
+async def extract_from_comments(
+    file: File,
+    guidelines: str,
+    semaphore: asyncio.Semaphore,
+    selected_lines: Optional[List[str]] = None,
+    selection: str = "most relevant to the guidelines",
+) -> DataContextOutput:
+    """
+    Map-reduce extraction over a comment file, or over the rendered comments selected from it,
+    described to the model by `selection`.
+    With COMMENT_DEDUP_ENABLED near-duplicate comments of the file are sent once, with their
+    multiplicity; otherwise the file is streamed. The comments are grouped into token-budgeted
+    chunks that are extracted concurrently, with at most EXTRACTION_CONCURRENCY chunks held in
+    memory, then the partial extractions are merged.
+    """
+    if selected_lines is None:
+        chunk_guidelines = f"""{guidelines}
+
+        The content is one part of the comments in {file.name}. Report counts where relevant so
+        partial extractions can be combined."""
+    else:
+        chunk_guidelines = f"""{guidelines}
+
+        The content is one part of the comments in {file.name} {selection}, selected out of all
+        its comments; exact counts over the whole file are computed separately. Report counts
+        where relevant so partial extractions can be combined."""
+    if app_settings.COMMENT_DEDUP_ENABLED:
+        chunk_guidelines += """
+        Comments repeated with small variations are listed once, followed by (xN) with the
+        number of comments they stand for; weigh them by that number."""
+    errors = []
+
+    async def extract_chunk(lines: List[str]) -> str:
+        try:
+            response = await run_extractor(
+                build_extraction_prompt(chunk_guidelines, "\n".join(lines)),
+                semaphore,
+            )
+        except Exception as e:
+            errors.append(f"{file.name}: {e}")
+            return ""
+        finally:
+            in_flight.release()
+        if response.error:
+            errors.append(f"{file.name}: {response.error}")
+        return response.extracted_content
+
+    async def schedule_chunks(lines: Iterable[str]) -> None:
+        for chunk in chunk_comments(lines, app_settings.EXTRACTION_CHUNK_TOKENS):
+            await in_flight.acquire()
+            tasks.append(asyncio.create_task(extract_chunk(chunk)))
+
+    in_flight = asyncio.Semaphore(app_settings.EXTRACTION_CONCURRENCY)
+    tasks = []
+    if selected_lines is not None:
+        await schedule_chunks(selected_lines)
+    elif app_settings.COMMENT_DEDUP_ENABLED:
+        clusters = await asyncio.to_thread(comment_clusters, file)
+        comment_dedup_comments.inc(len(clusters), result="representative")
+        comment_dedup_comments.inc(
+            len(clusters.representative_of) - len(clusters), result="collapsed"
+        )
+        await schedule_chunks(clusters.lines())
+    else:
+        with open_file(file) as stream:
+            await schedule_chunks(
+                render_comment(comment) for comment in iter_comments(stream)
+            )
+    partials = [partial for partial in await asyncio.gather(*tasks) if partial]
+
+    if len(partials) > 1:
+        try:
+            extracted_content = await reduce_extractions(
+                partials, guidelines, semaphore
+            )
+        except Exception as e:
+            errors.append(f"{file.name}: {e}")
+            extracted_content = "\n".join(partials)
+    else:
+        extracted_content = partials[0] if partials else ""
+
+    return DataContextOutput(
+        content_extracted=[extracted_content] if extracted_content else [],
+        errors=errors,
+    )
+
+
+async def retrieve_relevant_content(
+    file: File, guidelines: str, chunks: Optional[Iterable[str]] = None
+) -> Optional[str]:
+    """
+    Index the file in the knowledge base and retrieve its chunks most relevant to the guidelines.
+    Returns None when the file is small enough to be sent whole or when indexing is unavailable.
+    """
+    if not app_settings.RETRIEVAL_EXTRACTION:
+        return None
+    try:
+        chunk_count = await asyncio.to_thread(ingest_file, file, chunks)
+        if chunk_count <= app_settings.RETRIEVAL_MIN_CHUNKS:
+            return None
+        return await asyncio.to_thread(retrieve_context, file, guidelines) or None
+    except Exception as e:
+        logger.warning(f"Retrieval unavailable for {file.name}: {e}")
+        return None
+
+
+async def extract_with_single_call(
+    file: File,
+    guidelines: str,
+    semaphore: asyncio.Semaphore,
+    content_text: str = "",
+    files: Optional[List[File]] = None,
+) -> DataContextOutput:
+    try:
+        extracted_contents = await run_extractor(
+            build_extraction_prompt(guidelines, content_text), semaphore, files
+        )
+    except Exception as e:
+        return DataContextOutput(content_extracted=[], errors=[f"{file.name}: {e}"])
+
+    return DataContextOutput(
+        content_extracted=(
+            [extracted_contents.extracted_content]
+            if extracted_contents.extracted_content
+            else []
+        ),
+        errors=(
+            [f"{file.name}: {extracted_contents.error}"]
+            if extracted_contents.error
+            else []
+        ),
+    )
+
+
+async def extract_from_file(
+    file: File,
+    guidelines: str,
+    semaphore: asyncio.Semaphore,
+    retrieval: bool = True,
+    query: str = "",
+) -> DataContextOutput:
+    """
+    Extract the data relevant to the guidelines from a single file.
+    Results are served from the extraction cache when the file was already processed.
+    Only the comments of large comment files scoring best for the guidelines and query are sent;
+    other large files are indexed in the knowledge base and only their chunks relevant to the
+    guidelines are sent, unless `retrieval` is off and the whole file is read. PDF pages with a
+    text layer are sent as plain text, only image-only pages are attached for OCR.
+    """
+    searched = (
+        file.mime_type == "text/plain"
+        and retrieval
+        and app_settings.COMMENT_SEARCH_ENABLED
+    )
+    cache_key = extraction_cache.make_key(
+        [file],
+        f"{guidelines}\n{query}" if searched and query else guidelines,
+        routing_key(EXTRACTION),
+    )
+    cached_output = await asyncio.to_thread(extraction_cache.get, cache_key)
+    if cached_output:
+        return DataContextOutput.model_validate_json(cached_output)
+
+    if file.mime_type == "text/plain":
+        selected_lines = (
+            await select_relevant_comments(file, guidelines, query)
+            if searched
+            else None
+        )
+        retrieved_content = (
+            await retrieve_relevant_content(file, guidelines)
+            if retrieval and not selected_lines
+            else None
+        )
+        if selected_lines:
+            data_context_output = await extract_from_comments(
+                file, guidelines, semaphore, selected_lines
+            )
+        elif retrieved_content:
+            data_context_output = await extract_with_single_call(
+                file, guidelines, semaphore, retrieved_content
+            )
+        else:
+            data_context_output = await extract_from_comments(
+                file, guidelines, semaphore
+            )
+        if data_context_output.content_extracted and not data_context_output.errors:
+            await asyncio.to_thread(
+                extraction_cache.set, cache_key, data_context_output.model_dump_json()
+            )
+        return data_context_output
+
+    if file.mime_type != "application/pdf":
+        return DataContextOutput(
+            content_extracted=[],
+            errors=[f"{file.name}: unsupported file type {file.mime_type}"],
+        )
+
+    content_text = ""
+    files = None
+    try:
+        parsed_pdf = await asyncio.to_thread(read_pdf, file)
+    except Exception:
+        parsed_pdf = None
+
+    if parsed_pdf is None or not parsed_pdf.text_pages:
+        files = [file]
+    else:
+        retrieved_content = (
+            await retrieve_relevant_content(file, guidelines, page_chunks(parsed_pdf))
+            if retrieval
+            else None
+        )
+        content_text = retrieved_content or parsed_pdf.text
+        if parsed_pdf.image_page_numbers:
+            image_pages = await asyncio.to_thread(
+                read_pdf_pages, file, parsed_pdf.image_page_numbers
+            )
+            files = [
+                File(name=file.name, content=image_pages, mime_type=file.mime_type)
+            ]
+
+    data_context_output = await extract_with_single_call(
+        file, guidelines, semaphore, content_text, files
+    )
+    if data_context_output.content_extracted:
+        await asyncio.to_thread(
+            extraction_cache.set, cache_key, data_context_output.model_dump_json()
+        )
+
+    return data_context_output
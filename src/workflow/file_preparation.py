@@ -0,0 +1,249 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from agno.media import File
+from agno.utils.log import logger
+
+from src.agents.model_router import EXTRACTION, routing_key
+from src.config import app_settings
+from src.memory.blob_store import blob_store, file_digest
+from src.memory.document_index import ingest_file, page_chunks
+from src.memory.extraction_cache import extraction_cache
+from src.memory.prepared_files import (
+    FAILED,
+    PROCESSING,
+    READY,
+    STORED,
+    PreparedFile,
+    prepared_file_store,
+)
+from src.observability.metrics import (
+    cache_lookups,
+    file_preparation_duration,
+    file_preparations,
+)
+from src.workflow.file_extraction import (
+    DataContextOutput,
+    comment_index,
+    compute_comment_statistics,
+    extract_from_comments,
+    extract_from_file,
+    read_pdf,
+    relevant_comment_excerpts,
+    retrieve_relevant_content,
+    sample_comments,
+)
+
+# Query-independent guidelines of the digest extracted from every uploaded file
+DIGEST_GUIDELINES = """
+    Describe what the file contains, then extract every piece of data it holds: metrics with
+    their values, units and time periods, series and trends, rankings, topics and themes with
+    how often they come up, sentiment, notable quotes and anything unusual.
+    Keep numbers exact and keep the structure of tables and charts."""
+
+
+class FilePreparer:
+    """
+    Background preparation of uploaded files, started as soon as they are stored so the work does
+    not wait for the query: comment files are parsed into their statistics, near-duplicate
+    clusters and BM25 index, PDF text layers are parsed, both are chunked and embedded into the
+    document index, and a query-independent digest is extracted from each file and kept in the
+    extraction cache. The digest of a comment file is extracted from at most
+    PREPARATION_DIGEST_MAX_COMMENTS of its comments.
+    Files are prepared once per digest, at most `concurrency` at a time.
+    """
+
+    def __init__(self, concurrency: int):
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.slots = asyncio.Semaphore(concurrency)
+        self.extraction_semaphore = asyncio.Semaphore(
+            app_settings.EXTRACTION_CONCURRENCY
+        )
+
+    @staticmethod
+    def digest_key(file: File) -> str:
+        return extraction_cache.make_key(
+            [file], DIGEST_GUIDELINES, routing_key(EXTRACTION)
+        )
+
+    @staticmethod
+    def needs_digest(file: File) -> bool:
+        return file.mime_type != "text/plain" or app_settings.COMMENT_MODEL_EXTRACTION
+
+    async def is_prepared(self, file: File) -> bool:
+        prepared = await asyncio.to_thread(prepared_file_store.get, file_digest(file))
+        if prepared is None or prepared.status != READY:
+            return False
+        # The digest may have been evicted from the extraction cache since
+        return not self.needs_digest(file) or bool(
+            await asyncio.to_thread(extraction_cache.get, self.digest_key(file))
+        )
+
+    async def schedule(self, file: File) -> str:
+        """Start preparing a file unless it is being or was already prepared. Returns its file id"""
+        file_id = file_digest(file)
+        if file_id in self.tasks or await self.is_prepared(file):
+            return file_id
+        await asyncio.to_thread(
+            prepared_file_store.set,
+            file_id,
+            file.name or file_id,
+            file.mime_type or "",
+            PROCESSING,
+        )
+        # Checked again with no await before the task is registered, so concurrent uploads of the
+        # same file start a single preparation
+        if file_id not in self.tasks:
+            self.tasks[file_id] = asyncio.create_task(self._prepare(file, file_id))
+            self.tasks[file_id].add_done_callback(
+                lambda _: self.tasks.pop(file_id, None)
+            )
+        return file_id
+
+    async def register(self, file: File) -> str:
+        """
+        Record an uploaded file so its id can be referenced, and prepare it when
+        UPLOAD_PREPARATION_ENABLED. Returns its file id.
+        """
+        if app_settings.UPLOAD_PREPARATION_ENABLED:
+            return await self.schedule(file)
+        file_id = file_digest(file)
+        if await self.status(file_id) is None:
+            await asyncio.to_thread(
+                prepared_file_store.set,
+                file_id,
+                file.name or file_id,
+                file.mime_type or "",
+                STORED,
+            )
+        return file_id
+
+    async def _prepare(self, file: File, file_id: str) -> None:
+        outcome, error = READY, ""
+        started = time.perf_counter()
+        try:
+            async with self.slots:
+                if file.mime_type == "text/plain":
+                    await asyncio.to_thread(compute_comment_statistics, file)
+                    if app_settings.COMMENT_SEARCH_ENABLED:
+                        await asyncio.to_thread(comment_index, file)
+                    if app_settings.RETRIEVAL_EXTRACTION:
+                        await asyncio.to_thread(ingest_file, file)
+                elif app_settings.RETRIEVAL_EXTRACTION:
+                    parsed_pdf = await asyncio.to_thread(read_pdf, file)
+                    await asyncio.to_thread(ingest_file, file, page_chunks(parsed_pdf))
+
+                if self.needs_digest(file):
+                    digest = await self.extract_digest(file)
+                    if not digest.content_extracted:
+                        outcome = FAILED
+                        error = "; ".join(digest.errors) or "Nothing extracted"
+        except asyncio.CancelledError:
+            outcome, error = FAILED, "Preparation interrupted"
+            raise
+        except Exception as e:
+            logger.warning(f"Preparing {file.name} failed: {e}")
+            outcome, error = FAILED, str(e)
+        finally:
+            file_preparations.inc(outcome=outcome)
+            file_preparation_duration.observe(
+                time.perf_counter() - started, outcome=outcome
+            )
+            await asyncio.shield(
+                asyncio.to_thread(
+                    prepared_file_store.set,
+                    file_id,
+                    file.name or file_id,
+                    file.mime_type or "",
+                    outcome,
+                    error,
+                )
+            )
+
+    async def extract_digest(self, file: File) -> DataContextOutput:
+        """
+        Extract the query-independent digest of a file into the extraction cache.
+        Large comment files are digested from a sample of their most repeated and evenly spread
+        comments, so the model calls per file stay bounded; their exact statistics are computed
+        separately.
+        """
+        if file.mime_type == "text/plain":
+            sampled_lines = await asyncio.to_thread(
+                sample_comments, file, app_settings.PREPARATION_DIGEST_MAX_COMMENTS
+            )
+            if sampled_lines is not None:
+                digest = await extract_from_comments(
+                    file,
+                    DIGEST_GUIDELINES,
+                    self.extraction_semaphore,
+                    sampled_lines,
+                    selection="most repeated and evenly spread over the file",
+                )
+                if digest.content_extracted and not digest.errors:
+                    await asyncio.to_thread(
+                        extraction_cache.set,
+                        self.digest_key(file),
+                        digest.model_dump_json(),
+                    )
+                return digest
+        return await extract_from_file(
+            file, DIGEST_GUIDELINES, self.extraction_semaphore, retrieval=False
+        )
+
+    async def prepared_output(
+        self, file: File, guidelines: str, query: str = ""
+    ) -> Optional[DataContextOutput]:
+        """
+        The prepared digest of a file, with the comments or chunks of the file most relevant to
+        the guidelines and query when the file is large.
+        None when the file was not prepared, its preparation failed or is still running: the
+        query is not held up by a digest, it is extracted for its own guidelines instead.
+        """
+        if file_digest(file) in self.tasks:
+            cache_lookups.inc(cache="prepared_file", result="in_progress")
+            return None
+        cached_digest = await asyncio.to_thread(
+            extraction_cache.get, self.digest_key(file)
+        )
+        if not cached_digest:
+            cache_lookups.inc(cache="prepared_file", result="miss")
+            return None
+        cache_lookups.inc(cache="prepared_file", result="hit")
+
+        prepared_output = DataContextOutput.model_validate_json(cached_digest)
+        excerpts = None
+        if file.mime_type == "text/plain":
+            excerpts = await relevant_comment_excerpts(file, guidelines, query)
+        if not excerpts:
+            excerpts = await retrieve_relevant_content(file, guidelines)
+        if excerpts:
+            prepared_output.content_extracted.append(
+                f"Excerpts of {file.name} relevant to the query:\n{excerpts}"
+            )
+        return prepared_output
+
+    async def file(self, file_id: str) -> Optional[File]:
+        """The stored file of a file id, None when it is unknown or its blob was swept"""
+        prepared = await asyncio.to_thread(prepared_file_store.get, file_id)
+        if prepared is None or not blob_store.contains(file_id, prepared.mime_type):
+            return None
+        return blob_store.file(file_id, prepared.name, prepared.mime_type)
+
+    async def status(self, file_id: str) -> Optional[PreparedFile]:
+        return await asyncio.to_thread(prepared_file_store.get, file_id)
+
+    def in_progress(self) -> List[str]:
+        """The digests of the files being prepared; callable from any thread"""
+        return list(self.tasks.copy())
+
+    async def shutdown(self) -> None:
+        """Cancel the preparations still running"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+file_preparer = FilePreparer(app_settings.PREPARATION_CONCURRENCY)
+blob_store.add_reference_source(file_preparer.in_progress)
@@ -1,17 +1,36 @@
-from agno.workflow.v2.step import Step, StepInput, StepOutput
-from pydantic import BaseModel
-from typing import List
-from src.agents.data_engineer_agent import data_engineer_agent
+import asyncio
+from agno.media import File
+from agno.workflow.v2.step import StepInput, StepOutput
+from src.config import app_settings
+from src.observability.tracing import instrumented_step
 from src.workflow.agent_message import AgentFinalResponse
+from src.workflow.file_extraction import (
+    DataContextOutput,
+    compute_comment_statistics,
+    extract_from_file,
+)
+from src.workflow.file_preparation import file_preparer
 
 
-class DataContextOutput(BaseModel):
-    content_extracted: List[str]
+async def read_or_extract(
+    file: File, guidelines: str, semaphore: asyncio.Semaphore, query: str = ""
+) -> DataContextOutput:
+    """
+    The prepared digest of the file when it was prepared at upload time, otherwise, also while
+    its preparation is still running, an extraction for the guidelines and query.
+    """
+    if app_settings.UPLOAD_PREPARATION_ENABLED:
+        prepared_output = await file_preparer.prepared_output(file, guidelines, query)
+        if prepared_output is not None:
+            return prepared_output
+    return await extract_from_file(file, guidelines, semaphore, query=query)
 
 
-def gather_data_from_context(step_input: StepInput) -> StepOutput:
+async def gather_data_from_context(step_input: StepInput) -> StepOutput:
     """
     Gather data from the context to help provide a better answer to the query.
+    Files prepared at upload time are read from their digests; the others are extracted in their
+    own task each, bounded by EXTRACTION_CONCURRENCY.
     """
     previous_step_content = step_input.previous_step_content
 
@@ -33,75 +52,66 @@ def gather_data_from_context(step_input: StepInput) -> StepOutput:
         return StepOutput(
             success=False,
             content=AgentFinalResponse(
-                error_message="Please provide the files for me to analyze from."
+                error_message="Please provide the files for me to analyze from, "
+                "or add them to the session's documents."
             ),
             error="No files provided",
             stop=True,
         )
 
-    pdf_files = [file for file in files if file.mime_type == "application/pdf"]
+    guidelines = previous_step_content.information_extract_guidelines
     text_files = [file for file in files if file.mime_type == "text/plain"]
+    model_files = [
+        file
+        for file in files
+        if file.mime_type != "text/plain" or app_settings.COMMENT_MODEL_EXTRACTION
+    ]
+
+    semaphore = asyncio.Semaphore(app_settings.EXTRACTION_CONCURRENCY)
+    file_outputs = await asyncio.gather(
+        *[
+            read_or_extract(file, guidelines, semaphore, step_input.message or "")
+            for file in model_files
+        ]
+    )
+    comment_statistics = await asyncio.gather(
+        *[asyncio.to_thread(compute_comment_statistics, file) for file in text_files],
+        return_exceptions=True,
+    )
 
     content_extracted = []
-
-    if pdf_files:
-        try:
-            extractor_response = data_engineer_agent.run(
-                f"""
-                You are given guidelines in what to extract and files.
-                You need to extract the information from the file to the best extent of the guidelines.
-
-                GUIDELINES:
-                {previous_step_content.information_extract_guidelines}
-                """,
-                files=files,
-            )
-            extracted_contents = extractor_response.content
-            if extracted_contents.extracted_content:
-                content_extracted.append(extracted_contents.extracted_content)
-        except Exception as e:
-            return StepOutput(
-                success=False,
-                content=AgentFinalResponse(error_message=f"An error has occurred: {e}"),
-                error=f"An error has occurred: {e}",
-                stop=True,
-            )
-
-    if text_files:
-        text_content_extracted = "\n".join(
-            [text_file.content.decode("utf-8") for text_file in text_files]
+    errors = []
+    for file_output in file_outputs:
+        content_extracted.extend(file_output.content_extracted)
+        errors.extend(file_output.errors)
+    for file, statistics in zip(text_files, comment_statistics):
+        if isinstance(statistics, Exception):
+            errors.append(f"{file.name}: {statistics}")
+    comment_statistics = [
+        statistics for statistics in comment_statistics if isinstance(statistics, str)
+    ]
+
+    if not content_extracted and not comment_statistics and errors:
+        return StepOutput(
+            success=False,
+            content=AgentFinalResponse(
+                error_message=f"An error has occurred: {'; '.join(errors)}"
+            ),
+            error=f"An error has occurred: {'; '.join(errors)}",
+            stop=True,
         )
-        try:
-            extractor_response = data_engineer_agent.run(
-                f"""
-                You are given guidelines in what to extract and the content in plain text.
-                You need to extract the information from the content to the best extent of the guidelines.
-
-                GUIDELINES:
-                {previous_step_content.information_extract_guidelines}
-
-                <content>
-                {text_content_extracted}
-                </content>
-                """,
-            )
-            extracted_contents = extractor_response.content
-            if extracted_contents.extracted_content:
-                content_extracted.append(extracted_contents.extracted_content)
-        except Exception as e:
-            return StepOutput(
-                success=False,
-                content=AgentFinalResponse(error_message=f"An error has occurred: {e}"),
-                error=f"An error has occurred: {e}",
-                stop=True,
-            )
 
     return StepOutput(
-        success=True, content=DataContextOutput(content_extracted=content_extracted)
+        success=True,
+        content=DataContextOutput(
+            content_extracted=content_extracted,
+            comment_statistics=comment_statistics,
+            errors=errors,
+        ),
     )
 
 
-gather_data_from_context_step = Step(
+gather_data_from_context_step = instrumented_step(
     name="Gather Data From Context",
     description="Gather data from the context to answer the query.",
     executor=gather_data_from_context,
@@ -1,15 +1,32 @@
-from agno.workflow.v2.step import Step, StepInput, StepOutput
-from src.agents.data_scientist_agent import data_scientist_agent
+from typing import AsyncIterator, Union
+from agno.run.response import RunResponseContentEvent
+from agno.workflow.v2.step import StepInput, StepOutput
+from agno.utils.log import logger
+from src.agents.data_scientist_agent import create_data_scientist_agent
+from src.agents.model_router import REPORT, model_variant, route
+from src.observability.metrics import model_escalations, model_routes
+from src.observability.tracing import instrumented_step, span
+from src.processing.tokens import count_tokens
+from src.workflow.context_packer import pack_context
 from src.workflow.agent_message import AgentFinalResponse
 
 
-def generate_report(step_input: StepInput) -> StepOutput:
+async def generate_report(
+    step_input: StepInput,
+) -> AsyncIterator[Union[RunResponseContentEvent, StepOutput]]:
     """
     Generate a report based on the data at hand.
+    The extracted data is packed into CONTEXT_PACK_TOKEN_BUDGET tokens before it is sent.
+    The model is chosen by the routing policy from the prompt size; the next model is tried only
+    when a model fails or returns nothing before streaming any token.
+    The report tokens are yielded as they are produced, followed by the final StepOutput.
     """
     previous_step_content = step_input.previous_step_content
-    if not previous_step_content or not previous_step_content.content_extracted:
-        return StepOutput(
+    if not previous_step_content or not (
+        previous_step_content.content_extracted
+        or previous_step_content.comment_statistics
+    ):
+        yield StepOutput(
             success=False,
             content=AgentFinalResponse(
                 error_message="""I could not find any data relevant to your query.
@@ -18,31 +35,75 @@ def generate_report(step_input: StepInput) -> StepOutput:
             error="No data to generate a report from",
             stop=True,
         )
+        return
 
+    comment_statistics = (
+        "\n\n".join(previous_step_content.comment_statistics)
+        or "No comment files provided."
+    )
+
+    report = ""
     try:
-        response = data_scientist_agent.run(
-            f"""
+        with span("context_pack") as pack_attributes:
+            packed_context = await pack_context(
+                previous_step_content.content_extracted, step_input.message
+            )
+            pack_attributes.update(
+                input_tokens=packed_context.input_tokens,
+                tokens=packed_context.tokens,
+                duplicates=packed_context.duplicates,
+                summary_levels=packed_context.summary_levels,
+                dropped_passages=packed_context.dropped_passages,
+            )
+        prompt = f"""
             You are given a list of data.
             You need to generate a report based on the data.
 
             DATA:
-            {previous_step_content.content_extracted}
+            {packed_context.text or "No data extracted from the files."}
+
+            COMMENT STATISTICS (computed exactly over every comment, use them for any count or share):
+            {comment_statistics}
 
             QUERY:
             {step_input.message}
             """
-        )
+        models = route(REPORT, count_tokens(prompt))
+        model_routes.inc(task=REPORT, model=models[0])
+        data_scientist_agent = create_data_scientist_agent()
+        for attempt, model_id in enumerate(models):
+            try:
+                response_stream = await model_variant(
+                    data_scientist_agent, model_id
+                ).arun(prompt, stream=True)
+                async for event in response_stream:
+                    if isinstance(event, RunResponseContentEvent) and isinstance(
+                        event.content, str
+                    ):
+                        report += event.content
+                        yield event
+            except Exception as e:
+                if report or attempt == len(models) - 1:
+                    raise
+                logger.warning(f"Report on {model_id} failed, escalating: {e}")
+                model_escalations.inc(task=REPORT, reason="error")
+                continue
+            if report:
+                break
+            if attempt < len(models) - 1:
+                model_escalations.inc(task=REPORT, reason="invalid_output")
 
     except Exception as e:
-        return StepOutput(
+        yield StepOutput(
             success=False,
             content=AgentFinalResponse(error_message=f"An error has occurred: {e}"),
             error=f"An error has occurred: {e}",
             stop=True,
         )
+        return
 
-    if not response or not response.content:
-        return StepOutput(
+    if not report:
+        yield StepOutput(
             success=False,
             content=AgentFinalResponse(
                 error_message="I could not generate a report based on the data at hand. Try again later."
@@ -50,13 +111,12 @@ def generate_report(step_input: StepInput) -> StepOutput:
             error="I could not generate a report based on the data at hand.",
             stop=True,
         )
+        return
 
-    return StepOutput(
-        success=True, content=AgentFinalResponse(final_answer=response.content)
-    )
+    yield StepOutput(success=True, content=AgentFinalResponse(final_answer=report))
 
 
-generate_report_step = Step(
+generate_report_step = instrumented_step(
     name="Generate Report",
     description="Generate a report based on the data at hand.",
     executor=generate_report,
@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+# src.config requires the API keys; the tests never call the providers
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "test")
+
+# The stores are created on import; keep them out of the developer's tmp/
+work_dir = tempfile.mkdtemp(prefix="tests_")
+os.environ.setdefault("CHROMA_DB_PERSISTENT_PATH", os.path.join(work_dir, "chroma"))
+os.environ.setdefault("BLOB_STORE_PATH", os.path.join(work_dir, "blobs"))
+for setting, file_name in [
+    ("EXTRACTION_CACHE_DB_FILE", "extraction_cache.db"),
+    ("PREPARED_FILES_DB_FILE", "prepared_files.db"),
+    ("EMBEDDING_CACHE_DB_FILE", "embedding_cache.db"),
+    ("ANSWER_CACHE_DB_FILE", "answer_cache.db"),
+    ("SESSION_STORE_DB_FILE", "sessions.db"),
+    ("CONVERSATION_DB_FILE", "conversations.db"),
+]:
+    os.environ.setdefault(setting, os.path.join(work_dir, file_name))
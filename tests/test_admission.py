@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from src.api.admission import AdmissionController, AdmissionRejected, Priority
+
+
+def controller(**limits) -> AdmissionController:
+    options = dict(
+        max_concurrent=2,
+        max_per_user=2,
+        max_queue=4,
+        max_queued_bulk=2,
+        max_queued_per_user=4,
+    )
+    options.update(limits)
+    return AdmissionController(**options)
+
+
+def test_grants_free_slots_then_queues():
+    admission = controller()
+    first, second, third = (admission.admit(None) for _ in range(3))
+    assert first.granted and second.granted
+    assert not third.granted
+    assert admission.active == 2
+    assert len(admission.queue) == 1
+
+
+def test_release_grants_interactive_before_bulk_in_arrival_order():
+    admission = controller(max_concurrent=1)
+    running = admission.admit(None)
+    bulk = admission.admit(None, Priority.BULK)
+    interactive_first = admission.admit(None)
+    interactive_second = admission.admit(None)
+
+    running.release()
+    assert interactive_first.granted
+    assert not interactive_second.granted and not bulk.granted
+
+    interactive_first.release()
+    assert interactive_second.granted and not bulk.granted
+
+    interactive_second.release()
+    assert bulk.granted
+
+
+def test_per_user_cap_lets_other_users_through():
+    admission = controller(max_concurrent=3, max_per_user=1)
+    admission.admit("alice")
+    waiting_for_alice = admission.admit("alice")
+    bob = admission.admit("bob")
+    assert not waiting_for_alice.granted
+    assert bob.granted
+    assert admission.active_per_user == {"alice": 1, "bob": 1}
+
+
+def test_rejects_when_queues_are_full():
+    admission = controller(
+        max_concurrent=1, max_queue=3, max_queued_bulk=1, max_queued_per_user=1
+    )
+    admission.admit(None)
+    admission.admit(None, Priority.BULK)
+    with pytest.raises(AdmissionRejected, match="bulk"):
+        admission.admit(None, Priority.BULK)
+
+    admission.admit("alice")
+    with pytest.raises(AdmissionRejected, match="this user") as rejected:
+        admission.admit("alice")
+    assert rejected.value.retry_after >= 1
+
+    admission.admit(None)
+    with pytest.raises(AdmissionRejected, match="busy"):
+        admission.admit(None)
+
+
+def test_release_is_idempotent_and_frees_queue_places():
+    admission = controller(max_concurrent=1)
+    running = admission.admit("alice")
+    queued = admission.admit("alice")
+
+    queued.release(ran=False)
+    queued.release(ran=False)
+    assert admission.queue == []
+    assert admission.queued_per_user == {}
+
+    running.release()
+    running.release()
+    assert admission.active == 0
+    assert admission.active_per_user == {}
+
+
+def test_run_holds_the_slot_until_its_task_is_done():
+    async def scenario():
+        admission = controller(max_concurrent=1)
+        ticket = admission.admit(None)
+        finish = asyncio.Event()
+        task = asyncio.create_task(finish.wait())
+        ticket.hand_over(task)
+
+        ticket.release_unused()
+        assert admission.active == 1
+
+        finish.set()
+        await task
+        await asyncio.sleep(0)
+        assert ticket.released and admission.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_unused_ticket_is_released_without_a_run():
+    admission = controller(max_concurrent=1)
+    ticket = admission.admit(None)
+    ticket.release_unused()
+    assert ticket.released and admission.active == 0
+    # Without a measured run, the estimate of run durations is unchanged
+    assert admission.run_seconds == controller().run_seconds
+
+
+def test_cancelled_wait_leaves_the_queue():
+    async def scenario():
+        admission = controller(max_concurrent=1)
+        admission.admit(None)
+        queued = admission.admit(None)
+        waiter = asyncio.create_task(queued.wait())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert queued.released and admission.queue == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import asyncio
+import uuid
+
+import pytest
+from agno.run.v2.workflow import WorkflowRunResponse
+from agno.storage.session.v2.workflow import WorkflowSession
+
+from src.api.models import RunRequest
+from src.api.services import playground_service
+from src.config import app_settings
+from src.memory.answer_cache import AnswerCache, answer_scope
+from src.memory.conversation_buffer import memory_db
+
+
+@pytest.fixture
+def cache(tmp_path) -> AnswerCache:
+    return AnswerCache(
+        str(tmp_path / "answers.db"),
+        similarity_threshold=0.9,
+        ttl_seconds=60,
+        max_entries=100,
+        prune_interval=1,
+    )
+
+
+def test_answers_are_reused_only_in_their_scope(cache):
+    scope = answer_scope("files", "context")
+    cache.store("what is the sentiment?", [1.0, 0.0], scope, "positive")
+    hit = cache.lookup([0.99, 0.05], scope)
+    assert hit is not None and hit.answer == "positive"
+    assert cache.lookup([1.0, 0.0], answer_scope("files", "other context")) is None
+    assert cache.lookup([1.0, 0.0], answer_scope("other files", "context")) is None
+    assert cache.lookup([0.0, 1.0], scope) is None
+
+
+def test_history_context_changes_with_each_turn(monkeypatch):
+    monkeypatch.setattr(app_settings, "CONVERSATION_MEMORY", "history")
+    session_id = str(uuid.uuid4())
+    request = RunRequest(message="and the negative ones?", session_id=session_id)
+
+    def context() -> str:
+        return asyncio.run(playground_service.coalescing_context(request, session_id))
+
+    session = WorkflowSession(session_id=session_id)
+    session.upsert_run(WorkflowRunResponse(run_id="first"))
+    memory_db.upsert(session)
+    after_first_turn = context()
+    assert context() == after_first_turn
+
+    session.upsert_run(WorkflowRunResponse(run_id="second"))
+    memory_db.upsert(session)
+    assert context() != after_first_turn
@@ -0,0 +1,73 @@
+import io
+import os
+
+import pytest
+
+from src.memory.blob_store import BlobStore, UploadTooLargeError
+
+
+class FailingStream(io.BytesIO):
+    """A stream that can be hashed but fails while it is copied"""
+
+    def __init__(self, content: bytes):
+        super().__init__(content)
+        self.reads = 0
+
+    def seek(self, *args):
+        self.reads += 1
+        return super().seek(*args)
+
+    def read(self, *args):
+        if self.reads:
+            raise OSError("connection reset")
+        return super().read(*args)
+
+
+def store(tmp_path, max_total_bytes: int = 1 << 20) -> BlobStore:
+    return BlobStore(
+        str(tmp_path), max_blob_bytes=1 << 20, max_total_bytes=max_total_bytes
+    )
+
+
+def put(blob_store: BlobStore, content: bytes, mtime: float) -> str:
+    digest = blob_store.put_stream(io.BytesIO(content), "text/plain")
+    path = blob_store.path_for(digest, "text/plain")
+    os.utime(path, (mtime, mtime))
+    return digest
+
+
+def test_failed_copy_leaves_no_temporary_file(tmp_path):
+    blob_store = store(tmp_path)
+    with pytest.raises(OSError):
+        blob_store.put_stream(FailingStream(b"comments"), "text/plain")
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+
+
+def test_rejects_blobs_over_the_size_limit(tmp_path):
+    blob_store = BlobStore(str(tmp_path), max_blob_bytes=4, max_total_bytes=100)
+    with pytest.raises(UploadTooLargeError):
+        blob_store.put_stream(io.BytesIO(b"too large"), "text/plain")
+
+
+def test_sweep_removes_least_recently_used_blobs(tmp_path):
+    blob_store = store(tmp_path, max_total_bytes=250)
+    oldest = put(blob_store, b"a" * 100, 1)
+    newer = put(blob_store, b"b" * 100, 2)
+    newest = put(blob_store, b"c" * 100, 3)
+    assert not blob_store.contains(oldest, "text/plain")
+    assert blob_store.contains(newer, "text/plain")
+    assert blob_store.contains(newest, "text/plain")
+
+
+def test_sweep_keeps_referenced_blobs(tmp_path):
+    blob_store = store(tmp_path, max_total_bytes=250)
+    in_workspace = put(blob_store, b"a" * 100, 1)
+    blob_store.add_reference_source(lambda: [in_workspace])
+    in_run = put(blob_store, b"b" * 100, 2)
+    with blob_store.pinned([in_run]):
+        # Over the cap: only the new blob is unreferenced
+        unreferenced = blob_store.put_stream(io.BytesIO(b"c" * 100), "text/plain")
+    assert blob_store.contains(in_workspace, "text/plain")
+    assert blob_store.contains(in_run, "text/plain")
+    assert not blob_store.contains(unreferenced, "text/plain")
+    assert not blob_store.pins
@@ -0,0 +1,43 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+from agno.workflow.v2.step import StepInput
+
+from src.agents.data_analyst_agent import DataAnalystAgentResponse
+
+# src.workflow exports the step under the module's name
+check_query_subject_step = importlib.import_module(
+    "src.workflow.check_query_subject_step"
+)
+
+
+def check(monkeypatch, content):
+    async def run_routed(*args, **kwargs):
+        return SimpleNamespace(content=content)
+
+    monkeypatch.setattr(check_query_subject_step, "run_routed", run_routed)
+    return asyncio.run(
+        check_query_subject_step.check_query_subject(
+            StepInput(message="what is the sentiment?", additional_data={})
+        )
+    )
+
+
+@pytest.mark.parametrize("content", [None, "not json", {"query_type": "analytical"}])
+def test_unparsed_response_asks_to_rephrase(monkeypatch, content):
+    output = check(monkeypatch, content)
+    assert output.stop and not output.success
+    assert output.content.error_message.startswith("I could not understand your query")
+
+
+def test_analytical_query_continues(monkeypatch):
+    content = DataAnalystAgentResponse(
+        query_type="analytical",
+        query_content="sentiment",
+        helpful_message="",
+        information_extract_guidelines="count positive and negative comments",
+    )
+    output = check(monkeypatch, content)
+    assert output.success and output.content is content
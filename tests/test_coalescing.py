@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from src.api.coalescing import RunFailed, SingleFlight, coalescing_key
+from src.api.models import RunRequest
+from src.api.services import WORKFLOW_RESULT_EVENT, playground_service
+from src.config import app_settings
+
+
+def test_key_normalizes_whitespace_and_casing():
+    assert coalescing_key("What is  the\nsentiment?", "files") == coalescing_key(
+        "what is the sentiment?", "files"
+    )
+    assert coalescing_key("sentiment", "files") != coalescing_key("sentiment", "other")
+    assert coalescing_key("sentiment", "files", "a") != coalescing_key(
+        "sentiment", "files", "b"
+    )
+    assert coalescing_key("sentiment", "files", "", "first") != coalescing_key(
+        "sentiment", "files", "", "second"
+    )
+
+
+async def collect(run):
+    return [event async for event in run.subscribe()]
+
+
+def test_identical_requests_share_one_run():
+    async def scenario():
+        in_flight = SingleFlight()
+        release = asyncio.Event()
+        runs_started = 0
+
+        async def produce():
+            nonlocal runs_started
+            runs_started += 1
+            yield "first"
+            await release.wait()
+            yield "second"
+
+        first, started = in_flight.attach("key", produce)
+        assert started
+        first_events = asyncio.create_task(collect(first))
+        await asyncio.sleep(0)
+        # A request attaching late replays the events already published
+        second, started = in_flight.attach("key", produce)
+        assert not started and second is first
+        second_events = asyncio.create_task(collect(second))
+        release.set()
+        assert await first_events == ["first", "second"]
+        assert await second_events == ["first", "second"]
+        assert runs_started == 1
+        assert not in_flight.runs
+
+    asyncio.run(scenario())
+
+
+def test_failed_run_is_raised_to_every_subscriber():
+    async def scenario():
+        in_flight = SingleFlight()
+
+        async def produce():
+            yield "partial"
+            raise ValueError("model unavailable")
+
+        run, _ = in_flight.attach("key", produce)
+        in_flight.attach("key", produce)
+        for _ in range(2):
+            with pytest.raises(RunFailed, match="model unavailable"):
+                await collect(run)
+
+    asyncio.run(scenario())
+
+
+def test_run_is_cancelled_when_every_request_detaches():
+    async def scenario():
+        in_flight = SingleFlight()
+
+        async def produce():
+            await asyncio.Event().wait()
+            yield "never"
+
+        run, _ = in_flight.attach("key", produce)
+        in_flight.attach("key", produce)
+        in_flight.detach(run)
+        await asyncio.sleep(0)
+        assert not run.task.cancelled() and "key" in in_flight.runs
+        in_flight.detach(run)
+        with pytest.raises(asyncio.CancelledError):
+            await run.task
+        assert not in_flight.runs
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("memory, runs", [("summary", 1), ("history", 2)])
+def test_new_sessions_share_runs_unless_they_replay_history(monkeypatch, memory, runs):
+    monkeypatch.setattr(app_settings, "CONVERSATION_MEMORY", memory)
+    monkeypatch.setattr(app_settings, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(app_settings, "COALESCE_IDENTICAL_REQUESTS", True)
+    sessions = []
+
+    async def workflow_events(request, files, session_id, *args):
+        sessions.append(session_id)
+        await asyncio.sleep(0.05)
+        yield {"event": WORKFLOW_RESULT_EVENT, "content": "", "report_generated": False}
+
+    monkeypatch.setattr(playground_service, "workflow_events", workflow_events)
+
+    async def chat():
+        request = RunRequest(message="what is the overall sentiment?")
+        return "".join(
+            [
+                event
+                async for event in playground_service.stream_response(
+                    "social-media-team", request
+                )
+            ]
+        )
+
+    async def scenario():
+        return await asyncio.gather(chat(), chat())
+
+    responses = asyncio.run(scenario())
+    assert all("RunCompleted" in response for response in responses)
+    assert len(sessions) == runs
@@ -0,0 +1,48 @@
+import pytest
+
+from src.processing.comment_analytics import CommentCorpus
+from src.processing.comment_dedup import CommentClusters
+
+
+def clusters_of(*comments: str) -> CommentClusters:
+    return CommentClusters(CommentCorpus(list(comments)))
+
+
+@pytest.mark.parametrize(
+    "comment, opposite",
+    [
+        (
+            "I am canceling my subscription because the price went up",
+            "I am not canceling my subscription even though the price went up",
+        ),
+        (
+            "the app works great on my phone",
+            "the app never works on my phone",
+        ),
+        (
+            "The new season of this show is great, I love the plot twist",
+            "The new season of this show is terrible, I hate the plot twist",
+        ),
+        (
+            "honestly the ending was not good, it was bad",
+            "honestly the ending was good, it was not bad",
+        ),
+    ],
+)
+def test_opposite_meanings_are_not_merged(comment, opposite):
+    clusters = clusters_of(comment, comment, opposite)
+    assert len(clusters) == 2
+    assert clusters.most_repeated(5) == [(comment, 2)]
+
+
+def test_small_variants_are_merged():
+    comment = "The new season of this show is great, I love the plot twist"
+    clusters = clusters_of(
+        comment,
+        comment,
+        comment + " @sam",
+        "The new season of this show is great, I love plot twist",
+        "Nothing to do with the show, just saying hi",
+    )
+    assert len(clusters) == 2
+    assert clusters.most_repeated(5) == [(comment, 4)]
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from src.processing.comment_parser import (
+    chunk_comments,
+    iter_comments,
+    render_comment,
+)
+from src.processing.tokens import count_tokens
+
+DUMP = (
+    '"Love the new season, the finale was great",\n'
+    '"She said ""wow"" twice",\n'
+    '"A comment\nover two lines"\n'
+    "unquoted comment, another one\n"
+    '"Ünïcödé ✨ comment"\n'
+    '"   "\n'
+    '"unterminated at the end'
+)
+COMMENTS = [
+    "Love the new season, the finale was great",
+    'She said "wow" twice',
+    "A comment\nover two lines",
+    "unquoted comment",
+    "another one",
+    "Ünïcödé ✨ comment",
+    "unterminated at the end",
+]
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 7, 64, 1 << 16])
+def test_comments_are_parsed_across_block_boundaries(block_size):
+    stream = io.BytesIO(DUMP.encode("utf-8"))
+    assert list(iter_comments(stream, block_size=block_size)) == COMMENTS
+
+
+def test_chunks_keep_every_comment_within_the_budget():
+    comments = [f"comment number {index} " * (index % 5 + 1) for index in range(300)]
+    chunks = list(chunk_comments(comments, 60))
+    assert [comment for chunk in chunks for comment in chunk] == comments
+    assert all(
+        sum(count_tokens(comment) + 1 for comment in chunk) <= 60 for chunk in chunks
+    )
+
+
+def test_a_comment_over_the_budget_gets_its_own_chunk():
+    long_comment = "word " * 200
+    assert list(chunk_comments(["short", long_comment, "short"], 20)) == [
+        ["short"],
+        [long_comment],
+        ["short"],
+    ]
+
+
+def test_rendered_comments_carry_their_multiplicity():
+    assert render_comment('say "hi"') == '"say \\"hi\\""'
+    assert render_comment("repost", 3) == '"repost" (x3)'
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.config import app_settings
+from src.processing.tokens import count_tokens
+from src.workflow import context_packer
+from src.workflow.context_packer import deduplicate, pack_context, split_passages
+
+
+def finding(index: int) -> str:
+    return (
+        f"Finding {index}: post {index} about the campaign reached {index * 37} accounts, "
+        f"with {index * 11} comments mentioning topic{index} and delivery{index}."
+    )
+
+
+@pytest.fixture
+def small_budget(monkeypatch):
+    monkeypatch.setattr(app_settings, "CONTEXT_PACK_TOKEN_BUDGET", 300)
+    monkeypatch.setattr(app_settings, "CONTEXT_PACK_PASSAGE_TOKENS", 60)
+    monkeypatch.setattr(app_settings, "CONTEXT_PACK_MAX_INPUT_TOKENS", 1000)
+    monkeypatch.setattr(app_settings, "CONTEXT_PACK_GROUP_TOKENS", 200)
+    monkeypatch.setattr(app_settings, "CONTEXT_PACK_SUMMARY_TOKENS", 40)
+
+
+def test_passages_are_split_on_paragraph_and_line_boundaries():
+    lines = [finding(index) for index in range(6)]
+    passages = split_passages(["\n".join(lines), "Last paragraph."], 60)
+    assert [passage.position for passage in passages] == list(range(len(passages)))
+    assert len(passages) > 2
+    assert passages[-1].text == "Last paragraph."
+    # Groups of whole lines, in order
+    grouped_lines = [
+        line for passage in passages[:-1] for line in passage.text.split("\n")
+    ]
+    assert grouped_lines == lines
+
+
+def test_near_duplicates_are_dropped():
+    passages = split_passages(
+        [finding(1), finding(2), finding(1) + " Source: report.pdf", finding(2)], 300
+    )
+    unique = deduplicate(passages, 0.8)
+    assert [passage.text for passage in unique] == [
+        finding(2),
+        finding(1) + " Source: report.pdf",
+    ]
+
+
+def test_data_that_fits_is_sent_verbatim_once():
+    packed = asyncio.run(pack_context([finding(1), finding(2), finding(1)], "topic1"))
+    assert packed.text == f"{finding(1)}\n\n{finding(2)}"
+    assert packed.duplicates == 1
+    assert packed.summary_levels == 0
+
+
+def test_budget_is_respected_with_summaries(monkeypatch, small_budget):
+    summarized = []
+
+    async def arun(message, **kwargs):
+        summarized.append(message)
+        return SimpleNamespace(content="Condensed findings about the campaign.")
+
+    monkeypatch.setattr(context_packer.context_summarizer_agent, "arun", arun)
+    extractions = ["\n\n".join(finding(index) for index in range(40))]
+    packed = asyncio.run(pack_context(extractions, "topic7 delivery7"))
+    assert summarized
+    assert packed.summary_levels >= 1
+    assert packed.tokens <= app_settings.CONTEXT_PACK_TOKEN_BUDGET
+    assert count_tokens(packed.text) == packed.tokens
+    # The most relevant passage is kept verbatim
+    assert finding(7) in packed.text
+    assert "SUMMARY OF THE REMAINING DATA" in packed.text
+
+
+def test_budget_is_respected_when_summarization_fails(monkeypatch, small_budget):
+    async def arun(message, **kwargs):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(context_packer.context_summarizer_agent, "arun", arun)
+    extractions = ["\n\n".join(finding(index) for index in range(40))]
+    packed = asyncio.run(pack_context(extractions, "topic7 delivery7"))
+    assert packed.tokens <= app_settings.CONTEXT_PACK_TOKEN_BUDGET
+    assert finding(7) in packed.text
+    assert packed.dropped_passages > 0
@@ -0,0 +1,55 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.processing.comment_analytics import DigestCache
+
+
+class CountingCache(DigestCache[str]):
+    def __init__(self, max_entries: int):
+        super().__init__(max_entries)
+        self.build_count = 0
+        self.release = threading.Event()
+
+    def build(self, digest, open_stream):
+        self.build_count += 1
+        self.release.wait(timeout=5)
+        with open_stream() as stream:
+            return stream.read().decode()
+
+
+def test_concurrent_misses_build_once():
+    cache = CountingCache(max_entries=2)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [
+            pool.submit(cache.get, "digest", lambda: io.BytesIO(b"value"))
+            for _ in range(8)
+        ]
+        cache.release.set()
+        values = [future.result() for future in futures]
+    assert values == ["value"] * 8
+    assert cache.build_count == 1
+    assert not cache.builds
+
+
+def test_evicts_least_recently_used():
+    cache = CountingCache(max_entries=2)
+    cache.release.set()
+    for digest in ["a", "b", "a", "c"]:
+        cache.get(digest, lambda: io.BytesIO(b"value"))
+    assert list(cache.values) == ["a", "c"]
+
+
+def test_failed_build_is_retried():
+    cache = CountingCache(max_entries=2)
+    cache.release.set()
+
+    def failing_stream():
+        raise OSError("blob missing")
+
+    with pytest.raises(OSError):
+        cache.get("digest", failing_stream)
+    assert cache.get("digest", lambda: io.BytesIO(b"value")) == "value"
+    assert cache.build_count == 2
@@ -0,0 +1,46 @@
+import uuid
+from types import SimpleNamespace
+from typing import List
+
+import chromadb
+
+from src.memory.document_index import DocumentIndex
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.embedded: List[str] = []
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def document_index(batch_size: int = 64) -> DocumentIndex:
+    collection = chromadb.EphemeralClient().create_collection(str(uuid.uuid4()))
+    vector_db = SimpleNamespace(_collection=collection, embedder=CountingEmbedder())
+    return DocumentIndex(vector_db, batch_size=batch_size)
+
+
+def test_reingesting_a_file_embeds_nothing():
+    index = document_index(batch_size=2)
+    chunks = ["first page", "second page", "third page"]
+    assert index.ingest("digest", "report.pdf", chunks) == 3
+    assert index.vector_db.embedder.embedded == chunks
+
+    assert index.ingest("digest", "report.pdf", chunks) == 3
+    assert index.vector_db.embedder.embedded == chunks
+
+
+def test_only_new_chunks_are_embedded():
+    index = document_index()
+    index.ingest("digest", "comments.txt", ["shared", "old"])
+    index.ingest("digest", "comments.txt", ["shared", "new", "new"])
+    assert index.vector_db.embedder.embedded == ["shared", "old", "new"]
+
+
+def test_the_same_text_of_another_file_is_indexed_again():
+    index = document_index()
+    index.ingest("first", "a.txt", ["same text"])
+    index.ingest("second", "b.txt", ["same text"])
+    assert index.collection.count() == 2
@@ -0,0 +1,45 @@
+from typing import List
+
+import pytest
+
+from src.memory.embedder import CachedEmbedder
+from src.memory.embedding_cache import EmbeddingCache
+
+
+class CountingEmbedder:
+    id = "counting"
+    dimensions = 2
+
+    def __init__(self):
+        self.calls: List[List[str]] = []
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+
+@pytest.fixture
+def cached_embedder(tmp_path) -> CachedEmbedder:
+    cache = EmbeddingCache(
+        str(tmp_path / "embeddings.db"), max_entries=100, prune_interval=1
+    )
+    return CachedEmbedder(embedder=CountingEmbedder(), cache=cache)
+
+
+def test_only_missing_texts_are_computed(cached_embedder):
+    cached_embedder.get_embeddings(["price", "support"])
+    embeddings = cached_embedder.get_embeddings(["support", "delivery", "price"])
+    assert cached_embedder.embedder.calls == [["price", "support"], ["delivery"]]
+    assert embeddings == [[7.0, 0.5], [8.0, 0.5], [5.0, 0.5]]
+
+
+def test_repeated_texts_are_computed_once(cached_embedder):
+    embeddings = cached_embedder.get_embeddings(["price", "price"])
+    assert cached_embedder.embedder.calls == [["price"]]
+    assert embeddings == [[5.0, 0.5], [5.0, 0.5]]
+
+
+def test_cached_texts_make_no_call(cached_embedder):
+    cached_embedder.get_embeddings(["price"])
+    assert cached_embedder.get_embedding("price") == [5.0, 0.5]
+    assert len(cached_embedder.embedder.calls) == 1
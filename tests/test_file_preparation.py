@@ -0,0 +1,80 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from agno.media import File
+
+from src.agents.data_engineer_agent import DataEngineerAgentResponse
+from src.config import app_settings
+from src.workflow import file_extraction
+from src.workflow.file_preparation import FilePreparer
+
+
+def comment_file(comments: int) -> File:
+    lines = [
+        f"comment {index} about delivery number {index}" for index in range(comments)
+    ]
+    lines += ["the price went up again"] * 50
+    # Unique per test, so no earlier digest is served from the extraction cache
+    lines.append(str(uuid.uuid4()))
+    content = "\n".join(json.dumps(line) for line in lines).encode()
+    return File(name="comments.txt", content=content, mime_type="text/plain")
+
+
+@pytest.fixture
+def sent_comments(monkeypatch):
+    """The comment lines of every chunk prompt sent to the data engineer"""
+    sent = []
+
+    async def run_extractor(prompt, semaphore, files=None):
+        content = prompt.split("<content>")[-1].split("</content>")[0]
+        lines = [line.strip() for line in content.splitlines() if line.strip()]
+        if not lines[0].startswith("[part"):
+            sent.extend(lines)
+        return DataEngineerAgentResponse(
+            filename="comments.txt", extracted_content="digest", error=""
+        )
+
+    monkeypatch.setattr(file_extraction, "run_extractor", run_extractor)
+    return sent
+
+
+def test_large_comment_file_digest_is_bounded(monkeypatch, sent_comments):
+    monkeypatch.setattr(app_settings, "PREPARATION_DIGEST_MAX_COMMENTS", 200)
+    digest = asyncio.run(FilePreparer(1).extract_digest(comment_file(20_000)))
+    assert digest.content_extracted == ["digest"]
+    assert 0 < len(sent_comments) <= 200
+    # The most repeated comment comes first, with its multiplicity
+    assert sent_comments[0] == '"the price went up again" (x50)'
+    # The rest is spread over the whole file
+    assert '"comment 19900 about delivery number 19900"' in sent_comments
+
+
+def test_small_comment_file_is_digested_whole(monkeypatch, sent_comments):
+    monkeypatch.setattr(app_settings, "PREPARATION_DIGEST_MAX_COMMENTS", 200)
+    asyncio.run(FilePreparer(1).extract_digest(comment_file(100)))
+    assert len(sent_comments) == 102
+
+
+def test_query_does_not_wait_for_an_in_flight_digest(monkeypatch):
+    file = comment_file(10)
+
+    async def scenario():
+        preparer = FilePreparer(1)
+        release = asyncio.Event()
+
+        async def extract_digest(file):
+            await release.wait()
+
+        monkeypatch.setattr(preparer, "extract_digest", extract_digest)
+        file_id = await preparer.schedule(file)
+        assert file_id in preparer.tasks
+        output = await asyncio.wait_for(
+            preparer.prepared_output(file, "guidelines", "query"), timeout=1
+        )
+        release.set()
+        await preparer.shutdown()
+        return output
+
+    assert asyncio.run(scenario()) is None
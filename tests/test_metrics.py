@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from src.observability.metrics import (
+    Counter,
+    Histogram,
+    Metric,
+    MetricsRegistry,
+    registry,
+)
+
+
+def test_metric_families_implement_samples():
+    with pytest.raises(TypeError):
+        Metric("abstract_total", "A family without samples")
+
+
+def test_samples_carry_the_worker_label():
+    assert registry.constant_labels == {"worker": str(os.getpid())}
+    worker_registry = MetricsRegistry({"worker": "7"})
+    requests = worker_registry.register(
+        Counter("requests_total", "Requests", ["route"])
+    )
+    requests.inc(route="/chat")
+    requests.inc(2, route="/chat")
+    assert worker_registry.render().splitlines()[2:] == [
+        'requests_total{route="/chat",worker="7"} 3'
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    worker_registry = MetricsRegistry({"worker": "7"})
+    latency = worker_registry.register(
+        Histogram("latency_seconds", "Latency", [], [1, 2])
+    )
+    for value in [0.5, 1.5, 3]:
+        latency.observe(value)
+    assert worker_registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{worker="7",le="1"} 1',
+        'latency_seconds_bucket{worker="7",le="2"} 2',
+        'latency_seconds_bucket{worker="7",le="+Inf"} 3',
+        'latency_seconds_sum{worker="7"} 5',
+        'latency_seconds_count{worker="7"} 3',
+    ]
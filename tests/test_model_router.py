@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+from agno.agent import Agent
+from agno.models.openai import OpenAIChat
+
+from src.agents.model_router import QUERY_CHECK, routing_key, run_routed
+from src.config import app_settings
+
+
+class RecordingStorage:
+    mode = "agent"
+
+    def __init__(self):
+        self.sessions = []
+
+    def __deepcopy__(self, memo):
+        # Copies of a SqliteStorage write to the same database
+        return self
+
+    def read(self, session_id, user_id=None):
+        return None
+
+    def upsert(self, session):
+        self.sessions.append(session)
+        return session
+
+
+def routed_agent(monkeypatch, contents: dict) -> tuple:
+    """An agent on the small model whose runs write their model id to the storage"""
+
+    async def arun(self, message, **kwargs):
+        self.storage.upsert(session=self.model.id)
+        return SimpleNamespace(content=contents[self.model.id])
+
+    monkeypatch.setattr(Agent, "arun", arun)
+    storage = RecordingStorage()
+    agent = Agent(
+        model=OpenAIChat(id=app_settings.ROUTING_SMALL_MODEL, api_key="test"),
+        storage=storage,
+    )
+    return agent, storage
+
+
+def test_escalated_attempt_is_not_written_to_history(monkeypatch):
+    small, large = app_settings.ROUTING_SMALL_MODEL, app_settings.ROUTING_LARGE_MODEL
+    agent, storage = routed_agent(monkeypatch, {small: "", large: "answer"})
+    response = asyncio.run(
+        run_routed(agent, QUERY_CHECK, "query", is_valid=bool, input_tokens=1)
+    )
+    assert response.content == "answer"
+    assert storage.sessions == [large]
+
+
+def test_accepted_small_attempt_is_written_to_history(monkeypatch):
+    small = app_settings.ROUTING_SMALL_MODEL
+    agent, storage = routed_agent(monkeypatch, {small: "answer"})
+    asyncio.run(run_routed(agent, QUERY_CHECK, "query", is_valid=bool, input_tokens=1))
+    assert storage.sessions == [small]
+
+
+def test_routing_key_follows_the_policy(monkeypatch):
+    cascade = routing_key(QUERY_CHECK)
+    monkeypatch.setattr(app_settings, "MODEL_ROUTING_POLICY", "large")
+    assert routing_key(QUERY_CHECK) == app_settings.ROUTING_LARGE_MODEL
+    assert routing_key(QUERY_CHECK) != cascade
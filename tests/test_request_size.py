@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.server import RequestSizeLimitMiddleware, app
+
+
+@pytest.fixture
+def client():
+    return TestClient(RequestSizeLimitMiddleware(app, max_bytes=64))
+
+
+def chunks(size: int):
+    yield b"x" * size
+
+
+def test_declared_length_over_the_limit_is_rejected(client):
+    response = client.post("/v1/playground/files", content=b"x" * 100)
+    assert response.status_code == 413
+
+
+def test_malformed_content_length_is_rejected(client):
+    response = client.post(
+        "/v1/playground/files", content=b"x", headers={"Content-Length": "lots"}
+    )
+    assert response.status_code == 400
+
+
+def test_chunked_body_over_the_limit_is_rejected(client):
+    response = client.post(
+        "/v1/playground/files",
+        content=chunks(100),
+        headers={"Content-Type": "multipart/form-data; boundary=x"},
+    )
+    assert response.status_code == 413
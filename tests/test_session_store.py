@@ -0,0 +1,93 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from src.api.services import WORKFLOW_RESULT_EVENT, playground_service
+from src.config import app_settings
+from src.memory.session_store import InvalidCursorError, SessionStore
+from src.memory.sqlite import PruneSchedule
+from src.server import app
+
+
+@pytest.fixture
+def store(tmp_path) -> SessionStore:
+    return SessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60, prune_interval=1)
+
+
+def expire(store: SessionStore, session_id: str) -> None:
+    with store.engine.begin() as conn:
+        conn.execute(
+            update(store.table)
+            .where(store.table.c.session_id == session_id)
+            .values(updated_at=int(time.time()) - store.ttl_seconds - 1)
+        )
+
+
+def session_ids(store: SessionStore):
+    with store.engine.connect() as conn:
+        return {row.session_id for row in conn.execute(store.table.select())}
+
+
+def test_touch_creates_then_refreshes_a_session(store):
+    store.touch("session", "team", "team", "first title")
+    store.touch("session", "team", "team", "second title")
+    assert store.get("session")["title"] == "first title"
+    assert store.list("team", "team", limit=10)[0] == [
+        {
+            "session_id": "session",
+            "title": "first title",
+            "created_at": store.get("session")["created_at"],
+        }
+    ]
+
+
+def test_touch_evicts_expired_sessions(store):
+    store.touch("expired", "team", "team", "title")
+    expire(store, "expired")
+    assert store.get("expired") is None
+    store.touch("active", "team", "team", "title")
+    assert session_ids(store) == {"active"}
+
+
+def test_sessions_are_paginated_newest_first(store):
+    for index in range(5):
+        store.touch(f"session-{index}", "team", "team", "title")
+        with store.engine.begin() as conn:
+            conn.execute(
+                update(store.table)
+                .where(store.table.c.session_id == f"session-{index}")
+                .values(created_at=index)
+            )
+    pages, cursor = [], None
+    while True:
+        sessions, cursor = store.list("team", "team", limit=2, cursor=cursor)
+        pages.append([session["session_id"] for session in sessions])
+        if cursor is None:
+            break
+    assert pages == [
+        ["session-4", "session-3"],
+        ["session-2", "session-1"],
+        ["session-0"],
+    ]
+    with pytest.raises(InvalidCursorError):
+        store.list("team", "team", limit=2, cursor="not a cursor")
+
+
+def test_chat_evicts_expired_sessions(monkeypatch):
+    async def workflow_events(*args):
+        yield {"event": WORKFLOW_RESULT_EVENT, "content": "", "report_generated": False}
+
+    monkeypatch.setattr(playground_service, "workflow_events", workflow_events)
+    monkeypatch.setattr(app_settings, "ADMISSION_CONTROL_ENABLED", False)
+    monkeypatch.setattr(app_settings, "ANSWER_CACHE_ENABLED", False)
+    store = playground_service.sessions
+    monkeypatch.setattr(store, "prune_schedule", PruneSchedule(1))
+    store.touch("expired-session", "social-media-team", "team", "title")
+    expire(store, "expired-session")
+
+    response = TestClient(app).post("/chat", data={"message": "hello"})
+    assert response.status_code == 200
+    assert "RunCompleted" in response.text
+    assert "expired-session" not in session_ids(store)
@@ -57,7 +57,8 @@ export const sendChatMessageStream = async (
   files?: File[],
   onChunk?: (chunk: any) => void,
   onError?: (error: Error) => void,
-  onComplete?: () => void
+  onComplete?: () => void,
+  sessionId?: string | null
 ): Promise<void> => {
   const url = `${endpoint}/chat`
 
@@ -65,6 +66,10 @@ export const sendChatMessageStream = async (
     const formData = new FormData()
     formData.append('message', message)
 
+    if (sessionId) {
+      formData.append('session_id', sessionId)
+    }
+
     if (files && files.length > 0) {
       files.forEach((file) => {
         formData.append('files', file)
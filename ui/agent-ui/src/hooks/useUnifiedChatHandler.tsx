@@ -1,5 +1,6 @@
 import { useCallback } from 'react'
 import { toast } from 'sonner'
+import { useQueryState } from 'nuqs'
 import { usePlaygroundStore } from '@/store'
 import useChatActions from '@/hooks/useChatActions'
 import { sendChatMessageStream } from '@/api/chat'
@@ -13,6 +14,7 @@ const useUnifiedChatHandler = () => {
     (state) => state.setStreamingErrorMessage
   )
   const setIsStreaming = usePlaygroundStore((state) => state.setIsStreaming)
+  const [sessionId, setSessionId] = useQueryState('session')
 
   const handleStreamResponse = useCallback(
     async (message: string, files?: UploadedFile[]) => {
@@ -47,8 +49,6 @@ const useUnifiedChatHandler = () => {
         created_at: Math.floor(Date.now() / 1000) + 1
       })
 
-      let lastContent = ''
-
       try {
         const fileList = files?.map(f => f.file) || []
 
@@ -62,13 +62,14 @@ const useUnifiedChatHandler = () => {
                 const newMessages = [...prevMessages]
                 const lastMessage = newMessages[newMessages.length - 1]
                 if (lastMessage && lastMessage.role === 'agent') {
-                  const uniqueContent = chunk.content.replace(lastContent, '')
-                  lastMessage.content += uniqueContent
-                  lastContent = chunk.content
+                  lastMessage.content += chunk.content
                 }
                 return newMessages
               })
             } else if (chunk.event === 'RunCompleted') {
+              if (chunk.session_id && chunk.session_id !== sessionId) {
+                setSessionId(chunk.session_id)
+              }
               setMessages((prevMessages) => {
                 const newMessages = [...prevMessages]
                 const lastMessage = newMessages[newMessages.length - 1]
@@ -102,7 +103,8 @@ const useUnifiedChatHandler = () => {
           },
           () => {
             // Stream completed
-          }
+          },
+          sessionId
         )
       } catch (error) {
         setMessages((prevMessages) => {
@@ -127,7 +129,9 @@ const useUnifiedChatHandler = () => {
       selectedEndpoint,
       setStreamingErrorMessage,
       setIsStreaming,
-      focusChatInput
+      focusChatInput,
+      sessionId,
+      setSessionId
     ]
   )
 